@@ -0,0 +1,92 @@
+"""
+Throughput and memory of the PDF text-extraction backends in `utils.pdf_backends`.
+
+Generates its own sample PDFs (single-column prose, and a two-column layout), then runs
+    every installed backend on each one in a fresh process and reports:
+    - pages/sec (open + extract all pages)
+    - peak memory: Python heap (tracemalloc) and resident set growth (ru_maxrss)
+    - word recall: share of the words on the page found in the extracted text,
+        a rough check that the text is still usable
+
+Usage (from the repository root):
+    python -m benchmarks.bench_extractors [--pages 200] [--backends pypdf pymupdf ...]
+"""
+import argparse
+import multiprocessing
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.sample_pdf import sample_pages, sample_pdf
+from utils.pdf_backends import available_extractors, get_extractor
+
+
+def _rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024 # bytes on macOS, KiB on Linux
+
+
+def _word_recall(expected: list[list[str]], texts: list[str]) -> float:
+    found = total = 0
+    for lines, text in zip(expected, texts):
+        want = Counter(w for line in lines for w in line.split())
+        got = Counter(re.findall(r"\S+", text))
+        found += sum((want & got).values())
+        total += sum(want.values())
+    return found / total if total else 0.0
+
+
+def run_backend(backend: str, data: bytes, expected: list[list[str]]) -> dict:
+    """Runs in a fresh worker process, so peak memory belongs to this backend only"""
+    extractor = get_extractor(backend)
+    # Warm up on a one-page document: library imports and lazy init are not throughput
+    extractor.extract(extractor.open(sample_pdf(sample_pages(1))), [0])
+
+    rss_before = _rss_mb()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    doc = extractor.open(data)
+    texts = extractor.extract(doc, range(len(expected)))
+    elapsed = time.perf_counter() - start
+
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'pages_per_sec': len(expected) / elapsed,
+        'heap_peak_mb': heap_peak / 1e6,
+        'rss_growth_mb': _rss_mb() - rss_before,
+        'word_recall': _word_recall(expected, texts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--backends', nargs='*', default=None, help="default: every installed backend")
+    args = parser.parse_args()
+
+    backends = args.backends or available_extractors()
+    samples = {
+        'prose': sample_pages(args.pages),
+        'two-column': sample_pages(args.pages, lines_per_page=80, words_per_line=(3, 5), seed=1),
+    }
+
+    ctx = multiprocessing.get_context('spawn')
+    for sample_name, expected in samples.items():
+        data = sample_pdf(expected, columns=2 if sample_name == 'two-column' else 1)
+        print(f"\n{sample_name}: {len(expected)} pages, {len(data) / 1e6:.1f} MB")
+        print(f"  {'backend':<14}{'pages/sec':>11}{'heap peak MB':>14}{'RSS growth MB':>15}{'word recall':>13}")
+        for backend in backends:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                r = pool.submit(run_backend, backend, data, expected).result()
+            print(f"  {backend:<14}{r['pages_per_sec']:>11.1f}{r['heap_peak_mb']:>14.1f}"
+                  f"{r['rss_growth_mb']:>15.1f}{r['word_recall']:>13.1%}")
+
+
+if __name__ == '__main__':
+    main()
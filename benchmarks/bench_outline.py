@@ -0,0 +1,114 @@
+"""
+Benchmark outline processing on a synthetic book with a 10k-entry outline.
+
+Compares the previous forward-scan page range computation (O(n^2)) with the single-pass
+    stack in `utils.pdf_process.page_ranges`, and times `ChapterExtractor` end to end.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_outline [--entries 10000] [--pages 2000]
+"""
+import argparse
+import io
+import random
+import time
+
+from pypdf import PdfReader, PdfWriter
+
+from utils.pdf_process import ChapterExtractor, page_ranges
+
+
+def forward_scan_page_ranges(chapters: list[dict], total_pages: int) -> list[dict]:
+    """Previous implementation: scan forward from every chapter to find where it ends"""
+    pagerange = []
+    for i, current_chapter in enumerate(chapters):
+        end_page = total_pages
+        for next_chapter in chapters[i + 1:]:
+            if next_chapter['nest'] <= current_chapter['nest']:
+                end_page = next_chapter['page']
+                break
+        pagerange.append({
+            'title': current_chapter['title'],
+            'nest': current_chapter['nest'],
+            'start': current_chapter['page'],
+            'end': end_page,
+            'id': f"ch_{current_chapter['nest']}_{current_chapter['page']}_{end_page}",
+        })
+    return pagerange
+
+
+def synthetic_outline(n_entries: int, n_pages: int, max_nest: int=4, seed: int=0) -> list[dict]:
+    """Flat outline in document order, the way `ChapterExtractor.extract_toc` returns it"""
+    rng = random.Random(seed)
+    chapters, nest = [], 0
+    for i in range(n_entries):
+        nest = rng.randint(1, min(nest + 1, max_nest)) # can go one level deeper at a time
+        chapters.append({'title': f"Entry {i}", 'page': i * n_pages // n_entries, 'nest': nest})
+    return chapters
+
+
+def synthetic_pdf(chapters: list[dict], n_pages: int) -> bytes:
+    """Blank-page PDF carrying the given outline"""
+    writer = PdfWriter()
+    for _ in range(n_pages):
+        writer.add_blank_page(612, 792)
+
+    parents = {0: None}
+    for chapter in chapters:
+        item = writer.add_outline_item(chapter['title'], chapter['page'], parent=parents[chapter['nest'] - 1])
+        parents[chapter['nest']] = item
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10_000)
+    parser.add_argument('--pages', type=int, default=2_000)
+    args = parser.parse_args()
+
+    chapters = synthetic_outline(args.entries, args.pages)
+
+    ## PAGE RANGES
+    old, t_old = timed(forward_scan_page_ranges, chapters, args.pages)
+    new, t_new = timed(page_ranges, chapters, args.pages)
+    assert old == new, "page_ranges disagrees with the forward-scan implementation"
+    print(f"Page ranges, {args.entries} entries:")
+    print(f"  forward scan : {t_old * 1000:9.1f} ms")
+    print(f"  single pass  : {t_new * 1000:9.1f} ms  ({t_old / max(t_new, 1e-9):.0f}x)")
+
+    ## END TO END
+    # Chapters with the same nesting as the synthetic outline, but built from a real PDF
+    data, t_build = timed(synthetic_pdf, chapters, args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(data) / 1e6:.1f} MB (built in {t_build:.1f} s)")
+
+    reader = PdfReader(io.BytesIO(data))
+    extractor, t_extract = timed(ChapterExtractor, None, reader)
+    _, t_ranges = timed(extractor.get_page_range_from_dict)
+    assert [c['page'] for c in extractor.get_chapters()] == [c['page'] for c in chapters]
+
+    # Page resolution alone: page-ref index vs. pypdf's own lookup
+    outline_items = []
+    stack = [reader.outline]
+    while stack:
+        for node in stack.pop():
+            (stack if isinstance(node, list) else outline_items).append(node)
+    _, t_index = timed(lambda: [extractor._resolve_page(n) for n in outline_items])
+    _, t_pypdf = timed(lambda: [reader.get_destination_page_number(n) for n in outline_items])
+
+    print("ChapterExtractor:")
+    print(f"  outline parse + flatten    : {t_extract * 1000:9.1f} ms")
+    print(f"  page ranges                : {t_ranges * 1000:9.1f} ms")
+    print(f"  resolve pages, ref index   : {t_index * 1000:9.1f} ms")
+    print(f"  resolve pages, pypdf       : {t_pypdf * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Retrieval recall vs. search cost of shortened and quantized embeddings in the local vector
+    store (`utils.local_store`), on a sample chapter.
+
+Chunks a generated chapter like the app does, embeds it once at full size, then for each
+    dimension (text-embedding-3 vectors shortened by truncating and re-normalizing, which is
+    what the API's `dimensions` parameter returns) and quantization (float32, int8, binary;
+    with and without float re-scoring) reports:
+    - recall@k against exact float32 search at full dimension
+    - bytes per vector scanned by the search pass, and that as a share of full-size float32
+    - bytes per vector stored on disk: every row keeps its float32 values (re-scoring, fetch)
+        next to its int8 and binary codes, so quantization makes search scan less, it does not
+        make the index smaller (float32 + codes: about 1.28x the floats alone)
+    - milliseconds per query
+
+Embeddings come from OpenAI (text-embedding-3-small, through the embedding cache) when
+    OPENAI_API_KEY is set, otherwise from a synthetic model whose variance decays along the
+    dimensions like shortened embeddings do; synthetic numbers only show the trade-off's shape.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_quantization [--pages 60] [--queries 100] [--k 5] [--synthetic]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.sample_pdf import sample_pages
+from utils.config import get_setting
+from utils.local_store import LocalIndex
+from utils.splitter import ChapterSplitter
+
+
+FULL_DIMENSIONS = 1536
+
+
+def sample_chunks(n_pages: int) -> list[str]:
+    pages = [Document(page_content="\n".join(lines), metadata={'page': i})
+             for i, lines in enumerate(sample_pages(n_pages))]
+    return list(ChapterSplitter().split_pages(pages).texts())
+
+
+def sample_queries(chunks: list[str], n: int, seed: int=0) -> list[str]:
+    """A random 12-word span of a random chunk per query"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.choice(len(chunks), size=n):
+        words = chunks[i].split()
+        start = rng.integers(0, max(1, len(words) - 12))
+        queries.append(" ".join(words[start:start + 12]))
+    return queries
+
+
+def embed_openai(chunks: list[str], queries: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    from utils.llm import config_embedding_model_simple
+    embeddings = config_embedding_model_simple()
+    return (np.asarray(embeddings.embed_documents(chunks), dtype=np.float32),
+            np.asarray([embeddings.embed_query(q) for q in queries], dtype=np.float32))
+
+
+def embed_synthetic(n_chunks: int, n_queries: int, seed: int=0) -> tuple[np.ndarray, np.ndarray]:
+    """Clustered vectors with decaying per-dimension variance; queries are noisy copies of chunks"""
+    rng = np.random.default_rng(seed)
+    spectrum = 1 / np.sqrt(1 + np.arange(FULL_DIMENSIONS) / 64)
+    centers = rng.standard_normal((max(4, n_chunks // 20), FULL_DIMENSIONS)) * spectrum
+    docs = centers[rng.integers(0, len(centers), n_chunks)] + 0.6 * rng.standard_normal((n_chunks, FULL_DIMENSIONS)) * spectrum
+    queries = docs[rng.integers(0, n_chunks, n_queries)] + 0.5 * rng.standard_normal((n_queries, FULL_DIMENSIONS)) * spectrum
+    return docs.astype(np.float32), queries.astype(np.float32)
+
+
+def shorten(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    short = vectors[:, :dimensions]
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def exact_top_k(docs: np.ndarray, queries: np.ndarray, k: int) -> list[set]:
+    unit = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def run(docs: np.ndarray, queries: np.ndarray, truth: list[set], k: int, quantization: str, rescore: int) -> dict:
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalIndex(path, quantization=quantization, rescore=rescore)
+        for i in range(0, len(docs), 500):
+            index.upsert([(str(j), docs[j], {}) for j in range(i, min(i + 500, len(docs)))], namespace='bench')
+        index.query(queries[0], top_k=k, namespace='bench') # builds the caches
+
+        found = 0
+        start = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            matches = index.query(query, top_k=k, namespace='bench', include_metadata=False)['matches']
+            found += len({int(m['id']) for m in matches} & expected)
+        elapsed = time.perf_counter() - start
+        # Vector files only (not the ids and metadata in rows.jsonl), the same for every quantization
+        stored = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path)
+                     for name in names if name.endswith(('.f32', '.i8', '.bin')))
+
+    dimensions = docs.shape[1]
+    scanned = {'none': 4 * dimensions, 'int8': dimensions + 4, 'binary': (dimensions + 7) // 8}[quantization]
+    return {
+        'recall': found / (k * len(queries)),
+        'scanned': scanned,
+        'stored': stored / len(docs),
+        'ms': 1000 * elapsed / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=60, help="pages in the sample chapter")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=5, help="results per query (the QnA retriever uses 5)")
+    parser.add_argument('--dimensions', type=int, nargs='*', default=[1536, 1024, 512, 256])
+    parser.add_argument('--synthetic', action='store_true', help="do not call the embedding API")
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.pages)
+    if get_setting("OPENAI_API_KEY") and not args.synthetic:
+        source = "text-embedding-3-small"
+        docs, queries = embed_openai(chunks, sample_queries(chunks, args.queries))
+    else:
+        source = "synthetic"
+        docs, queries = embed_synthetic(len(chunks), args.queries)
+    truth = exact_top_k(docs, queries, args.k)
+
+    print(f"{len(chunks)} chunks from {args.pages} pages, {args.queries} queries, {source} embeddings, "
+          f"recall@{args.k} vs. exact float32 at {docs.shape[1]} dimensions")
+    print(f"  {'dims':>5}  {'vectors':<17}{'recall':>8}{'scanned B/vec':>15}{'scan':>7}"
+          f"{'stored B/vec':>14}{'ms/query':>10}")
+    full_bytes = 4 * docs.shape[1]
+    for dimensions in args.dimensions:
+        short_docs, short_queries = shorten(docs, dimensions), shorten(queries, dimensions)
+        for quantization, rescore in (('none', 0), ('int8', 0), ('int8', 4), ('binary', 0), ('binary', 4)):
+            r = run(short_docs, short_queries, truth, args.k, quantization, rescore)
+            label = quantization if quantization != 'none' else 'float32'
+            if rescore:
+                label += ' + rescore'
+            print(f"  {dimensions:>5}  {label:<17}{r['recall']:>8.1%}{r['scanned']:>15}"
+                  f"{r['scanned'] / full_bytes:>7.1%}{r['stored']:>14.0f}{r['ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Page extraction throughput of a streamed chapter (`LazyBook.iter_windows(keep=False)`, as used
+    by `utils.ingest.stream_chapter`) for several PDF_EXTRACT_WORKERS settings.
+
+Generates its own sample PDF, then for each setting extracts every page in windows of
+    `--window` pages, in a fresh process, and reports pages/sec and the total time.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_streaming [--pages 900] [--window 32] [--workers 1 2 4]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.sample_pdf import sample_pages, sample_pdf
+
+
+def run(data: bytes, workers: int, window: int) -> float:
+    """Runs in a fresh worker process, so no page or reader is shared between settings"""
+    os.environ['PDF_EXTRACT_WORKERS'] = str(workers)
+    from utils.pdf_process import LazyBook
+
+    book = LazyBook(data, name='sample.pdf', shared=False)
+    start = time.perf_counter()
+    n_pages = sum(len(pages) for pages in book.iter_windows(range(len(book)), window=window, keep=False))
+    elapsed = time.perf_counter() - start
+    assert n_pages == len(book)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=900)
+    parser.add_argument('--window', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    data = sample_pdf(sample_pages(args.pages))
+    print(f"{args.pages} pages, windows of {args.window}, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>9} {'pages/sec':>10}")
+    for workers in args.workers:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            elapsed = pool.submit(run, data, workers, args.window).result()
+        print(f"{workers:>8} {elapsed:>9.2f} {args.pages / elapsed:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
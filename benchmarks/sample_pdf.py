@@ -0,0 +1,68 @@
+"""
+Self-contained generator of text PDFs for the benchmarks, built with pypdf only
+    (no sample files to ship, no extra dependencies).
+"""
+import io
+import random
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+WORDS = (
+    "cell energy protein membrane enzyme reaction gradient transport molecule structure "
+    "function pathway signal receptor binding synthesis equilibrium diffusion osmosis "
+    "carbon oxygen water glucose chapter figure table example equation theory model"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def sample_pages(n_pages: int, lines_per_page: int=40, words_per_line: tuple[int, int]=(8, 14),
+                 seed: int=0) -> list[list[str]]:
+    """Text lines of each page: running header, body, copyright footer and page number"""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n_pages):
+        body = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(*words_per_line))) for _ in range(lines_per_page)]
+        pages.append(["Introduction to Biology - Chapter 3"] + body + ["(c) 2024 Example Publisher. All rights reserved.", str(i + 1)])
+    return pages
+
+
+def sample_pdf(pages: list[list[str]], columns: int=1) -> bytes:
+    """
+    Render the given lines with a standard Type1 font, one text object per line.
+    With `columns=2`, body lines alternate between a left and a right column.
+    """
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+
+    for lines in pages:
+        page = writer.add_blank_page(612, 792)
+        ops, y = [], 760
+        for n, line in enumerate(lines):
+            x = 50
+            if columns == 2 and 0 < n < len(lines) - 2:
+                x = 50 if n % 2 else 320
+                if n % 2:
+                    y -= 14
+            else:
+                y -= 14
+            ops.append(f"BT /F1 9 Tf {x} {y} Td ({_escape(line)}) Tj ET")
+
+        content = DecodedStreamObject()
+        content.set_data("\n".join(ops).encode('latin-1'))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})
+        })
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
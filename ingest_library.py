@@ -0,0 +1,148 @@
+"""
+Headless bulk ingestion: embed every chapter, at one outline nesting level, of every PDF in a
+    directory into the vector index used by the app (Pinecone, or local, see VECTOR_BACKEND).
+
+Books are processed concurrently by a pool of worker threads (embedding and upserting are
+    network bound; page text extraction uses its own process pool, see PDF_EXTRACT_WORKERS).
+Progress is checkpointed per embedding request (namespace manifests) and per book (the state file),
+    so rerunning the same command after an interruption picks up where it stopped.
+
+Settings (OPENAI_API_KEY, PINECONE_API_KEY, ...) are read from .streamlit/secrets.toml or
+    environment variables.
+
+Usage (from the repository root):
+    python ingest_library.py path/to/books [--nest 1] [--workers 4] [--index test]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import config_index, config_embedding_model_simple, available_extractors, get_cache_dir, DEFAULT_BACKEND
+from utils import CachedEmbeddings
+from utils.retrieval import NAMESPACE_MODES, default_namespace_mode
+from utils.book_cache import write_json_atomic
+from utils.ingest import ingest_book
+
+
+_print_lock = threading.Lock()
+
+def log(message: str):
+    with _print_lock:
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+class IngestState():
+    """Per-book results of previous runs, keyed by absolute path, saved after every book"""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.books = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.books = json.load(f)
+
+    @staticmethod
+    def _signature(pdf_path: str) -> list:
+        stat = os.stat(pdf_path)
+        return [stat.st_size, int(stat.st_mtime)]
+
+    def is_done(self, pdf_path: str, nest: int) -> bool:
+        entry = self.books.get(os.path.abspath(pdf_path))
+        return (entry is not None and entry.get('status') in ('done', 'no_toc')
+                and entry.get('nest') == nest and entry.get('file') == self._signature(pdf_path))
+
+    def record(self, pdf_path: str, nest: int, stats: dict):
+        with self._lock:
+            self.books[os.path.abspath(pdf_path)] = {**stats, 'nest': nest, 'file': self._signature(pdf_path)}
+            write_json_atomic(self.path, self.books)
+
+
+def find_pdfs(directory: str, recursive: bool) -> list[str]:
+    if not recursive:
+        return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith('.pdf'))
+    return sorted(
+        os.path.join(root, f)
+        for root, _, files in os.walk(directory)
+        for f in files if f.lower().endswith('.pdf')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help="directory containing the PDF books")
+    parser.add_argument('--nest', type=int, default=1, help="outline nesting level of the chapters to ingest (1 = top level)")
+    parser.add_argument('--namespace-mode', default=default_namespace_mode(), choices=NAMESPACE_MODES,
+                        help="one namespace per chapter, or per book with chapters as page-range filters")
+    parser.add_argument('--workers', type=int, default=4, help="books processed concurrently")
+    parser.add_argument('--index', default='test', help="vector index name (Pinecone, or local with VECTOR_BACKEND=local)")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=available_extractors(), help="PDF text extraction backend")
+    parser.add_argument('--no-strip', action='store_true', help="keep repeated headers/footers")
+    parser.add_argument('--recursive', action='store_true', help="also look for PDFs in subdirectories")
+    parser.add_argument('--state', default=None, help="state file (default: <cache dir>/ingest_state.json)")
+    parser.add_argument('--keep-previous', action='store_true',
+                        help="keep the earlier edition of a revised chapter instead of deleting it once diffed against")
+    parser.add_argument('--force', action='store_true', help="reprocess books the state file marks as done")
+    args = parser.parse_args()
+
+    # Share the cores between concurrent books instead of every book starting a full process pool
+    os.environ.setdefault('PDF_EXTRACT_WORKERS', str(max(1, (os.cpu_count() or 1) // args.workers)))
+
+    state = IngestState(args.state or os.path.join(get_cache_dir(), 'ingest_state.json'))
+    pdfs = find_pdfs(args.directory, args.recursive)
+    unit = args.nest if args.namespace_mode == 'chapter' else 'book'
+    todo = [p for p in pdfs if args.force or not state.is_done(p, unit)]
+    log(f"{len(pdfs)} PDFs found, {len(pdfs) - len(todo)} already ingested, {len(todo)} to go")
+    if not todo:
+        return
+
+    _, index = config_index(args.index)
+    embeddings = config_embedding_model_simple()
+
+    def run(pdf_path: str) -> dict:
+        name = os.path.basename(pdf_path)
+        log(f"{name}: started")
+        try:
+            stats = ingest_book(
+                pdf_path, index, embeddings,
+                nest=args.nest, backend=args.backend, strip=not args.no_strip, namespace_mode=args.namespace_mode,
+                replace_previous=not args.keep_previous, progress=lambda message: log(f"{name}: {message}")
+            )
+        except Exception as e:
+            stats = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+        state.record(pdf_path, unit, stats)
+        return stats
+
+    start_total = time.time()
+    totals = {'done': 0, 'no_toc': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(run, p): p for p in todo}
+        for future in as_completed(futures):
+            name, stats = os.path.basename(futures[future]), future.result()
+            totals[stats['status']] += 1
+            if stats['status'] == 'failed':
+                log(f"{name}: FAILED ({stats['error']})")
+            elif stats['status'] == 'no_toc':
+                log(f"{name}: skipped, no outline to take chapters from")
+            else:
+                seconds = max(stats['total_seconds'], 1e-9)
+                log(f"{name}: {stats['chapters']} chapters ({stats['skipped']} already done), "
+                    f"{stats['pages']} pages, {stats['chunks']} chunks "
+                    f"({stats['embedded']} embedded, {stats['reused']} reused, {stats['resumed']} resumed, "
+                    f"{stats['retired']} previous versions deleted) in {seconds:.1f}s -- "
+                    f"{stats['pages'] / seconds:.1f} pages/s, {stats['chunks'] / seconds:.1f} chunks/s "
+                    f"(streamed {stats['stream_seconds']:.1f}s; revisions: extract {stats['extract_seconds']:.1f}s, "
+                    f"embed {stats['embed_seconds']:.1f}s)")
+
+    log(f"Finished in {time.time() - start_total:.1f}s: {totals['done']} ingested, "
+        f"{totals['no_toc']} without outline, {totals['failed']} failed (rerun to retry)")
+    if isinstance(embeddings, CachedEmbeddings):
+        cache_stats = embeddings.stats()
+        log(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} sent to the API "
+            f"({cache_stats['hit_rate']:.0%} hit rate)")
+
+
+if __name__ == '__main__':
+    main()
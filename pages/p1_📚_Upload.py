@@ -1,16 +1,22 @@
 from regex import F
 import streamlit as st
-import tempfile
-import os
 import time
 
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_pinecone import PineconeVectorStore
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from utils import ChapterExtractor, config_pinecone, config_embedding_model_simple
-from utils import process_book, extract_chapter
+from utils import ChapterExtractor, config_index, config_embedding_model_simple
+from utils import process_book, open_book, extract_chapter, LazyBook, fingerprint_upload
+from utils import available_extractors, get_setting, DEFAULT_BACKEND
+from utils import ChunkManifest, CachedEmbeddings
+from utils.ingest import chapter_pages, build_chunks, previous_version, embed_chunks, retire_namespace
+from utils.ingest import stream_chapter, book_chapter, page_chapter_titles, resolve_namespace
+from utils.ingest import lookup_namespace, CHUNK_SIZE, CHUNK_OVERLAP
+from utils.registry import READY, get_namespace_registry
+from utils.retrieval import default_namespace_mode
+from utils.preembed import EMBEDDED, FAILED, BookPreEmbedder, get_preembedding, start_preembedding
+from utils.estimate import page_lengths, estimate_chapter, check_limits, format_seconds, get_throughput_log
+from utils.llm import embedding_backend
 
 
 st.set_page_config(
@@ -24,7 +30,7 @@ st.header("Upload Your Book Here!")
 
 class Uploader():
     def __init__(self):
-        self.filepath = None
+        self.uploaded_pdf = None
         # Initialize session state
         self._initialize_session_state()
 
@@ -42,12 +48,24 @@ class Uploader():
             st.session_state.chapter_page_range = None
         if 'uploaded_namespaces' not in st.session_state:
             st.session_state.uploaded_namespaces = []
+        if 'book_file_id' not in st.session_state:
+            st.session_state.book_file_id = None
+        if 'book_name' not in st.session_state:
+            st.session_state.book_name = None
+        if 'book_hash' not in st.session_state:
+            st.session_state.book_hash = None
+        # Copied from the sidebar widget: read by the QnA and quiz pages, where it is not rendered
+        if 'namespace_mode' not in st.session_state:
+            st.session_state.namespace_mode = default_namespace_mode()
+        # Chapter id -> namespace it was embedded into (resolved through the namespace registry)
+        if 'chapter_namespaces' not in st.session_state:
+            st.session_state.chapter_namespaces = {}
 
     def upload_section(self) -> tuple[str, list]:
-        """Handle PDF upload and processing
+        """Handle PDF upload and processing (in memory, nothing is written to disk)
 
         Returns:
-            tuple[str, list]: Tuple containing temporary file path and extracted pages
+            tuple[str, list]: Tuple containing the uploaded file name and extracted pages
         """
         uploaded_pdf = st.sidebar.file_uploader(
             "Upload your book here (PDF)",
@@ -55,24 +73,92 @@ class Uploader():
             key='pdf_uploader'  # Add key for better state management
         )
 
+        lazy = st.sidebar.checkbox(
+            "Fast upload (extract chapter text on demand)",
+            value=True,
+            key='lazy_upload',
+            help="Show the table of contents right away and only extract the pages of the chapter you select."
+        )
+
+        backends = available_extractors()
+        default_backend = get_setting("PDF_BACKEND", DEFAULT_BACKEND)
+        backend = st.sidebar.selectbox(
+            "PDF text extraction backend",
+            options=backends,
+            index=backends.index(default_backend) if default_backend in backends else 0,
+            key='pdf_backend',
+            help="Faster backends are listed when their library is installed (see benchmarks/bench_extractors.py)."
+        )
+
+        st.sidebar.checkbox(
+            "Strip repeated headers/footers",
+            value=True,
+            key='strip_boilerplate',
+            help="Remove running headers, page numbers and copyright lines repeated across the chapter's pages, and drop near-empty pages, before chunking."
+        )
+
+        whole_book = st.sidebar.checkbox(
+            "Embed the whole book once",
+            value=st.session_state.namespace_mode == 'book',
+            key='embed_whole_book',
+            help="Embed every page into one namespace for the book the first time a chapter is selected; chapters are then searched with a page-range filter instead of being embedded separately."
+        )
+        st.session_state.namespace_mode = 'book' if whole_book else 'chapter'
+
+        st.sidebar.checkbox(
+            "Embed the whole book in the background",
+            value=False,
+            key='preembed',
+            help="Start embedding every chapter (outermost first, the highlighted one next) as soon as the book is uploaded, so the chapter you select is usually ready."
+        )
+
         if not uploaded_pdf:
             st.sidebar.warning("Please upload a book to continue!")
             st.stop()
 
         pages = []
-        temp_pdf_path = ""
+        book_name = ""
 
         try:
             with st.spinner("Processing book..."):
-                temp_pdf_path, pages = process_book(uploaded_pdf)
-                st.session_state.book_upload = pages
-                self.filepath = temp_pdf_path
+                # Only (re)process when the upload or the mode changes; reruns reuse the
+                # session's pages, and everything is keyed on a hash computed once per upload
+                file_id = (uploaded_pdf.file_id, 'lazy' if lazy else 'eager', backend)
+                if st.session_state.book_file_id != file_id:
+                    book_hash = fingerprint_upload(uploaded_pdf)
+                    if lazy:
+                        book_name, pages = open_book(uploaded_pdf, book_hash, backend=backend)
+                    else:
+                        book_name, pages = process_book(book_hash, uploaded_pdf, backend=backend)
+                    st.session_state.book_upload = pages
+                    st.session_state.book_name = book_name
+                    st.session_state.book_file_id = file_id
+                    st.session_state.book_hash = book_hash
+                book_name, pages = st.session_state.book_name, st.session_state.book_upload
+                self.uploaded_pdf = uploaded_pdf
 
         except Exception as e:
             st.error(f"Error processing PDF: {str(e)}")
             return "", []
 
-        return (temp_pdf_path, pages)
+        # Reruns find the running job: the PDF bytes are only copied, and the index only opened, to start one
+        job = self._preembed_job()
+        if st.session_state.get('preembed') and (job is None or job.failed()):
+            pc, index = config_index()
+            start_preembedding(index, config_embedding_model_simple(), uploaded_pdf.getvalue(),
+                               st.session_state.book_hash, book_name, backend=backend,
+                               strip=st.session_state.get('strip_boilerplate', True),
+                               namespace_mode=st.session_state.namespace_mode)
+
+        return (book_name, pages)
+
+    def _preembed_job(self) -> BookPreEmbedder:
+        """Background embedding job of the uploaded book (see `BookPreEmbedder`), None when it is off"""
+        if not st.session_state.get('preembed') or not st.session_state.book_hash:
+            return None
+        return get_preembedding(st.session_state.book_hash, config_embedding_model_simple(),
+                                strip=st.session_state.get('strip_boilerplate', True),
+                                namespace_mode=st.session_state.namespace_mode)
 
 
     def _display_toc(self, toc: list[dict]):
@@ -101,6 +187,9 @@ class Uploader():
             )
             if selected_data:
                 ss.selected_chapter = selected_data
+                job = self._preembed_job()
+                if job is not None:
+                    job.prioritize(selected_data['id'])
                 ss.chapter_page_range = {
                     'start': selected_data['start'],
                     'end': selected_data['end']
@@ -110,7 +199,10 @@ class Uploader():
     def display_toc(self):
         """Process and display the table of contents"""
         try:
-            chaps_dict = extract_chapter(self.filepath)
+            # Reuse the LazyBook's reader so the PDF is only parsed once
+            book = st.session_state.book_upload
+            reader = book.reader if isinstance(book, LazyBook) else None
+            chaps_dict = extract_chapter(st.session_state.book_hash, _source=self.uploaded_pdf, _reader=reader)
             toc = chaps_dict['toc']
             if not toc or toc == []:
                 st.warning("Could not successfully parse and extract book chapters!")
@@ -128,8 +220,30 @@ class Uploader():
             )
 
             filtered_chapters = [pr for pr in prange if pr['nest'] == nest_choice]
+            job = self._preembed_job()
+
+            # Refreshed on its own while the book is being embedded in the background
+            @st.fragment(run_every=2 if job is not None and not job.done() else None)
+            def chapter_table():
+                estimates = self._estimate_chapters(filtered_chapters)
+                rows = [{
+                    **ch,
+                    'est. chunks': estimates[ch['id']]['chunks'],
+                    'est. time': format_seconds(estimates[ch['id']]['seconds']),
+                    'embedding $': f"{estimates[ch['id']]['embed_cost']:.4f}",
+                    'quiz $': f"{estimates[ch['id']]['quiz_cost']:.4f}",
+                } for ch in filtered_chapters]
+                if job is not None:
+                    progress = job.progress()
+                    if progress['total']:
+                        st.caption(f"Background embedding: {progress['ready']} of {progress['total']} "
+                                   f"{'chapters' if progress['total'] > 1 else 'book'} ready"
+                                   + (f", {progress['failed']} failed" if progress['failed'] else ""))
+                    rows = [{**row, 'embedding': job.status(row['id']) or 'queued'} for row in rows]
+                st.table(rows)
+
             if filtered_chapters:
-                st.table(filtered_chapters)
+                chapter_table()
             else:
                 st.info(f"No chapters found at nesting level {nest_choice}")
 
@@ -156,6 +270,131 @@ class Uploader():
             st.error(f"Error processing table of contents: {str(e)}")
 
 
+    def _estimate_chapters(self, chapters: list[dict]) -> dict:
+        """
+        Predicted chunks, time and cost of selecting each chapter (see `estimate_chapter`), by
+            chapter id. Chapters already embedded only cost their page extraction; in book mode,
+            selecting the first chapter embeds the whole book.
+        Estimates are kept in the session until pages get extracted, chapters get embedded in the
+            background or new throughput measurements come in, not recomputed on every rerun.
+        """
+        book = st.session_state.book_upload
+        log = get_throughput_log()
+        job = self._preembed_job()
+        key = (st.session_state.book_hash, st.session_state.namespace_mode,
+               st.session_state.get('strip_boilerplate', True), embedding_backend(),
+               book.n_loaded() if isinstance(book, LazyBook) else len(book),
+               log.rate('extract'), log.rate('embed'), job.progress()[EMBEDDED] if job is not None else None)
+        cached = st.session_state.get('chapter_estimates')
+        if cached is None or cached['key'] != key:
+            cached = st.session_state.chapter_estimates = {'key': key, 'estimates': {}}
+
+        missing = [ch for ch in chapters if ch['id'] not in cached['estimates']]
+        if missing:
+            cached['estimates'].update(self._compute_estimates(missing))
+        return {ch['id']: cached['estimates'][ch['id']] for ch in chapters}
+
+    def _compute_estimates(self, chapters: list[dict]) -> dict:
+        """See `_estimate_chapters`"""
+        book = st.session_state.book_upload
+        lengths, known = page_lengths(book)
+        embeddings = config_embedding_model_simple()
+        strip = st.session_state.get('strip_boilerplate', True)
+        settings = {'chunk_size': CHUNK_SIZE, 'chunk_overlap': CHUNK_OVERLAP,
+                    'local_embeddings': embedding_backend() == 'local'}
+
+        whole_book = None
+        if st.session_state.namespace_mode == 'book':
+            unit = book_chapter(st.session_state.book_hash, st.session_state.book_name, len(book))
+            entry = lookup_namespace(unit, st.session_state.book_hash, embeddings, strip=strip, whole_book=True)
+            if entry is None or entry['status'] != READY:
+                whole_book = estimate_chapter(unit, lengths, known, **settings)
+
+        estimates = {}
+        for ch in chapters:
+            if whole_book is not None:
+                estimate = estimate_chapter(ch, lengths, known, **settings)
+                estimate.update({k: whole_book[k] for k in ('chunks', 'tokens', 'seconds', 'embed_cost')})
+            else:
+                entry = None if st.session_state.namespace_mode == 'book' else lookup_namespace(
+                    ch, st.session_state.book_hash, embeddings, strip=strip)
+                embedded = st.session_state.namespace_mode == 'book' or (entry is not None and entry['status'] == READY)
+                estimate = estimate_chapter(ch, lengths, known, embedded=embedded, **settings)
+            estimates[ch['id']] = estimate
+        return estimates
+
+    def _select_previous_version(self) -> tuple[str, bool]:
+        """
+        Let the user pick an earlier upload of this chapter (e.g. the previous edition of the book)
+            to diff against, so only new or changed chunks get embedded.
+        Defaults to the most recent upload of a chapter with the same title from another PDF.
+
+        Returns:
+            tuple[str, bool]: Namespace of the previous version (None to embed everything),
+                and whether to delete that namespace afterwards
+        """
+        title = st.session_state.selected_chapter['title']
+        previous = [m for m in ChunkManifest.list_all() if m.get('book_hash') != st.session_state.book_hash]
+        labels = {m['namespace']: f"{m.get('book_name', '?')} - {m.get('chapter_title', '?')} ({m['namespace']}, {m['n_chunks']} chunks)"
+                  for m in previous}
+        options = [None] + [m['namespace'] for m in previous]
+        default = next((i + 1 for i, m in enumerate(previous) if m.get('chapter_title') == title), 0)
+
+        with st.expander("Revised edition? Reuse vectors from a previous upload"):
+            previous_ns = st.selectbox(
+                "Previous version of this chapter",
+                options=options,
+                index=default,
+                format_func=lambda ns: "None (embed every chunk)" if ns is None else labels[ns],
+                key='previous_version'
+            )
+            replace = st.checkbox(
+                "Delete the previous version's vectors afterwards",
+                value=True,
+                help="Its unchanged chunks are copied into the new version, its removed ones would stay searchable.",
+                key='replace_previous_version'
+            )
+        return previous_ns, replace
+
+    def _embed_book(self, index, embeddings) -> str:
+        """
+        Embed every page of the uploaded book into its book namespace, once per PDF and
+            chunking/model configuration (see `NamespaceRegistry`).
+        Chunks carry the title of the innermost chapter of their page, so references still
+            name the chapter.
+
+        Returns:
+            str: The book namespace
+        """
+        book = st.session_state.book_upload
+        strip = st.session_state.get('strip_boilerplate', True)
+        whole_book = book_chapter(st.session_state.book_hash, st.session_state.book_name, len(book))
+        namespace = resolve_namespace(whole_book, st.session_state.book_hash, embeddings,
+                                      strip=strip, whole_book=True)['namespace']
+        registry = get_namespace_registry()
+        if registry.is_ready(namespace):
+            st.info(f"The book is already embedded ({namespace}), searching the chapter's pages in it.")
+            if namespace not in st.session_state.uploaded_namespaces:
+                st.session_state.uploaded_namespaces.append(namespace)
+            return namespace
+
+        start = time.time()
+        page_titles = page_chapter_titles(st.session_state.chapter_extracted, len(book),
+                                          default=st.session_state.book_name)
+        with st.spinner(f"Embedding the whole book ({len(book)} pages)..."):
+            book_stats = stream_chapter(
+                index, embeddings, book, whole_book,
+                st.session_state.book_hash, st.session_state.book_name,
+                strip=strip, page_titles=page_titles, namespace=namespace,
+                progress=lambda message: st.write(f"**{message}.**")
+            )
+        registry.set_status(namespace, READY, book_stats['chunks'])
+        st.write(f"**Embedded {book_stats['embedded']} chunks from {book_stats['pages']} pages into {namespace}**")
+        st.write(f"Time taken: {time.time() - start:.2f} seconds")
+        if namespace not in st.session_state.uploaded_namespaces:
+            st.session_state.uploaded_namespaces.append(namespace)
+        return namespace
+
     def embed_chapter(self):
         """Embed and store selected chapter in vector store"""
         try:
@@ -169,65 +408,86 @@ class Uploader():
                 return
 
             chapter_id = st.session_state.selected_chapter['id']
+            book_mode = st.session_state.namespace_mode == 'book'
+            previous_ns, replace_previous = (None, False) if book_mode else self._select_previous_version()
 
             if st.button("Select Chapter"):
-                # check if chapter_id already exists in the vector store
-                pc, index = config_pinecone()
-                ns = index.describe_index_stats()['namespaces']
-                if chapter_id in ns:
-                    st.warning(f"Check 1.. Chapter ID {chapter_id} already exists in the vector store.")
-                    if chapter_id not in st.session_state['uploaded_namespaces']:
-                        st.session_state['uploaded_namespaces'].append(chapter_id)
+                job = self._preembed_job()
+                # The background job owns the chapters it has not embedded yet: let it do this one
+                # next rather than embedding the same namespace twice at once
+                if job is not None and not job.done() and job.status(chapter_id) not in (EMBEDDED, FAILED):
+                    with st.spinner("This chapter is being embedded in the background, waiting for it..."):
+                        job.wait(chapter_id)
+
+                # Steer away from selections that would take too long
+                level, message = check_limits(self._estimate_chapters([st.session_state.selected_chapter])[chapter_id])
+                if level == 'refuse':
+                    st.error(message)
+                    return
+                if level == 'warn':
+                    st.warning(message)
+
+                if book_mode:
+                    # One namespace for the whole book; the chapter is a page-range filter over it
+                    pc, index = config_index()
+                    namespace = self._embed_book(index, config_embedding_model_simple())
+                    st.session_state.chapter_namespaces[chapter_id] = namespace
+
+                    chapter = st.session_state.selected_chapter
+                    with st.spinner("Extracting chapter pages..."):
+                        pages = chapter_pages(st.session_state.book_upload, chapter)
+                    chunks, _ = build_chunks(pages, chapter, strip=st.session_state.get('strip_boilerplate', True))
+                    st.session_state['selected_chapter_chunks'] = chunks
+                    st.success(f"Chapter ID {chapter_id} selected.")
+                    return
+
+                # The namespace is addressed by the book's content, the page range, the chunking
+                # settings and the embedding model: the local registry knows whether it is already
+                # embedded (by any session), without asking the vector store
+                pc, index = config_index()
+                embeddings = config_embedding_model_simple()
+                strip = st.session_state.get('strip_boilerplate', True)
+                entry = resolve_namespace(st.session_state.selected_chapter, st.session_state.book_hash,
+                                          embeddings, strip=strip)
+                namespace = entry['namespace']
+                st.session_state.chapter_namespaces[chapter_id] = namespace
+                if entry['status'] == READY:
+                    st.warning(f"Chapter ID {chapter_id} is already embedded in the vector store ({namespace}).")
+                    if namespace not in st.session_state['uploaded_namespaces']:
+                        st.session_state['uploaded_namespaces'].append(namespace)
                     embed_flag = False
 
-                if chapter_id in st.session_state['uploaded_namespaces']:
-                    st.warning(f"Check 2.. Chapter ID {chapter_id} already exists in the vector store.")
-                    if chapter_id not in st.session_state['uploaded_namespaces']:
-                        st.session_state['uploaded_namespaces'].append(chapter_id)
-                    embed_flag = False
+                previous = previous_version(previous_ns)
 
                 start_total = time.time()
 
                 ## PAGE EXTRACTION
                 start = time.time()
-                # Get page range for selected chapter
-                start_page = st.session_state.selected_chapter['start']
-                end_page = st.session_state.selected_chapter['end']
-                chapter_id = st.session_state.selected_chapter['id']
+                chapter = st.session_state.selected_chapter
 
                 # Get relevant pages from book upload
-                chapter_pages = st.session_state.book_upload[start_page-1:end_page]
-
-                # Extract text from pages
-                texts, metadatas = [page.page_content for page in chapter_pages], [page.metadata for page in chapter_pages]
-                st.write(f"**Extracted {len(texts)} pages from chapter: {st.session_state.selected_chapter['title']}**")
+                # (with a LazyBook, only pages not extracted before are parsed here)
+                book = st.session_state.book_upload
+                n_loaded = book.n_loaded() if isinstance(book, LazyBook) else len(book)
+                with st.spinner("Extracting chapter pages..."):
+                    pages = chapter_pages(book, chapter)
+                if isinstance(book, LazyBook):
+                    st.write(f"Newly extracted pages: {book.n_loaded() - n_loaded} (cached: {book.n_loaded()} of {len(book)})")
+                st.write(f"**Extracted {len(pages)} pages from chapter: {chapter['title']}**")
                 st.write(f"Time taken: {time.time() - start:.2f} seconds")
 
-                ## TEXT SPLITTING
+                ## CLEANING AND TEXT SPLITTING
                 start = time.time()
-                # Split into chunks
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200,
-                    length_function=len,
-                    separators=["\n\n", "\n", " ", ""]
-                )
-
-                chunks = text_splitter.create_documents(texts, metadatas)
+                # Boilerplate removal, then one pass over the whole chapter; chunks are offsets into
+                # the chapter text and carry the chapter metadata
+                chunks, clean_stats = build_chunks(pages, chapter, strip=strip)
+                if clean_stats:
+                    st.write(f"**Removed {clean_stats['lines_removed']} repeated header/footer lines and "
+                             f"{clean_stats['pages_dropped']} near-empty pages** "
+                             f"({clean_stats['chars_before']:,} -> {clean_stats['chars_after']:,} characters)")
                 st.write(f"**Split into {len(chunks)} chunks**")
                 st.write(f"Time taken: {time.time() - start:.2f} seconds")
 
-                ## METADATA
-                start = time.time()
-                # Add chapter metadata to chunks
-                for chunk in chunks:
-                    chunk.metadata['chapter_title'] = st.session_state.selected_chapter['title']
-                    chunk.metadata['chapter_id'] = chapter_id
-                    chunk.metadata['chapter_start_page'] = start_page
-                    chunk.metadata['chapter_end_page'] = end_page
-                st.write(f"**Added metadata to {len(chunks)} chunks**")
-                st.write(f"Time taken: {time.time() - start:.2f} seconds")
-
                 ## Adding chunks to session state
                 if 'selected_chapter_chunks' not in st.session_state:
                     st.session_state['selected_chapter_chunks'] = []
@@ -236,38 +496,41 @@ class Uploader():
                 st.session_state['selected_chapter_chunks'] = chunks
 
                 if embed_flag:
-                    ## VECTOR STORE
-                    start = time.time()
-                    # Initialize components
-                    embeddings = config_embedding_model_simple()
-
-                    # Create vector store
-                    vectorstore = PineconeVectorStore(
-                        index=index,
-                        embedding=embeddings,
-                        namespace=chapter_id
-                    )
-                    st.write(f"**Vector store created.**")
-                    st.write(f"Time taken: {time.time() - start:.2f} seconds")
-
                     ## EMBEDDING
                     start = time.time()
 
-                    batch_size = 100 # Pinecone recommends 100
-                    total_chunks = len(chunks)
-
-                    with st.spinner(f"Embedding {total_chunks} chunks..."):
-                        for i in range(0, total_chunks, batch_size):
-                            batch = chunks[i:i + batch_size]
-                            vectorstore.add_documents(batch)
-                            st.write(f'**Processed {min(i + batch_size, total_chunks)} of {total_chunks} chunks.**')
-
-                    st.write(f"Embedded {total_chunks} chunks")
+                    # Diffed against the previous version, if any: only new chunks are embedded
+                    with st.spinner(f"Embedding {len(chunks)} chunks..."):
+                        delta = embed_chunks(
+                            index, embeddings, chunks, chapter,
+                            st.session_state.book_hash, st.session_state.book_name,
+                            previous=previous, namespace=namespace,
+                            progress=lambda message: st.write(f"**{message}.**")
+                        ).summary()
+                    get_namespace_registry().set_status(namespace, READY, len(chunks))
+                    if previous is not None:
+                        st.write(f"**Compared with {previous.namespace}: {delta['added']} new, "
+                                 f"{delta['unchanged']} unchanged, {delta['removed']} removed chunks**")
+
+                    if replace_previous and previous is not None and previous.namespace != namespace:
+                        retire_namespace(index, previous.namespace)
+                        if previous.namespace in st.session_state.uploaded_namespaces:
+                            st.session_state.uploaded_namespaces.remove(previous.namespace)
+                        st.write(f"Deleted previous version {previous.namespace}")
+
+                    if delta['resumed']:
+                        st.write(f"**Resumed an interrupted upload: {delta['resumed']} chunks were already stored**")
+                    st.write(f"Embedded {delta['added']} chunks, reused {delta['unchanged']}")
+                    if isinstance(embeddings, CachedEmbeddings):
+                        cache_stats = embeddings.stats()
+                        st.write(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} sent to the API "
+                                 f"({cache_stats['hit_rate']:.0%} hit rate)")
                     st.write(f"Time taken: {time.time() - start:.2f} seconds")
                     st.write(f"Total time taken: {time.time() - start_total:.2f} seconds")
                     st.success(f"Successfully embedded chapter: {st.session_state.selected_chapter['title']} -- ID {chapter_id}")
 
-                    st.session_state.uploaded_namespaces.append(chapter_id)
+                    if namespace not in st.session_state.uploaded_namespaces:
+                        st.session_state.uploaded_namespaces.append(namespace)
 
                 st.success(f"Chapter ID {chapter_id} selected.")
 
@@ -7,13 +7,15 @@ from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
 
-from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
 
-from utils.storage import config_pinecone
+from utils.storage import config_index, get_vectorstore
 from utils.llm import config_llm, config_embedding_model
 from utils.stream import StreamHandler
 from utils.chat_utils import enable_chat_history, display_single_message
+from utils.retrieval import retrieval_target
+from utils.lifecycle import needs_restore
+from utils.ingest import restore_namespace
 
 import os
 
@@ -29,10 +31,10 @@ class RAGTest:
     def __init__(self):
         self.llm = config_llm()
         self.embedding_model = config_embedding_model()
-        self.pc, self.index = config_pinecone()
+        self.pc, self.index = config_index()
 
     def _get_vectorstore(self, namespace: str):
-        return PineconeVectorStore(index=self.index, embedding=self.embedding_model, namespace=namespace)
+        return get_vectorstore(self.index, self.embedding_model, namespace=namespace)
 
     def save_file(self, file):
         """
@@ -52,12 +54,16 @@ class RAGTest:
         return file_path
 
     @st.spinner("Analyzing the document...")
-    def set_up_chain(self, namespace):
+    def set_up_chain(self, namespace, search_filter: dict=None):
         """
         Set up the chain
+        `search_filter` restricts retrieval to the chapter's pages in a book namespace
         """
         vector_store = self._get_vectorstore(namespace)
-        retriever = vector_store.as_retriever(search_type='mmr', search_kwargs={"k": 5})
+        search_kwargs = {"k": 5}
+        if search_filter is not None:
+            search_kwargs["filter"] = search_filter
+        retriever = vector_store.as_retriever(search_type='mmr', search_kwargs=search_kwargs)
 
         template = """
         Given the following conversation respond to the best of your ability.
@@ -120,9 +126,23 @@ class RAGTest:
         st.sidebar.json(st.session_state['selected_chapter'])
 
         chapter_id = st.session_state['selected_chapter']['id']
-        if chapter_id not in st.session_state['uploaded_namespaces']:
+        namespace, search_filter = retrieval_target(st.session_state['selected_chapter'],
+                                                    st.session_state.get('chapter_namespaces'),
+                                                    st.session_state.get('namespace_mode'))
+        if namespace not in st.session_state['uploaded_namespaces']:
             st.warning(f"Chapter ID {chapter_id} is not in the vector store. Please embed first (Page 2)")
             st.stop()
+        if needs_restore(namespace):
+            try:
+                with st.spinner("This chapter was evicted from the vector store to save space, embedding it again..."):
+                    restore_namespace(self.index, self.embedding_model, st.session_state['book_upload'],
+                                      st.session_state['book_hash'], st.session_state['book_name'],
+                                      st.session_state['chapter_extracted'], namespace)
+            except ValueError as e:
+                # The current upload is another book, or its chapters no longer match the evicted one
+                st.error(f"This chapter could not be embedded again ({e}). "
+                         "Please re-upload the book it was embedded from on the Upload page.")
+                st.stop()
         # pc, index = config_pinecone()
         # ns = index.describe_index_stats()['namespaces']
         # if chapter_id not in ns:
@@ -136,7 +156,7 @@ class RAGTest:
             # Display user message and stores in session state
             display_single_message(user_input, 'user')
 
-            chain = self.set_up_chain(namespace=chapter_id)
+            chain = self.set_up_chain(namespace=namespace, search_filter=search_filter)
 
             result = chain.invoke(
                 {'question': user_input,},
@@ -11,11 +11,14 @@ from langchain.schema import HumanMessage, SystemMessage
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
 
-from utils.storage import config_pinecone
+from utils.storage import config_index, get_vectorstore
 from utils.llm import config_llm, config_embedding_model, config_llm_simple
 from utils.stream import StreamHandler
 from utils.chat_utils import enable_chat_history, display_single_message
 from rag.quiz_agent import get_quiz_agent
+from utils.retrieval import retrieval_target
+from utils.lifecycle import needs_restore
+from utils.ingest import restore_namespace
 from utils.quiz_format import format_quiz
 
 import random
@@ -38,11 +41,12 @@ st.sidebar.write("Selected Chapter:")
 st.sidebar.json(st.session_state['selected_chapter'])
 
 class QuizGen():
-    def __init__(self, namespace):
+    def __init__(self, namespace, search_filter: dict=None):
         self.llm: ChatOpenAI = config_llm_simple()
         self.embedding_model = config_embedding_model()
-        self.pc, self.index = config_pinecone()
-        self.vector_store = PineconeVectorStore(index=self.index, embedding=self.embedding_model, namespace=namespace)
+        self.pc, self.index = config_index()
+        self.vector_store = get_vectorstore(self.index, self.embedding_model, namespace=namespace)
+        self.search_filter = search_filter
 
     def get_chap(self) -> tuple[list, list]:
         """
@@ -192,7 +196,7 @@ class QuizGen():
         keywords = self.clean_keywords(n_quiz)
 
         # Set up the agent for quiz
-        quiz_agent = get_quiz_agent(self.llm, self.vector_store)
+        quiz_agent = get_quiz_agent(self.llm, self.vector_store, search_filter=self.search_filter)
 
         bank = []
         ### Generate quiz
@@ -219,7 +223,10 @@ class QuizGen():
 
 if __name__ == "__main__":
     # Initialize the QuizGen class
-    quiz_gen = QuizGen(namespace=st.session_state['selected_chapter']['id'])
+    namespace, search_filter = retrieval_target(st.session_state['selected_chapter'],
+                                                st.session_state.get('chapter_namespaces'),
+                                                st.session_state.get('namespace_mode'))
+    quiz_gen = QuizGen(namespace=namespace, search_filter=search_filter)
 
     if 'quiz_bank' not in st.session_state:
         st.session_state['quiz_bank'] = None
@@ -232,8 +239,19 @@ if __name__ == "__main__":
             st.warning("Quiz bank already generated. Please reload to generate a new one.")
         else:
             # Generate quiz bank
+            if needs_restore(namespace):
+                try:
+                    with st.spinner("This chapter was evicted from the vector store to save space, embedding it again..."):
+                        restore_namespace(quiz_gen.index, quiz_gen.embedding_model, st.session_state['book_upload'],
+                                          st.session_state['book_hash'], st.session_state['book_name'],
+                                          st.session_state['chapter_extracted'], namespace)
+                except ValueError as e:
+                    # The current upload is another book, or its chapters no longer match the evicted one
+                    st.error(f"This chapter could not be embedded again ({e}). "
+                             "Please re-upload the book it was embedded from on the Upload page.")
+                    st.stop()
             with st.spinner("Generating..."):
-                quiz_gen = QuizGen(namespace=st.session_state['selected_chapter']['id'])
+                quiz_gen = QuizGen(namespace=namespace, search_filter=search_filter)
                 quiz_bank = quiz_gen.generate(10)
                 st.session_state['quiz_bank'] = quiz_bank
                 st.success("Quiz bank generated successfully!")
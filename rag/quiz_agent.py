@@ -33,9 +33,11 @@ class Quiz(BaseModel):
     correct_answer: str = Field(description="Correct answer")
     explanation: str = Field(description="Explanation for the answer")
 
-def get_quiz_agent(llm: ChatOpenAI, vector_store: PineconeVectorStore):
+def get_quiz_agent(llm: ChatOpenAI, vector_store: PineconeVectorStore, search_filter: dict=None):
     """
     Get the quiz agent.
+    `search_filter` restricts retrieval to a chapter's pages when the vector store holds
+        a whole book (see `utils.retrieval.retrieval_target`).
     """
     prompt_template = '''
     Given the following context, generate exactly 1 quiz based on the context.
@@ -88,7 +90,7 @@ def get_quiz_agent(llm: ChatOpenAI, vector_store: PineconeVectorStore):
     )
 
     def _retrieve(state: State):
-        retrieved_docs = vector_store.similarity_search(state['keyword'], k=3)
+        retrieved_docs = vector_store.similarity_search(state['keyword'], k=3, filter=search_filter)
 
         return {
             "context": retrieved_docs,
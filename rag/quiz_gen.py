@@ -12,7 +12,7 @@ from langchain.schema import HumanMessage, SystemMessage
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
 
-from utils.storage import config_pinecone
+from utils.storage import config_index, get_vectorstore
 from utils.llm import config_llm, config_embedding_model, config_llm_simple
 from utils.stream import StreamHandler
 from utils.chat_utils import enable_chat_history, display_single_message
@@ -25,11 +25,12 @@ import time
 
 
 class QuizGenTab():
-    def __init__(self, namespace):
+    def __init__(self, namespace, search_filter: dict=None):
         self.llm: ChatOpenAI = config_llm_simple()
         self.embedding_model = config_embedding_model()
-        self.pc, self.index = config_pinecone()
-        self.vector_store = PineconeVectorStore(index=self.index, embedding=self.embedding_model, namespace=namespace)
+        self.pc, self.index = config_index()
+        self.vector_store = get_vectorstore(self.index, self.embedding_model, namespace=namespace)
+        self.search_filter = search_filter
 
     def get_chap(self) -> tuple[list, list]:
         """
@@ -179,7 +180,7 @@ class QuizGenTab():
         keywords = self.clean_keywords(n_quiz)
 
         # Set up the agent for quiz
-        quiz_agent = get_quiz_agent(self.llm, self.vector_store)
+        quiz_agent = get_quiz_agent(self.llm, self.vector_store, search_filter=self.search_filter)
 
         bank = []
         ### Generate quiz
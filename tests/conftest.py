@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Process-wide singletons that live in the cache directory
+SINGLETONS = [
+    ('utils.book_cache', '_book_cache'),
+    ('utils.chunk_store', '_chunk_store'),
+    ('utils.embedding_cache', '_embedding_store'),
+    ('utils.estimate', '_throughput_log'),
+    ('utils.registry', '_namespace_registry'),
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Every test gets its own cache directory (and fresh singletons over it) and the local vector backend"""
+    monkeypatch.setenv("TRAZEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    for module, name in SINGLETONS:
+        monkeypatch.setattr(f"{module}.{name}", None)
+    return tmp_path / "cache"
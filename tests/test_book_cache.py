@@ -0,0 +1,61 @@
+import os
+
+from langchain_core.documents import Document
+
+from utils.book_cache import BookCache
+
+
+BOOK_HASH = 'c' * 64
+
+
+def page(i: int) -> Document:
+    return Document(page_content=f"text of page {i}", metadata={'source': "/tmp/upload.pdf", 'page': i, 'page_label': str(i + 1)})
+
+
+def test_pages_saved_incrementally(tmp_path):
+    cache = BookCache(str(tmp_path))
+    assert cache.load_pages(BOOK_HASH) == (0, {})
+
+    cache.save_pages(BOOK_HASH, {0: page(0), 1: page(1)}, 10)
+    cache.save_pages(BOOK_HASH, {5: page(5)}, 10)
+    n_pages, pages = cache.load_pages(BOOK_HASH, source="book.pdf")
+
+    assert n_pages == 10
+    assert sorted(pages) == [0, 1, 5]
+    assert pages[5].page_content == "text of page 5"
+    assert pages[5].metadata == {'source': "book.pdf", 'page': 5, 'page_label': "6"}
+
+
+def test_parts_are_merged(tmp_path):
+    cache = BookCache(str(tmp_path))
+    for i in range(BookCache.MAX_PARTS + 1):
+        cache.save_pages(BOOK_HASH, {i: page(i)}, 40)
+    parts_dir = os.path.join(str(tmp_path), BOOK_HASH, 'pages.parts')
+    assert len(os.listdir(parts_dir)) == BookCache.MAX_PARTS + 1
+
+    n_pages, pages = cache.load_pages(BOOK_HASH)
+    assert os.listdir(parts_dir) == []
+    assert (n_pages, sorted(pages)) == (40, list(range(BookCache.MAX_PARTS + 1)))
+    assert cache.load_pages(BOOK_HASH)[1].keys() == pages.keys()
+
+
+def test_merge_keeps_unmerged_files(tmp_path):
+    cache = BookCache(str(tmp_path))
+    for i in range(BookCache.MAX_PARTS + 1):
+        cache.save_pages(BOOK_HASH, {i: page(i)}, 40)
+    parts_dir = os.path.join(str(tmp_path), BOOK_HASH, 'pages.parts')
+    with open(os.path.join(parts_dir, 'tmpabc123.tmp'), 'w') as f: # a concurrent writer's temp file
+        f.write('{"n_pages": 40, "pa')
+    with open(os.path.join(parts_dir, '000099-deadbeef.json'), 'w') as f: # unreadable part
+        f.write('{"n_pages": 40, "pa')
+
+    n_pages, pages = cache.load_pages(BOOK_HASH)
+    assert sorted(os.listdir(parts_dir)) == ['000099-deadbeef.json', 'tmpabc123.tmp']
+    assert (n_pages, sorted(pages)) == (40, list(range(BookCache.MAX_PARTS + 1)))
+
+
+def test_backends_are_kept_apart(tmp_path):
+    cache = BookCache(str(tmp_path))
+    cache.save_pages(BOOK_HASH, {0: page(0)}, 3, backend='other')
+    assert cache.load_pages(BOOK_HASH) == (0, {})
+    assert sorted(cache.load_pages(BOOK_HASH, backend='other')[1]) == [0]
@@ -0,0 +1,126 @@
+import io
+
+import pytest
+from langchain_core.documents import Document
+from pypdf import PdfReader, PdfWriter
+
+from benchmarks.sample_pdf import sample_pages, sample_pdf
+from utils.delta import ChunkManifest
+from utils.ingest import build_chunks, embed_chunks, ingest_book, stream_chapter
+from utils.local_embeddings import HashingEmbeddings
+from utils.local_store import LocalIndex
+from utils.registry import get_namespace_registry
+
+
+BOOK_HASH = 'd' * 64
+CHAPTER = {'title': "Chapter", 'nest': 1, 'start': 1, 'end': 60, 'id': 'chapter'}
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """Records the texts it embeds; raises on request number `fail_at` (1-based)"""
+    def __init__(self, fail_at: int=None):
+        super().__init__(dimensions=32)
+        self.texts = []
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ConnectionError("embedding service unavailable")
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def chapter_pages(changed_page: int=None) -> list[Document]:
+    pages = []
+    for i in range(60):
+        words = [f"p{i}w{j}" for j in range(900)]
+        if i == changed_page:
+            words[400:420] = ["revised"] * 20
+        pages.append(Document(page_content=" ".join(words), metadata={'page': i}))
+    return pages
+
+
+@pytest.fixture
+def sequential(monkeypatch):
+    """One embedding request at a time, so the interruption point is deterministic"""
+    monkeypatch.setenv("EMBED_CONCURRENCY", "1")
+    monkeypatch.setenv("UPSERT_CONCURRENCY", "1")
+
+
+def test_stream_chapter_resumes_after_interruption(tmp_path, sequential):
+    index = LocalIndex(str(tmp_path / 'index'))
+    pages = chapter_pages()
+    with pytest.raises(ConnectionError):
+        stream_chapter(index, CountingEmbeddings(fail_at=2), pages, CHAPTER, BOOK_HASH, 'book.pdf',
+                       strip=False, namespace='ns')
+    partial = ChunkManifest.load('ns')
+    assert not partial.info['complete'] and len(partial.chunks) == 256 # the first request
+
+    embeddings = CountingEmbeddings()
+    stats = stream_chapter(index, embeddings, pages, CHAPTER, BOOK_HASH, 'book.pdf', strip=False, namespace='ns')
+
+    assert stats['resumed'] == 256
+    assert stats['embedded'] == len(embeddings.texts) == stats['chunks'] - 256
+    manifest = ChunkManifest.load('ns')
+    assert manifest.info['complete'] and len(manifest.chunks) == stats['chunks']
+    assert index.describe_index_stats()['namespaces']['ns']['vector_count'] == stats['chunks']
+
+
+def test_embed_chunks_resumes_a_streamed_run(tmp_path, sequential):
+    index = LocalIndex(str(tmp_path / 'index'))
+    pages = chapter_pages()
+    with pytest.raises(ConnectionError):
+        stream_chapter(index, CountingEmbeddings(fail_at=2), pages, CHAPTER, BOOK_HASH, 'book.pdf',
+                       strip=False, namespace='ns')
+
+    # Both pipelines give chunks the same ids: the whole-chapter path picks up where streaming stopped
+    chunks, _ = build_chunks(pages, CHAPTER, strip=False)
+    embeddings = CountingEmbeddings()
+    plan = embed_chunks(index, embeddings, chunks, CHAPTER, BOOK_HASH, 'book.pdf', namespace='ns')
+
+    assert plan.resumed == 256
+    assert len(embeddings.texts) == len(chunks) - 256
+    assert ChunkManifest.load('ns').info['complete']
+
+
+def test_revision_embeds_only_changed_chunks(tmp_path):
+    index = LocalIndex(str(tmp_path / 'index'))
+    first, _ = build_chunks(chapter_pages(), CHAPTER, strip=False)
+    embed_chunks(index, CountingEmbeddings(), first, CHAPTER, BOOK_HASH, 'book.pdf', namespace='v1')
+
+    revised, _ = build_chunks(chapter_pages(changed_page=30), CHAPTER, strip=False)
+    embeddings = CountingEmbeddings()
+    plan = embed_chunks(index, embeddings, revised, CHAPTER, 'e' * 64, 'book.pdf',
+                        previous=ChunkManifest.load('v1'), namespace='v2')
+
+    assert 0 < len(plan.added) < len(revised) // 10
+    assert sorted(embeddings.texts) == sorted(revised.chunk_text(i) for i in plan.added)
+    assert len(plan.unchanged) == len(revised) - len(plan.added)
+    assert index.describe_index_stats()['namespaces']['v2']['vector_count'] == len(revised)
+
+
+def outlined_pdf(path, pages: list[list[str]], chapters: int) -> str:
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(sample_pdf(pages))))
+    per_chapter = len(pages) // chapters
+    for i in range(chapters):
+        writer.add_outline_item(f"Chapter {i + 1}", i * per_chapter)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer.write(str(path))
+    return str(path)
+
+
+def test_ingest_book_retires_the_previous_edition(tmp_path):
+    index = LocalIndex(str(tmp_path / 'index'))
+    pages = sample_pages(12)
+    first = ingest_book(outlined_pdf(tmp_path / 'v1' / 'book.pdf', pages, 3), index, HashingEmbeddings(dimensions=32))
+    old = {entry['namespace'] for entry in get_namespace_registry().list_all(first['book_hash'])}
+
+    pages[5] = pages[5][:10] + ["a sentence only in the revised edition"] + pages[5][10:]
+    second = ingest_book(outlined_pdf(tmp_path / 'v2' / 'book.pdf', pages, 3), index, HashingEmbeddings(dimensions=32))
+
+    assert second['chapters'] == second['retired'] == 3 and second['reused'] > 0
+    assert get_namespace_registry().list_all(first['book_hash']) == []
+    assert set(index.describe_index_stats()['namespaces']).isdisjoint(old)
+    assert all(ChunkManifest.load(ns) is None for ns in old)
@@ -0,0 +1,40 @@
+import builtins
+
+import numpy as np
+
+from utils.estimate import DEFAULT_RATES, ThroughputLog, estimate_chapter
+
+
+def test_rates_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'throughput.json')
+    writer, reader = ThroughputLog(path), ThroughputLog(path)
+    assert reader.rate('embed') == DEFAULT_RATES['embed']
+
+    writer.record('embed', 100, 2.0)
+    assert reader.rate('embed') == 0.02
+    writer.record('embed', 100, 4.0)
+    assert reader.rate('embed') == 0.03
+
+
+def test_rate_does_not_reread_an_unchanged_file(tmp_path, monkeypatch):
+    log = ThroughputLog(str(tmp_path / 'throughput.json'))
+    log.record('extract', 10, 1.0)
+    log.rate('extract')
+
+    opened = []
+    real_open = builtins.open
+    monkeypatch.setattr(builtins, 'open', lambda *args, **kwargs: opened.append(args[0]) or real_open(*args, **kwargs))
+    for _ in range(10):
+        assert log.rate('extract') == 0.1
+    assert opened == []
+
+
+def test_estimate_chapter_skips_embedding_when_embedded():
+    chapter = {'start': 1, 'end': 4}
+    lengths, known = np.full(4, 1600.0), np.array([True, True, False, False])
+    fresh = estimate_chapter(chapter, lengths, known)
+    embedded = estimate_chapter(chapter, lengths, known, embedded=True)
+
+    assert fresh['chunks'] == embedded['chunks'] == 8
+    assert embedded['embed_cost'] == 0.0 < fresh['embed_cost']
+    assert embedded['seconds'] == 2 * DEFAULT_RATES['extract']
@@ -0,0 +1,36 @@
+from langchain_core.documents import Document
+
+from utils.delta import ChunkManifest
+from utils.ingest import build_chunks, embed_chunks, stream_chapter
+from utils.local_embeddings import HashingEmbeddings
+from utils.local_store import LocalIndex
+
+
+BOOK_HASH = 'b' * 64
+
+
+def book_pages(n: int) -> list[Document]:
+    pages = []
+    for i in range(n):
+        # Running header on every page, a second one on the first 40 pages only (boilerplate
+        # within the first windows of 32 pages, not over the chapter)
+        lines = ["Introduction to Testing", f"Page {i + 1}"]
+        if i < 40:
+            lines.insert(0, "Section notes")
+        lines += [f"Sentence {j} of page {i} talks about topic {(i * 7 + j) % 13}." for j in range(20)]
+        pages.append(Document(page_content="\n".join(lines), metadata={'page': i}))
+    return pages
+
+
+def test_stream_chapter_matches_build_chunks(tmp_path):
+    pages = book_pages(150)
+    chapter = {'title': "Everything", 'nest': 1, 'start': 1, 'end': len(pages), 'id': 'chapter'}
+    index = LocalIndex(str(tmp_path / 'index'))
+    embeddings = HashingEmbeddings(dimensions=64)
+
+    chunks, _ = build_chunks(pages, chapter)
+    embed_chunks(index, embeddings, chunks, chapter, BOOK_HASH, 'book.pdf', namespace='whole')
+    stats = stream_chapter(index, embeddings, pages, chapter, BOOK_HASH, 'book.pdf', window=32, namespace='streamed')
+
+    assert stats['chunks'] == len(chunks)
+    assert ChunkManifest.load('streamed').chunks == ChunkManifest.load('whole').chunks
@@ -0,0 +1,51 @@
+import numpy as np
+
+from utils.lifecycle import NamespaceLifecycle
+from utils.local_store import LocalIndex
+from utils.registry import EVICTED, READY, get_namespace_registry
+
+
+def embed(index: LocalIndex, book_hash: str, n: int, last_access: float) -> str:
+    """Register a ready namespace with `n` vectors in the index"""
+    registry = get_namespace_registry()
+    namespace = registry.resolve(book_hash, 1, 10, {'chunk_size': 1000}, 'model')['namespace']
+    rng = np.random.default_rng(n)
+    index.upsert([{'id': f"{namespace}-{i}", 'values': rng.normal(size=4).tolist(), 'metadata': {}} for i in range(n)],
+                 namespace=namespace)
+    registry.set_status(namespace, READY, n)
+    registry._conn.execute("UPDATE namespaces SET last_access = ?, updated = ? WHERE namespace = ?",
+                           (last_access, last_access, namespace))
+    registry._conn.commit()
+    return namespace
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    index = LocalIndex(str(tmp_path / 'index'))
+    old, middle, recent = (embed(index, h * 64, 10, t) for h, t in (('a', 100), ('b', 200), ('c', 300)))
+
+    evicted = NamespaceLifecycle(index, budget=15, min_idle=0).enforce()
+
+    assert evicted == [old, middle]
+    assert get_namespace_registry().get(old)['status'] == EVICTED
+    assert get_namespace_registry().get(recent)['status'] == READY
+    assert set(index.describe_index_stats()['namespaces']) == {recent}
+
+
+def test_keeps_recent_and_kept_namespaces(tmp_path):
+    index = LocalIndex(str(tmp_path / 'index'))
+    old = embed(index, 'a' * 64, 10, 100)
+    embed(index, 'b' * 64, 10, 2e9) # used "now"
+
+    lifecycle = NamespaceLifecycle(index, budget=5, min_idle=600)
+    assert lifecycle.enforce(keep=[old]) == []
+
+
+def test_only_counts_its_own_index(tmp_path):
+    index, other = LocalIndex(str(tmp_path / 'index')), LocalIndex(str(tmp_path / 'other'))
+    mine = embed(index, 'a' * 64, 10, 200)
+    theirs = embed(other, 'b' * 64, 100, 100)
+
+    # The other index's namespaces neither count against this budget nor get evicted
+    assert NamespaceLifecycle(index, budget=20, min_idle=0).enforce() == []
+    assert NamespaceLifecycle(index, budget=5, min_idle=0).enforce() == [mine]
+    assert get_namespace_registry().get(theirs)['status'] == READY
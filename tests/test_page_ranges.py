@@ -0,0 +1,36 @@
+from utils.pdf_process import page_ranges
+
+
+def entry(title: str, nest: int, page: int) -> dict:
+    return {'title': title, 'nest': nest, 'page': page}
+
+
+def test_nested_chapters_end_at_the_next_sibling_or_parent():
+    chapters = [
+        entry("Part I", 1, 1),
+        entry("Chapter 1", 2, 2),
+        entry("Section 1.1", 3, 3),
+        entry("Chapter 2", 2, 10),
+        entry("Part II", 1, 20),
+        entry("Chapter 3", 2, 21),
+    ]
+    ranges = {r['title']: (r['start'], r['end']) for r in page_ranges(chapters, 30)}
+    assert ranges == {
+        "Part I": (1, 20),
+        "Chapter 1": (2, 10),
+        "Section 1.1": (3, 10),
+        "Chapter 2": (10, 20),
+        "Part II": (20, 30),
+        "Chapter 3": (21, 30),
+    }
+
+
+def test_ids_and_order():
+    ranges = page_ranges([entry("A", 1, 1), entry("B", 1, 5)], 9)
+    assert [r['title'] for r in ranges] == ["A", "B"]
+    assert [r['id'] for r in ranges] == ["ch_1_1_5", "ch_1_5_9"]
+    assert [r['nest'] for r in ranges] == [1, 1]
+
+
+def test_empty_outline():
+    assert page_ranges([], 10) == []
@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from utils.page_store import PageStore
+
+
+def page(text: str, label: str=None) -> Document:
+    return Document(page_content=text, metadata={} if label is None else {'page_label': label})
+
+
+def test_pages_added_in_several_calls():
+    store = PageStore(n_pages=5, source="book.pdf")
+    assert store.add({3: page("third", "iii"), 0: page("first")}) == 2
+    assert store.add({1: page("second"), 3: page("ignored")}) == 1
+    assert store.add({}) == 0
+
+    assert store.loaded() == [0, 1, 3]
+    assert [store[i].page_content for i in (0, 1, 3)] == ["first", "second", "third"]
+    assert store[3].metadata == {'source': "book.pdf", 'page': 3, 'page_label': "iii"}
+    assert store.page_lengths().tolist() == [5, 6, -1, 5, -1]
+    assert [p.page_content for p in store[0:2]] == ["first", "second"]
+
+
+def test_resize_keeps_pages():
+    store = PageStore()
+    store.resize(2)
+    store.add({1: page("only")})
+    store.resize(4)
+    store.add({3: page("last")})
+    assert len(store) == 4 and 1 in store and 2 not in store
+    assert store[1].page_content == "only" and store[3].page_content == "last"
@@ -0,0 +1,20 @@
+from benchmarks.sample_pdf import sample_pages, sample_pdf
+from utils import pdf_process
+from utils.pdf_process import LazyBook
+
+
+def test_windows_share_one_extraction_pool(monkeypatch):
+    data = sample_pdf(sample_pages(80))
+    expected = [page.page_content for page in LazyBook(data, shared=False)]
+
+    pools = []
+    real_pool = pdf_process.ExtractionPool
+    monkeypatch.setattr(pdf_process, 'ExtractionPool', lambda *args, **kwargs: pools.append(1) or real_pool(*args, **kwargs))
+    monkeypatch.setenv("PDF_EXTRACT_WORKERS", "2")
+    book = LazyBook(data, shared=False)
+    windows = list(book.iter_windows(range(80), window=16, keep=False))
+
+    assert [len(pages) for pages in windows] == [16] * 5
+    assert [page.page_content for pages in windows for page in pages] == expected
+    assert windows[2][0].metadata['page'] == 32
+    assert len(pools) == 1 and book._pool is None
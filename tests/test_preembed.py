@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from utils import preembed
+from utils.book_cache import get_book_cache
+from utils.local_embeddings import HashingEmbeddings
+from utils.preembed import EMBEDDED, QUEUED, BookPreEmbedder
+
+
+BOOK_HASH = 'p' * 64
+
+
+class FakeBook():
+    reader = None
+
+    def __len__(self):
+        return 80
+
+
+@pytest.fixture
+def chapters():
+    prange = [{'title': f"Chapter {i}", 'nest': 1, 'start': 8 * i + 1, 'end': 8 * i + 8, 'id': f"ch{i}"}
+              for i in range(10)]
+    get_book_cache().save_chapters(BOOK_HASH, {'toc': [], 'prange': prange, 'max_nest': 1})
+    return prange
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Chapter ids in the order the job embeds them (each takes a little while)"""
+    order = []
+    release = threading.Event()
+
+    def fake_stream_chapter(index, embeddings, book, chapter, *args, **kwargs):
+        release.wait(5)
+        order.append(chapter['id'])
+        time.sleep(0.01)
+        return {'pages': 8, 'chunks': 1, 'embedded': 1, 'resumed': 0}
+
+    monkeypatch.setattr(preembed, 'stream_chapter', fake_stream_chapter)
+    return order, release
+
+
+def test_wait_embeds_the_chapter_next(chapters, embedded):
+    order, release = embedded
+    job = BookPreEmbedder(None, HashingEmbeddings(dimensions=8), FakeBook(), BOOK_HASH, 'book.pdf')
+    job.start()
+    release.set()
+
+    assert job.wait('ch9', timeout=5) == EMBEDDED
+    # Chapters already started when `wait` was called may finish first, never the whole queue
+    assert 'ch9' in order[:3]
+    assert job.namespace('ch9') is not None
+
+
+def test_wait_returns_when_the_job_stops(chapters, embedded):
+    order, release = embedded
+    job = BookPreEmbedder(None, HashingEmbeddings(dimensions=8), FakeBook(), BOOK_HASH, 'book.pdf')
+    job.start()
+    job.cancel()
+    release.set()
+
+    assert job.wait('ch9', timeout=5) == QUEUED
+    assert 'ch9' not in order
@@ -0,0 +1,47 @@
+from utils.registry import PENDING, READY, NamespaceRegistry, content_namespace, namespace_key
+
+
+CHUNKING = {'chunk_size': 1000, 'chunk_overlap': 200, 'strip': True}
+
+
+def test_resolve_is_stable(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / 'namespaces.sqlite3'))
+    entry = registry.resolve('a' * 64, 1, 10, CHUNKING, 'model')
+    assert entry['status'] == PENDING and entry['namespace'].startswith('ch_')
+    assert entry['chunking'] == CHUNKING
+
+    # Same book, pages, chunking and model: same namespace, whatever the key order
+    again = registry.resolve('a' * 64, 1, 10, dict(reversed(list(CHUNKING.items()))), 'model')
+    assert again['namespace'] == entry['namespace']
+    assert len(registry.list_all()) == 1
+
+
+def test_anything_that_changes_the_vectors_changes_the_namespace(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / 'namespaces.sqlite3'))
+    base = registry.resolve('a' * 64, 1, 10, CHUNKING, 'model')['namespace']
+    variants = [
+        registry.resolve('b' * 64, 1, 10, CHUNKING, 'model'),
+        registry.resolve('a' * 64, 1, 11, CHUNKING, 'model'),
+        registry.resolve('a' * 64, 1, 10, {**CHUNKING, 'strip': False}, 'model'),
+        registry.resolve('a' * 64, 1, 10, CHUNKING, 'other-model'),
+        registry.resolve('a' * 64, 1, 10, CHUNKING, 'model', prefix='book'),
+    ]
+    assert len({base} | {entry['namespace'] for entry in variants}) == 6
+
+
+def test_status_and_lookup(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / 'namespaces.sqlite3'))
+    assert registry.lookup('a' * 64, 1, 10, CHUNKING, 'model') is None
+
+    namespace = registry.resolve('a' * 64, 1, 10, CHUNKING, 'model')['namespace']
+    assert not registry.is_ready(namespace)
+    registry.set_status(namespace, READY, 42)
+    assert registry.is_ready(namespace)
+    assert registry.lookup('a' * 64, 1, 10, CHUNKING, 'model')['n_chunks'] == 42
+    assert namespace == content_namespace(namespace_key('a' * 64, 1, 10, CHUNKING, 'model'))
+
+    # Shared through the database file
+    other = NamespaceRegistry(registry.path)
+    assert other.is_ready(namespace)
+    other.remove(namespace)
+    assert registry.get(namespace) is None
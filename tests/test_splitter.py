@@ -0,0 +1,54 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from utils.splitter import ChapterSplitter
+
+
+def make_pages(texts: list[str]) -> list[Document]:
+    return [Document(page_content=text, metadata={'page': i}) for i, text in enumerate(texts)]
+
+
+def windows_of(pages: list[Document], size: int) -> list[list[Document]]:
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def assert_same_chunks(splitter: ChapterSplitter, pages: list[Document], window: int):
+    expected = splitter.split_pages(pages)
+    streamed = list(splitter.split_stream(windows_of(pages, window), with_offsets=True))
+    assert [doc.page_content for _, doc in streamed] == list(expected.texts())
+    assert [offset for offset, _ in streamed] == expected.page_offsets().tolist()
+    assert [doc.metadata['page'] for _, doc in streamed] == [doc.metadata['page'] for doc in expected]
+
+
+def random_page(rng: random.Random) -> str:
+    words = ["".join(rng.choices("abcdefghij", k=rng.randint(1, 12))) for _ in range(rng.randint(0, 400))]
+    text = ""
+    for word in words:
+        text += word + rng.choice([" ", " ", " ", " ", "\n", "\n\n", "  "])
+    return rng.choice(["", "   ", text, text, text])
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 7, 32])
+@pytest.mark.parametrize("seed", range(5))
+def test_split_stream_matches_split_pages(window, seed):
+    rng = random.Random(seed)
+    pages = make_pages([random_page(rng) for _ in range(rng.randint(1, 40))])
+    assert_same_chunks(ChapterSplitter(chunk_size=300, chunk_overlap=60), pages, window)
+
+
+def test_split_stream_blank_window():
+    # A window of blank (e.g. scanned) pages leaves nothing to carry over
+    pages = make_pages(["   "] * 40 + ["word " * 300])
+    assert_same_chunks(ChapterSplitter(), pages, 32)
+
+
+def test_split_stream_blank_final_window():
+    pages = make_pages(["word " * 300] + [""] * 10)
+    assert_same_chunks(ChapterSplitter(), pages, 4)
+
+
+def test_split_stream_empty():
+    assert list(ChapterSplitter().split_stream([])) == []
+    assert list(ChapterSplitter().split_stream([make_pages(["", " "])])) == []
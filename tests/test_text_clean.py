@@ -0,0 +1,57 @@
+from langchain_core.documents import Document
+
+from utils.text_clean import boilerplate_lines, strip_boilerplate
+
+
+TOPICS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def body(i: int) -> str:
+    """Lines that differ from page to page (not only by their digits)"""
+    return "\n".join(f"The {TOPICS[i]} section discusses {TOPICS[(i + j) % 10]} at some length." for j in range(8))
+
+
+def page(i: int, header: str="Intro to Testing", footer: str="Copyright 2024 Publisher") -> Document:
+    lines = [header, body(i), f"Page {i + 1}", footer]
+    return Document(page_content="\n".join(line for line in lines if line), metadata={'page': i})
+
+
+def test_removes_repeated_headers_and_page_numbers():
+    pages, stats = strip_boilerplate([page(i) for i in range(10)])
+    assert len(pages) == 10
+    assert all(p.page_content == body(i) for i, p in enumerate(pages))
+    assert stats['lines_removed'] == 30 and stats['pages_dropped'] == 0
+    assert pages[3].metadata == {'page': 3}
+
+
+def test_alternating_headers():
+    pages = [page(i, header="Even header" if i % 2 else "Odd header") for i in range(10)]
+    cleaned, _ = strip_boilerplate(pages)
+    assert not any("header" in p.page_content for p in cleaned)
+
+
+def test_keeps_lines_that_do_not_repeat_enough():
+    pages = [page(i, header="Rare header" if i < 3 else "") for i in range(10)]
+    cleaned, _ = strip_boilerplate(pages)
+    assert sum("Rare header" in p.page_content for p in cleaned) == 3
+
+
+def test_too_few_pages():
+    assert boilerplate_lines([page(0), page(1)]) == set()
+    cleaned, stats = strip_boilerplate([page(0), page(1)])
+    assert stats['lines_removed'] == 0 and "Intro to Testing" in cleaned[0].page_content
+
+
+def test_drops_near_empty_pages():
+    pages = [page(i) for i in range(5)] + [Document(page_content="Figure 3", metadata={'page': 5})]
+    cleaned, stats = strip_boilerplate(pages)
+    assert [p.metadata['page'] for p in cleaned] == list(range(5))
+    assert stats['pages_dropped'] == 1
+
+
+def test_detected_lines_apply_to_other_pages():
+    # Detected over the whole chapter, applied a window at a time
+    pages = [page(i) for i in range(10)]
+    repeated = boilerplate_lines(pages)
+    window, _ = strip_boilerplate(pages[:2], repeated=repeated)
+    assert [p.page_content for p in window] == [body(0), body(1)]
@@ -1,6 +1,25 @@
-from .pdf_process import ChapterExtractor, process_book, extract_chapter
+from .pdf_process import ChapterExtractor, LazyBook, process_book, open_book, open_reader, extract_chapter, book_chapters, extract_pages_parallel, page_ranges
 from .quiz_format import *
 from .llm import *
 from .storage import *
 from .stream import StreamHandler
-from .chat_utils import *
\ No newline at end of file
+from .chat_utils import *
+from .book_cache import BookCache, get_book_cache, hash_bytes
+from .fingerprint import fingerprint_upload
+from .pdf_backends import TextExtractor, available_extractors, get_extractor, DEFAULT_BACKEND
+from .page_store import PageStore, PageView, shared_page_store
+from .text_clean import strip_boilerplate
+from .splitter import ChapterSplitter, ChapterChunks
+from .delta import ChunkManifest, DeltaPlan, apply_delta, chunk_hash
+from .embedding_cache import CachedEmbeddings, EmbeddingStore, get_embedding_store, embedding_model_key
+from .upsert import embed_and_upsert, pack_requests
+from .streaming import prefetch
+from .retrieval import NAMESPACE_MODES, book_namespace, chapter_filter, retrieval_target, default_namespace_mode
+from .registry import NamespaceRegistry, get_namespace_registry
+from .local_store import LocalIndex, LocalVectorStore, open_local_index, QUANTIZATIONS
+from .chunk_store import ChunkStore, HydratingVectorStore, get_chunk_store, use_compact_metadata
+from .lifecycle import NamespaceLifecycle, start_lifecycle, needs_restore
+from .preembed import BookPreEmbedder, start_preembedding, get_preembedding
+from .local_embeddings import HashingEmbeddings
+from .estimate import ThroughputLog, get_throughput_log, page_lengths, estimate_chapter, check_limits
+from .config import get_setting, get_cache_dir
\ No newline at end of file
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+
+from langchain_core.documents import Document
+
+from .config import get_cache_dir
+from .pdf_backends import DEFAULT_BACKEND
+
+
+def hash_bytes(data: bytes) -> str:
+    """Content hash used as the identity of an uploaded book"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_json_atomic(path: str, data):
+    """Atomic write, so concurrent sessions never read a half-written file"""
+    dir_name = os.path.dirname(path)
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class BookCache():
+    """
+    On-disk, content-addressed store of parsed books, shared across sessions and restarts.
+
+    Layout, one directory per book (keyed by the PDF's sha256):
+        <cache_dir>/books/<book_hash>/pages.json     extracted page text and metadata
+                                                     (pages.<backend>.json for non-default backends)
+        <cache_dir>/books/<book_hash>/pages.parts/   pages extracted since, one file per `save_pages`
+                                                     call, merged into pages.json once there are
+                                                     more than `MAX_PARTS`
+        <cache_dir>/books/<book_hash>/chapters.json  `extract_chapter` result (toc/prange/max_nest)
+    """
+    MAX_PARTS = 16
+
+    def __init__(self, root: str=None):
+        self.root = root or os.path.join(get_cache_dir(), 'books')
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, book_hash: str, name: str) -> str:
+        return os.path.join(self.root, book_hash, name)
+
+    def _read(self, book_hash: str, name: str):
+        try:
+            with open(self._path(book_hash, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None # missing or corrupted entry -> treat as a cache miss
+
+    def _write(self, book_hash: str, name: str, data):
+        write_json_atomic(self._path(book_hash, name), data)
+
+    @staticmethod
+    def _pages_file(backend: str) -> str:
+        return 'pages.json' if backend == DEFAULT_BACKEND else f'pages.{backend}.json'
+
+    def _parts_dir(self, book_hash: str, backend: str) -> str:
+        return self._path(book_hash, self._pages_file(backend)[:-len('.json')] + '.parts')
+
+    def load_pages(self, book_hash: str, source: str="", backend: str=DEFAULT_BACKEND) -> tuple[int, dict[int, Document]]:
+        """
+        Returns:
+            tuple[int, dict[int, Document]]: Total page count of the book (0 on a cache miss),
+                and cached pages by 0-based page index (may be partial for lazily parsed books)
+        """
+        data = self._read(book_hash, self._pages_file(backend)) or {'n_pages': 0, 'pages': {}}
+        parts_dir = self._parts_dir(book_hash, backend)
+        try:
+            # Skip write_json_atomic's in-flight '*.tmp' files
+            parts = sorted(name for name in os.listdir(parts_dir) if name.endswith('.json'))
+        except OSError:
+            parts = []
+        merged = []
+        for name in parts:
+            try:
+                with open(os.path.join(parts_dir, name), 'r', encoding='utf-8') as f:
+                    part = json.load(f)
+            except (OSError, ValueError):
+                continue # being written, or corrupted: those pages are extracted again
+            data['n_pages'] = data['n_pages'] or part['n_pages']
+            data['pages'].update(part['pages'])
+            merged.append(name)
+        if not data['pages'] and not data['n_pages']:
+            return 0, {}
+
+        if len(merged) > self.MAX_PARTS:
+            self._write(book_hash, self._pages_file(backend), data)
+            for name in merged: # only parts now in pages.json: unreadable ones stay for the next load
+                try:
+                    os.remove(os.path.join(parts_dir, name))
+                except OSError:
+                    pass
+
+        pages = {}
+        for idx, page in data['pages'].items():
+            metadata = {'source': source, **page['metadata']}
+            pages[int(idx)] = Document(page_content=page['text'], metadata=metadata)
+        return data['n_pages'], pages
+
+    def save_pages(self, book_hash: str, pages: dict[int, Document], n_pages: int, backend: str=DEFAULT_BACKEND):
+        """Add pages to the cache, in a file of their own: earlier pages are not written again"""
+        if not pages:
+            return
+        data = {
+            'n_pages': n_pages,
+            'pages': {
+                # 'source' points to a per-upload temp file, so it is not worth keeping
+                str(idx): {
+                    'text': doc.page_content,
+                    'metadata': {k: v for k, v in doc.metadata.items() if k != 'source'}
+                }
+                for idx, doc in pages.items()
+            }
+        }
+        name = f"{min(pages):06d}-{uuid.uuid4().hex[:8]}.json"
+        write_json_atomic(os.path.join(self._parts_dir(book_hash, backend), name), data)
+
+    def load_chapters(self, book_hash: str) -> dict:
+        return self._read(book_hash, 'chapters.json')
+
+    def save_chapters(self, book_hash: str, chapters: dict):
+        self._write(book_hash, 'chapters.json', chapters)
+
+
+_book_cache = None
+
+def get_book_cache() -> BookCache:
+    global _book_cache
+    if _book_cache is None:
+        _book_cache = BookCache()
+    return _book_cache
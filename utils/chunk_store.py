@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from .config import get_setting, get_cache_dir
+from .registry import get_namespace_registry
+
+
+# Metadata key of the chunk id in compact vector metadata. Vector stores are built with it as their
+# text key, so search results come back with the id as `page_content`, then get hydrated.
+COMPACT_KEY = 'cid'
+
+def use_compact_metadata() -> bool:
+    """METADATA_MODE setting: 'compact' keeps chunk text and titles out of the vector store"""
+    return get_setting("METADATA_MODE", "full") == 'compact'
+
+
+def namespace_is_compact(namespace: str) -> bool:
+    """Whether a namespace was embedded with compact metadata (namespaces missing from the
+        registry predate compact metadata)"""
+    entry = get_namespace_registry().get(namespace) if namespace else None
+    return entry is not None and entry['chunking'].get('compact', False)
+
+
+def vector_metadata(vector_id: str, doc: Document, text_key: str='text', compact: bool=False) -> dict:
+    """
+    Metadata upserted with a chunk's vector: everything (page metadata, chapter metadata, text),
+        or in compact mode only the chunk id and the page number (for page-range filters)
+    """
+    if compact:
+        return {COMPACT_KEY: vector_id, 'page': doc.metadata.get('page')}
+    return {**doc.metadata, text_key: doc.page_content}
+
+
+class ChunkStore():
+    """
+    Text and full metadata of the chunks of compact namespaces, keyed by (namespace, vector id),
+        in SQLite in the cache directory (like the `EmbeddingStore`).
+    """
+    _LOOKUP_BATCH = 900
+
+    def __init__(self, path: str=None):
+        self.path = path or os.path.join(get_cache_dir(), 'chunks.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " namespace TEXT NOT NULL, id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, id))"
+        )
+        self._conn.commit()
+
+    def put_many(self, namespace: str, items: list[tuple[str, Document]]):
+        """Store (vector id, chunk) pairs"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (namespace, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(namespace, vector_id, doc.page_content, json.dumps(doc.metadata)) for vector_id, doc in items]
+            )
+            self._conn.commit()
+
+    def get_many(self, namespace: str, ids: list[str]) -> dict[str, Document]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), self._LOOKUP_BATCH):
+                batch = ids[i:i + self._LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE namespace = ? AND id IN ({','.join('?' * len(batch))})",
+                    [namespace, *batch]
+                )
+                for vector_id, text, metadata in rows:
+                    found[vector_id] = Document(id=vector_id, page_content=text, metadata=json.loads(metadata))
+        return found
+
+    def delete(self, namespace: str, ids: list[str]):
+        with self._lock:
+            for i in range(0, len(ids), self._LOOKUP_BATCH):
+                batch = ids[i:i + self._LOOKUP_BATCH]
+                self._conn.execute(f"DELETE FROM chunks WHERE namespace = ? AND id IN ({','.join('?' * len(batch))})",
+                                   [namespace, *batch])
+            self._conn.commit()
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+
+_chunk_store = None
+_chunk_store_lock = threading.Lock()
+
+def get_chunk_store() -> ChunkStore:
+    global _chunk_store
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkStore()
+    return _chunk_store
+
+
+class HydratingVectorStore(VectorStore):
+    """
+    Search wrapper for a compact namespace: the wrapped store (built with `COMPACT_KEY` as its text
+        key) returns documents whose `page_content` is the chunk id, which are replaced by the
+        chunk's text and full metadata from the `ChunkStore`, so retrievers, the LLM context and
+        the references shown to the user see the same documents as with full metadata.
+
+    Args:
+        store: `PineconeVectorStore` or `LocalVectorStore` over the namespace
+        namespace: The namespace, to look chunks up
+        chunk_store: Where texts are kept (default: the shared store in the cache directory)
+    """
+    def __init__(self, store: VectorStore, namespace: str, chunk_store: ChunkStore=None):
+        self.store = store
+        self.namespace = namespace
+        self.chunk_store = chunk_store or get_chunk_store()
+        # What the ingestion pipeline reads from a vector store (see `apply_delta`)
+        self._index = store._index
+        self._text_key = store._text_key
+
+    @property
+    def embeddings(self):
+        return self.store.embeddings
+
+    def hydrate(self, docs: list[Document]) -> list[Document]:
+        found = self.chunk_store.get_many(self.namespace, [doc.page_content for doc in docs])
+        # Chunk not in the local store (e.g. embedded on another machine): keep the result, without text
+        return [found.get(doc.page_content) or Document(id=doc.page_content, page_content="",
+                                                        metadata={'page': doc.metadata.get('page'), 'chapter_title': ""})
+                for doc in docs]
+
+    def similarity_search(self, query: str, k: int=4, **kwargs) -> list[Document]:
+        return self.hydrate(self.store.similarity_search(query, k=k, **kwargs))
+
+    def similarity_search_with_score(self, query: str, k: int=4, **kwargs) -> list[tuple[Document, float]]:
+        results = self.store.similarity_search_with_score(query, k=k, **kwargs)
+        return list(zip(self.hydrate([doc for doc, _ in results]), (score for _, score in results)))
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int=4, **kwargs) -> list[Document]:
+        return self.hydrate(self.store.similarity_search_by_vector(embedding, k=k, **kwargs))
+
+    def max_marginal_relevance_search(self, query: str, k: int=4, fetch_k: int=20,
+                                      lambda_mult: float=0.5, **kwargs) -> list[Document]:
+        return self.hydrate(self.store.max_marginal_relevance_search(
+            query, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs))
+
+    def max_marginal_relevance_search_by_vector(self, embedding: list[float], k: int=4, fetch_k: int=20,
+                                                lambda_mult: float=0.5, **kwargs) -> list[Document]:
+        return self.hydrate(self.store.max_marginal_relevance_search_by_vector(
+            embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs))
+
+    def _select_relevance_score_fn(self):
+        return self.store._select_relevance_score_fn()
+
+    def add_texts(self, texts, metadatas: list[dict]=None, **kwargs) -> list[str]:
+        raise NotImplementedError("Compact namespaces are written by the ingestion pipeline (see `embed_and_upsert`)")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas: list[dict]=None, **kwargs):
+        raise NotImplementedError("Compact namespaces are written by the ingestion pipeline (see `embed_and_upsert`)")
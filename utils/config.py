@@ -0,0 +1,24 @@
+import os
+
+import streamlit as st
+
+
+def get_setting(name: str, default=None):
+    """
+    Read an app setting, first from Streamlit secrets, then from environment variables.
+    Falls back to `default` when the setting is defined in neither.
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass # no secrets.toml (e.g. outside `streamlit run`)
+
+    return os.environ.get(name, default)
+
+
+def get_cache_dir() -> str:
+    """Root directory for everything TRAZEN persists locally (parsed books, caches, ...)"""
+    cache_dir = get_setting("TRAZEN_CACHE_DIR", ".trazen_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import time
+
+from .book_cache import write_json_atomic
+from .chunk_store import HydratingVectorStore, get_chunk_store, vector_metadata
+from .config import get_cache_dir
+from .upsert import embed_and_upsert
+
+
+def chunk_id(book_hash: str, page: int, offset: int) -> str:
+    """Vector id of a chunk: the same chunk of the same book always gets the same id, so upserts are idempotent
+    Args:
+        book_hash: Content hash of the book
+        page: 0-based index of the page the chunk starts on
+        offset: Offset of the chunk in that page's text
+    """
+    return hashlib.sha1(f"{book_hash}:{page}:{offset}".encode('utf-8')).hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk, insensitive to whitespace/line-break changes between editions"""
+    return hashlib.sha1(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+class ChunkManifest():
+    """
+    What was embedded into one vector store namespace: chunk content hash -> vector id,
+        plus a little information to recognize the chapter later (book, title, pages).
+    Stored as <cache_dir>/manifests/<namespace>.json.
+    """
+    def __init__(self, namespace: str, chunks: dict[str, str]=None, info: dict=None):
+        self.namespace = namespace
+        self.chunks = chunks or {}
+        self.info = info or {}
+
+    @staticmethod
+    def _root() -> str:
+        return os.path.join(get_cache_dir(), 'manifests')
+
+    @classmethod
+    def _path(cls, namespace: str) -> str:
+        return os.path.join(cls._root(), f"{namespace}.json")
+
+    @classmethod
+    def load(cls, namespace: str) -> "ChunkManifest":
+        """Returns None when nothing was recorded for `namespace`"""
+        try:
+            with open(cls._path(namespace), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(namespace, data['chunks'], data.get('info'))
+
+    def save(self):
+        self.info['updated'] = time.time()
+        write_json_atomic(self._path(self.namespace), {'chunks': self.chunks, 'info': self.info})
+
+    def delete(self):
+        try:
+            os.remove(self._path(self.namespace))
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def list_all(cls) -> list[dict]:
+        """Info of every recorded namespace (with 'namespace' and 'n_chunks'), most recent first"""
+        manifests = []
+        if not os.path.isdir(cls._root()):
+            return manifests
+        for file_name in os.listdir(cls._root()):
+            if file_name.endswith('.json'):
+                manifest = cls.load(file_name[:-len('.json')])
+                if manifest is not None:
+                    manifests.append({**manifest.info, 'namespace': manifest.namespace, 'n_chunks': len(manifest.chunks)})
+        return sorted(manifests, key=lambda m: m.get('updated', 0), reverse=True)
+
+
+class DeltaPlan():
+    """
+    Diff of a chapter's chunks against what a previous version embedded.
+
+    Attributes:
+        hashes: Content hash of every chunk (chunks with the same text are embedded once)
+        added: Indices of chunks whose text is new, to embed
+        unchanged: (chunk index, vector id in the previous namespace) of chunks to reuse
+        removed: Vector ids of the previous version whose text disappeared
+        resumed: Chunks an interrupted run had already stored, skipped by `apply_delta`
+    """
+    def __init__(self, chunks, previous: ChunkManifest=None):
+        previous_chunks = previous.chunks if previous is not None else {}
+        self.previous_namespace = previous.namespace if previous is not None else None
+
+        texts = chunks.texts() if hasattr(chunks, 'texts') else (chunk.page_content for chunk in chunks)
+        self.hashes = [chunk_hash(text) for text in texts]
+        self.added, self.unchanged = [], []
+        seen = set()
+        for i, h in enumerate(self.hashes):
+            if h in seen:
+                continue
+            seen.add(h)
+            if h in previous_chunks:
+                self.unchanged.append((i, previous_chunks[h]))
+            else:
+                self.added.append(i)
+        self.removed = [vector_id for h, vector_id in previous_chunks.items() if h not in seen]
+        self.resumed = 0 # set by `apply_delta`
+
+    def summary(self) -> dict:
+        return {'added': len(self.added), 'unchanged': len(self.unchanged), 'removed': len(self.removed),
+                'resumed': self.resumed}
+
+
+def apply_delta(plan: DeltaPlan, chunks, vectorstore, namespace: str, info: dict=None,
+                ids: list[str]=None, batch_size: int=100, progress=None) -> ChunkManifest:
+    """
+    Bring `namespace` up to date with `chunks`, embedding only the chunks that are new:
+        - unchanged chunks: their vectors are fetched from the previous namespace and upserted
+            with the new metadata (page numbers may have moved), no embedding call
+        - added chunks: embedded and upserted concurrently
+        - removed chunks: deleted, when the previous version lives in the same namespace (otherwise
+            the whole previous namespace is retired afterwards, see `utils.ingest.retire_namespace`)
+    Upserts are idempotent (every chunk has a fixed id) and the manifest is saved as a checkpoint
+        after every committed batch, marked incomplete until the end: after an interruption,
+        running the same chapter again only stores what is missing.
+
+    Args:
+        plan: Diff of `chunks` against the previous version (`DeltaPlan(chunks)` embeds everything)
+        chunks: The chapter's chunks (`ChapterChunks` or a list of Documents)
+        vectorstore: Vector store for `namespace` (see `get_vectorstore`)
+        namespace: Namespace to write to
+        info: Stored with the manifest (book name, chapter title, ...)
+        ids: Vector id of each chunk (see `chunk_id`; default: its content hash)
+        batch_size: Vectors per request (Pinecone recommends 100)
+        progress: Optional callback(message: str)
+
+    Returns:
+        ChunkManifest: The manifest of `namespace`, saved
+    """
+    index = vectorstore._index
+    text_key = vectorstore._text_key
+    compact = isinstance(vectorstore, HydratingVectorStore)
+    report = progress or (lambda message: None)
+    ids = ids or plan.hashes
+    manifest = ChunkManifest(namespace, info={**(info or {}), 'complete': False})
+
+    ## RESUME
+    # Chunks an interrupted run already committed to this namespace, under the same id
+    partial = ChunkManifest.load(namespace)
+    stored = set()
+    if partial is not None and not partial.info.get('complete', True):
+        stored = {i for i in plan.added + [i for i, _ in plan.unchanged]
+                  if partial.chunks.get(plan.hashes[i]) == ids[i]}
+        manifest.chunks.update((plan.hashes[i], ids[i]) for i in stored)
+    plan.resumed = len(stored)
+    if stored:
+        report(f"Resuming: {len(stored)} chunks already stored")
+    unchanged = [(i, vector_id) for i, vector_id in plan.unchanged if i not in stored]
+    to_embed = [i for i in plan.added if i not in stored]
+
+    ## REUSE
+    for i in range(0, len(unchanged), batch_size):
+        batch = unchanged[i:i + batch_size]
+        fetched = index.fetch(ids=[vector_id for _, vector_id in batch], namespace=plan.previous_namespace).vectors
+        vectors, reused = [], []
+        for chunk_idx, vector_id in batch:
+            if vector_id not in fetched: # gone from the index since the manifest was written
+                to_embed.append(chunk_idx)
+                continue
+            doc = chunks[chunk_idx]
+            reused.append((ids[chunk_idx], doc))
+            vectors.append({
+                'id': ids[chunk_idx],
+                'values': fetched[vector_id].values,
+                'metadata': vector_metadata(ids[chunk_idx], doc, text_key, compact)
+            })
+        if vectors:
+            if compact:
+                get_chunk_store().put_many(namespace, reused)
+            index.upsert(vectors=vectors, namespace=namespace)
+            manifest.chunks.update((plan.hashes[chunk_idx], ids[chunk_idx])
+                                   for chunk_idx, vector_id in batch if vector_id in fetched)
+            manifest.save()
+        report(f"Reused {min(i + batch_size, len(unchanged))} of {len(unchanged)} unchanged chunks")
+
+    ## EMBEDDING
+    # Embedding requests and upserts overlap, see `embed_and_upsert`
+    hash_of = {ids[chunk_idx]: plan.hashes[chunk_idx] for chunk_idx in to_embed}
+
+    def checkpoint(items):
+        manifest.chunks.update((hash_of[vector_id], vector_id) for vector_id, _ in items)
+        manifest.save()
+
+    if to_embed:
+        embed_and_upsert(
+            index, vectorstore.embeddings, [(ids[chunk_idx], chunks[chunk_idx]) for chunk_idx in to_embed], namespace,
+            text_key=text_key, upsert_batch=batch_size, compact=compact, on_commit=checkpoint, progress=progress
+        )
+
+    ## CLEAN UP
+    removed = list(plan.removed)
+    if plan.previous_namespace == namespace:
+        # Unchanged chunks whose id changed (e.g. their page moved) were stored again under the new id
+        removed += [vector_id for chunk_idx, vector_id in plan.unchanged if vector_id != ids[chunk_idx]]
+        for i in range(0, len(removed), 1000): # delete takes up to 1000 ids
+            index.delete(ids=removed[i:i + 1000], namespace=namespace)
+        if compact:
+            get_chunk_store().delete(namespace, removed)
+        if removed:
+            report(f"Deleted {len(removed)} chunks that are no longer in the chapter")
+
+    manifest.info['complete'] = True
+    manifest.save()
+    return manifest
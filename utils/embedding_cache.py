@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import get_cache_dir
+from .delta import chunk_hash
+
+
+def embedding_model_key(embeddings: Embeddings) -> str:
+    """Identifies the vectors a model produces: its name, plus its dimensions when set"""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.model_key
+    model_key = getattr(embeddings, 'model', type(embeddings).__name__)
+    if getattr(embeddings, 'dimensions', None):
+        model_key = f"{model_key}:{embeddings.dimensions}"
+    return model_key
+
+
+class EmbeddingStore():
+    """
+    Persistent (model, chunk hash) -> vector table in SQLite, shared by every session and process
+        on the machine. Vectors are stored as float32 blobs.
+    """
+    # SQLite allows 999 bound parameters per statement on older builds
+    _LOOKUP_BATCH = 900
+
+    def __init__(self, path: str=None):
+        self.path = path or os.path.join(get_cache_dir(), 'embeddings.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL") # readers do not block the writer
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), self._LOOKUP_BATCH):
+                batch = hashes[i:i + self._LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                )
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: dict[str, list[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in vectors.items()]
+            )
+            self._conn.commit()
+
+    def count(self, model: str=None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so that each distinct chunk text (after whitespace normalization)
+        is sent to the API once per model, ever: repeated content (overlapping parent/child
+        chapters, the same book uploaded again) is served from the `EmbeddingStore`.
+    Queries are passed through uncached.
+
+    Args:
+        embeddings: The underlying model, e.g. `OpenAIEmbeddings`
+        store: Where vectors are kept (default: the shared store in the cache directory)
+        model_key: Cache namespace (default: the model name, plus its dimensions when set)
+    """
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore=None, model_key: str=None):
+        self.embeddings = embeddings
+        self.store = store or get_embedding_store()
+        self.model_key = model_key or embedding_model_key(embeddings)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [chunk_hash(text) for text in texts]
+        vectors = self.store.get_many(self.model_key, list(set(hashes)))
+
+        # Each distinct missing text goes to the API once
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors and h not in missing:
+                missing[h] = text
+        if missing:
+            new_vectors = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            self.store.put_many(self.model_key, new_vectors)
+            vectors.update(new_vectors)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> dict:
+        """Hits and misses since creation (or the last `reset_stats`), and the hit rate"""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.hits = self.misses = 0
+
+
+_embedding_store = None
+_embedding_store_lock = threading.Lock()
+
+def get_embedding_store() -> EmbeddingStore:
+    global _embedding_store
+    with _embedding_store_lock:
+        if _embedding_store is None:
+            _embedding_store = EmbeddingStore()
+    return _embedding_store
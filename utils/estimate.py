@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from .book_cache import write_json_atomic
+from .config import get_setting, get_cache_dir
+from .pdf_process import LazyBook
+
+
+# Before anything was measured: seconds per page extracted, per chunk embedded and upserted
+DEFAULT_RATES = {'extract': 0.02, 'embed': 0.01}
+# Characters of a page when no page of the book is known
+DEFAULT_PAGE_CHARS = 2000
+
+# Quiz generation (see `QuizGen.generate`): keyword extraction over every chunk in batches of
+# about 9000 tokens, then one retrieval (3 chunks) and one answer per keyword
+KEYWORD_BATCH_TOKENS = 9000
+KEYWORD_PROMPT_TOKENS = 100
+KEYWORD_OUTPUT_TOKENS = 20
+QUIZ_CONTEXT_CHUNKS = 3
+QUIZ_PROMPT_TOKENS = 600
+QUIZ_OUTPUT_TOKENS = 400
+
+
+class ThroughputLog():
+    """
+    Recent ingestion throughput measurements, shared by every session and process on the machine
+        (<cache_dir>/throughput.json): seconds per page extracted ('extract') and per chunk
+        embedded and upserted ('embed'), over the last `MAX_SAMPLES` runs of each.
+    The measurements are kept in memory and only read again when the file changes (another
+        process recorded a run), so `rate` is cheap enough for every rerun of a page.
+    """
+    MAX_SAMPLES = 50
+
+    def __init__(self, path: str=None):
+        self.path = path or os.path.join(get_cache_dir(), 'throughput.json')
+        self._lock = threading.Lock()
+        self._data = {}
+        self._version = None # (mtime, inode) of the file last read: rewrites replace the file
+
+    def _load(self) -> dict:
+        """The measurements, read again if the file changed since last time (call with the lock held)"""
+        try:
+            version = self._file_version()
+        except OSError:
+            return self._data
+        if version != self._version:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+            self._version = version
+        return self._data
+
+    def _file_version(self) -> tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_ino
+
+    def record(self, kind: str, units: int, seconds: float):
+        """Record that `units` pages (or chunks) took `seconds`"""
+        if units <= 0:
+            return
+        with self._lock:
+            data = self._load()
+            samples = data.setdefault(kind, [])
+            samples.append([units, seconds])
+            del samples[:-self.MAX_SAMPLES]
+            write_json_atomic(self.path, data)
+            self._version = self._file_version()
+
+    def rate(self, kind: str) -> float:
+        """Seconds per unit over the recorded runs (`DEFAULT_RATES` when there are none)"""
+        with self._lock:
+            samples = list(self._load().get(kind) or [])
+        if not samples:
+            return DEFAULT_RATES[kind]
+        return sum(seconds for _, seconds in samples) / sum(units for units, _ in samples)
+
+
+_throughput_log = None
+_throughput_log_lock = threading.Lock()
+
+def get_throughput_log() -> ThroughputLog:
+    global _throughput_log
+    with _throughput_log_lock:
+        if _throughput_log is None:
+            _throughput_log = ThroughputLog()
+    return _throughput_log
+
+
+def page_lengths(book, sample: int=8) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Characters of every page of a book: pages extracted so far are measured, the others are
+        assumed to be as long as the median measured page. With fewer than `sample` pages
+        known, `sample` evenly spaced pages of a `LazyBook` are extracted first (then cached).
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Length of every page, and whether it was extracted already
+    """
+    lengths = book.page_lengths()
+    if np.count_nonzero(lengths >= 0) < sample and isinstance(book, LazyBook) and len(book):
+        indices = set(np.linspace(0, len(book) - 1, min(sample, len(book))).astype(int).tolist())
+        missing = sorted(i for i in indices if lengths[i] < 0)
+        if missing: # (extracting, and caching, only once per book)
+            book.load_pages(missing)
+            lengths = book.page_lengths()
+    known = lengths >= 0
+    fill = float(np.median(lengths[known])) if known.any() else DEFAULT_PAGE_CHARS
+    return np.where(known, lengths, fill), known
+
+
+def estimate_chapter(chapter: dict, lengths: np.ndarray, known: np.ndarray, embedded: bool=False,
+                     chunk_size: int=1000, chunk_overlap: int=200, n_quiz: int=10,
+                     local_embeddings: bool=False) -> dict:
+    """Predicted work and cost of selecting a chapter
+    Args:
+        chapter: Chapter entry from `page_ranges` (1-based, inclusive 'start'/'end')
+        lengths, known: Output of `page_lengths`
+        embedded: The chapter is in the vector store already (only its missing pages get extracted)
+        chunk_size, chunk_overlap: Chunking settings (see `utils.ingest`)
+        n_quiz: Quizzes generated per chapter
+        local_embeddings: Embeddings are computed locally (no embedding cost)
+    Returns:
+        dict: 'pages', 'chunks', 'tokens' (embedding input), 'seconds' (extraction + embedding),
+            'embed_cost' and 'quiz_cost' (USD)
+    """
+    log = get_throughput_log()
+    pages = slice(chapter['start'] - 1, chapter['end'])
+    chars = float(lengths[pages].sum())
+    chunks = math.ceil(chars / (chunk_size - chunk_overlap)) if chars else 0
+    tokens = int((chars + chunks * chunk_overlap) / 4) # overlaps are embedded twice; ~4 chars per token
+
+    n_missing = int(np.count_nonzero(~known[pages]))
+    seconds = n_missing * log.rate('extract') + (0 if embedded else chunks * log.rate('embed'))
+
+    embed_price = 0.0 if local_embeddings else float(get_setting("EMBEDDING_PRICE_PER_MTOK", 0.02))
+    batches = math.ceil(tokens / KEYWORD_BATCH_TOKENS)
+    quiz_input = (tokens + batches * KEYWORD_PROMPT_TOKENS
+                  + n_quiz * (QUIZ_CONTEXT_CHUNKS * chunk_size // 4 + QUIZ_PROMPT_TOKENS))
+    quiz_output = batches * KEYWORD_OUTPUT_TOKENS + n_quiz * QUIZ_OUTPUT_TOKENS
+    quiz_cost = (quiz_input * float(get_setting("LLM_PRICE_INPUT_PER_MTOK", 0.15))
+                 + quiz_output * float(get_setting("LLM_PRICE_OUTPUT_PER_MTOK", 0.60))) / 1e6
+
+    return {
+        'pages': chapter['end'] - chapter['start'] + 1,
+        'chunks': chunks,
+        'tokens': tokens,
+        'seconds': seconds,
+        'embed_cost': 0.0 if embedded else tokens * embed_price / 1e6,
+        'quiz_cost': quiz_cost,
+    }
+
+
+def check_limits(estimate: dict) -> tuple[str, str]:
+    """
+    Compare an estimate with the INGEST_MAX_SECONDS and INGEST_MAX_CHUNKS settings (above: refuse)
+        and INGEST_WARN_SECONDS (above: warn, default 60). 0 disables a limit.
+    Returns:
+        tuple[str, str]: The level ('refuse', 'warn' or None) and a message for the user
+    """
+    max_seconds = float(get_setting("INGEST_MAX_SECONDS", 0) or 0)
+    max_chunks = int(get_setting("INGEST_MAX_CHUNKS", 0) or 0)
+    warn_seconds = float(get_setting("INGEST_WARN_SECONDS", 60) or 0)
+    described = f"about {estimate['chunks']:,} chunks and {format_seconds(estimate['seconds'])}"
+    if max_seconds and estimate['seconds'] > max_seconds:
+        return 'refuse', f"This selection needs {described}, over the limit of {format_seconds(max_seconds)}. Pick a smaller chapter (a deeper nesting level)."
+    if max_chunks and estimate['chunks'] > max_chunks:
+        return 'refuse', f"This selection needs {described}, over the limit of {max_chunks:,} chunks. Pick a smaller chapter (a deeper nesting level)."
+    if warn_seconds and estimate['seconds'] > warn_seconds:
+        return 'warn', f"This selection needs {described}."
+    return None, ""
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    return f"{seconds / 60:.1f} min"
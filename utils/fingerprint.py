@@ -0,0 +1,21 @@
+import streamlit as st
+
+from .book_cache import hash_bytes
+
+
+def fingerprint_upload(uploaded_pdf) -> str:
+    """
+    Content hash of an uploaded file, computed once per upload and remembered in session state.
+
+    Streamlit reruns the page on every widget change; hashing a 60 MB upload each time
+        (which is what `@st.cache_data` does with an UploadedFile argument) is what made
+        reruns slow. Caches are keyed on this string instead.
+    """
+    fingerprints = st.session_state.setdefault('upload_fingerprints', {})
+    file_id = uploaded_pdf.file_id # new id for every (re)upload, stable across reruns
+
+    if file_id not in fingerprints:
+        fingerprints.clear() # only the current upload is needed
+        fingerprints[file_id] = hash_bytes(uploaded_pdf.getbuffer()) # memoryview, no copy
+
+    return fingerprints[file_id]
@@ -0,0 +1,462 @@
+"""
+The ingestion pipeline (PDF -> chapter pages -> chunks -> vectors), free of Streamlit widgets
+    and session state, shared by the upload page and the headless `ingest_library.py`.
+"""
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .book_cache import hash_bytes
+from .chunk_store import get_chunk_store, namespace_is_compact, use_compact_metadata
+from .delta import ChunkManifest, DeltaPlan, apply_delta, chunk_hash, chunk_id
+from .embedding_cache import embedding_model_key
+from .estimate import get_throughput_log
+from .pdf_backends import DEFAULT_BACKEND
+from .pdf_process import LazyBook, book_chapters
+from .registry import PENDING, READY, get_namespace_registry
+from .retrieval import book_namespace
+from .splitter import ChapterChunks, ChapterSplitter
+from .storage import get_vectorstore
+from .streaming import prefetch
+from .text_clean import boilerplate_lines, strip_boilerplate
+from .upsert import embed_and_upsert
+
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Pages extracted, cleaned and split at a time by `stream_chapter` (a long chapter's windows share
+# one extraction process pool, see `LazyBook.iter_windows`)
+STREAM_WINDOW = 32
+# Pages of a chapter its boilerplate is detected over (evenly spaced), by every ingestion path
+BOILERPLATE_SAMPLE = 64
+
+
+def open_pdf(path: str, backend: str=DEFAULT_BACKEND, shared: bool=False) -> tuple[str, LazyBook]:
+    """Open a PDF file from disk without extracting any text yet
+    Args:
+        path: Path to the PDF file
+        backend: Text extraction backend, see `utils.pdf_backends`
+        shared: Keep pages in the server-wide page store (only useful inside the app)
+    Returns:
+        tuple[str, LazyBook]: Content hash of the file and its lazily extracted pages
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    book_hash = hash_bytes(data)
+    return book_hash, LazyBook(data, book_hash=book_hash, name=os.path.basename(path), backend=backend, shared=shared)
+
+
+def chapter_pages(book, chapter: dict):
+    """Pages of a chapter (1-based, inclusive 'start'/'end' as in `page_ranges`), extracting them if needed"""
+    start_page, end_page = chapter['start'], chapter['end']
+    if isinstance(book, LazyBook):
+        start = time.time()
+        n_extracted = book.load_pages(range(*slice(start_page-1, end_page).indices(len(book))))
+        get_throughput_log().record('extract', n_extracted, time.time() - start)
+    return book[start_page-1:end_page]
+
+
+def build_chunks(pages, chapter: dict, strip: bool=True,
+                 chunk_size: int=CHUNK_SIZE, chunk_overlap: int=CHUNK_OVERLAP,
+                 page_titles: list[str]=None) -> tuple[ChapterChunks, dict]:
+    """Clean and split the pages of one chapter
+    Args:
+        pages: The chapter's pages, in order
+        chapter: Chapter entry from `page_ranges` (title, start, end, id), or a `book_chapter`
+        strip: Remove repeated headers/footers and near-empty pages first (see `strip_boilerplate`)
+        chunk_size, chunk_overlap: See `ChapterSplitter`
+        page_titles: Per-page chapter titles (see `page_chapter_titles`), used instead of the
+            chapter metadata when a whole book is chunked
+    Returns:
+        tuple[ChapterChunks, dict]: The chunks, with chapter metadata, and the `strip_boilerplate`
+            stats (empty when `strip` is False)
+    """
+    clean_stats = {}
+    if page_titles is not None:
+        pages = _with_titles(pages, page_titles)
+    if strip:
+        repeated = boilerplate_lines([pages[i] for i in boilerplate_sample(len(pages))])
+        pages, clean_stats = strip_boilerplate(pages, repeated=repeated)
+
+    splitter = ChapterSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    extra_metadata = chapter_metadata(chapter) if page_titles is None else {}
+    chunks = splitter.split_pages(pages, extra_metadata=extra_metadata)
+    return chunks, clean_stats
+
+
+def boilerplate_sample(n_pages: int, sample: int=BOILERPLATE_SAMPLE) -> list[int]:
+    """Indices of the pages of a chapter its boilerplate is detected over: all of them, or
+        `sample` evenly spaced ones, so streaming and whole-chapter ingestion clean pages alike"""
+    if n_pages <= sample:
+        return list(range(n_pages))
+    return sorted(set(np.linspace(0, n_pages - 1, sample).astype(int).tolist()))
+
+
+def chunk_ids(chunks: ChapterChunks, book_hash: str) -> list[str]:
+    """Deterministic vector id of every chunk, from its book, page and offset in the page (see `chunk_id`)"""
+    return [chunk_id(book_hash, chunks.metadatas[page]['page'], int(offset))
+            for page, offset in zip(chunks.pages, chunks.page_offsets())]
+
+
+def chapter_metadata(chapter: dict) -> dict:
+    """Metadata added to every chunk of a chapter"""
+    return {
+        'chapter_title': chapter['title'],
+        'chapter_id': chapter['id'],
+        'chapter_start_page': chapter['start'],
+        'chapter_end_page': chapter['end'],
+    }
+
+
+def book_chapter(book_hash: str, book_name: str, n_pages: int) -> dict:
+    """A whole book as a single `page_ranges`-style entry, to ingest it into its book namespace"""
+    return {'title': book_name, 'nest': 0, 'start': 1, 'end': n_pages, 'id': book_namespace(book_hash)}
+
+
+def page_chapter_titles(prange: list[dict], n_pages: int, default: str="") -> list[str]:
+    """
+    Title of the innermost chapter containing each page (0-based), for the 'chapter_title'
+        metadata of chunks in a book namespace. Pages are assigned like `embed_chapter` slices
+        them: `start-1` to `end-1`.
+    """
+    titles = [default] * n_pages
+    for chapter in sorted(prange, key=lambda ch: (ch['nest'], ch['start'])):
+        for page in range(max(chapter['start'] - 1, 0), min(chapter['end'], n_pages)):
+            titles[page] = chapter['title']
+    return titles
+
+
+def _with_titles(pages, page_titles: list[str]) -> list[Document]:
+    return [
+        Document(page_content=page.page_content,
+                 metadata={**page.metadata, 'chapter_title': page_titles[page.metadata['page']]})
+        for page in pages
+    ]
+
+
+def chunking_config(strip: bool=True, chunk_size: int=CHUNK_SIZE, chunk_overlap: int=CHUNK_OVERLAP,
+                    compact: bool=None) -> dict:
+    """Chunking settings that change the chunks of a chapter (or how they are stored), part of its
+        namespace's key. `compact` defaults to the METADATA_MODE setting, see `utils.chunk_store`.
+    """
+    config = {'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap, 'strip': strip}
+    if strip:
+        config['boilerplate_sample'] = BOILERPLATE_SAMPLE
+    if use_compact_metadata() if compact is None else compact:
+        config['compact'] = True # only when set, so full-metadata namespaces keep their keys
+    return config
+
+
+def resolve_namespace(chapter: dict, book_hash: str, embeddings, strip: bool=True, whole_book: bool=False) -> dict:
+    """Registry entry ('namespace', 'status', ...) of a chapter, or a `book_chapter`, of a book
+    Args:
+        chapter: Chapter entry from `page_ranges`, or a `book_chapter`
+        book_hash: Content hash of the book
+        embeddings: Embedding model the chunks are embedded with
+        strip: See `build_chunks`
+        whole_book: `chapter` is a `book_chapter` (book mode)
+    """
+    return get_namespace_registry().resolve(
+        book_hash, chapter['start'], chapter['end'], chunking_config(strip),
+        embedding_model_key(embeddings), prefix='book' if whole_book else 'ch'
+    )
+
+
+def lookup_namespace(chapter: dict, book_hash: str, embeddings, strip: bool=True, whole_book: bool=False) -> dict:
+    """Like `resolve_namespace`, without registering the chapter: None when it was never embedded"""
+    return get_namespace_registry().lookup(
+        book_hash, chapter['start'], chapter['end'], chunking_config(strip),
+        embedding_model_key(embeddings), prefix='book' if whole_book else 'ch'
+    )
+
+
+def _manifest_info(chapter: dict, book_hash: str, book_name: str) -> dict:
+    """Recorded with a namespace's manifest, to recognize the chapter later"""
+    return {
+        'book_hash': book_hash,
+        'book_name': book_name,
+        'chapter_title': chapter['title'],
+        'start': chapter['start'],
+        'end': chapter['end'],
+    }
+
+
+def previous_version(previous_ns: str=None) -> ChunkManifest:
+    """
+    Manifest to diff a chapter against, chosen by the user (namespaces are content-addressed, so
+        a revised PDF always gets a new namespace). Returns None when every chunk must be embedded.
+    """
+    return ChunkManifest.load(previous_ns) if previous_ns else None
+
+
+def find_revision(chapter: dict, book_hash: str, book_name: str) -> ChunkManifest:
+    """
+    Most recent manifest of the same chapter (title and book file name) embedded from another PDF,
+        e.g. the previous edition of a book in the library. None when there is none.
+    """
+    for info in ChunkManifest.list_all():
+        if (info.get('book_name') == book_name and info.get('chapter_title') == chapter['title']
+                and info.get('book_hash') != book_hash):
+            return ChunkManifest.load(info['namespace'])
+    return None
+
+
+def retire_namespace(index, namespace: str):
+    """
+    Delete a superseded version's vectors, chunk texts and manifest, and drop it from the registry.
+        Namespaces are content-addressed, so a revision embedded with `previous=` lands in a new
+        namespace and the one it was diffed against would otherwise keep its stale chunks.
+    """
+    index.delete(delete_all=True, namespace=namespace)
+    get_chunk_store().delete_namespace(namespace)
+    ChunkManifest(namespace).delete()
+    get_namespace_registry().remove(namespace)
+
+
+def embed_chunks(index, embeddings, chunks, chapter: dict, book_hash: str, book_name: str,
+                 previous: ChunkManifest=None, namespace: str=None, progress=None) -> DeltaPlan:
+    """Embed a chapter's chunks into its namespace
+    Args:
+        index: Vector index (see `config_index`)
+        embeddings: Embedding model (see `config_embedding_model_simple`)
+        chunks: Output of `build_chunks`
+        chapter: Chapter entry from `page_ranges`
+        book_hash, book_name: Recorded in the namespace's manifest
+        previous: Manifest of a previous version, only new or changed chunks get embedded
+        namespace: Target namespace (see `resolve_namespace`; default: the chapter id)
+        progress: Optional callback(message: str)
+    Returns:
+        DeltaPlan: What was embedded, reused and removed
+    """
+    namespace = namespace or chapter['id']
+    vectorstore = get_vectorstore(index, embeddings, namespace=namespace)
+    plan = DeltaPlan(chunks, previous)
+    start = time.time()
+    apply_delta(
+        plan, chunks, vectorstore, namespace,
+        info=_manifest_info(chapter, book_hash, book_name),
+        ids=chunk_ids(chunks, book_hash),
+        progress=progress
+    )
+    if previous is None: # reused chunks would skew the measurement
+        get_throughput_log().record('embed', len(plan.added) - plan.resumed, time.time() - start)
+    return plan
+
+
+def stream_chapter(index, embeddings, book, chapter: dict, book_hash: str, book_name: str,
+                   strip: bool=True, window: int=STREAM_WINDOW, page_titles: list[str]=None,
+                   namespace: str=None, progress=None) -> dict:
+    """
+    Streaming version of `build_chunks` + `embed_chunks` for a chapter with no previous version:
+        pages are extracted and cleaned `window` pages at a time in a background thread, flow
+        into the splitter as they come, and chunks flow into concurrent embedding/upsert
+        requests as they are produced.
+    Every stage is bounded (prefetch queue, carried-over splitter text, in-flight requests), so
+        memory does not grow with the chapter, and page parsing overlaps with network calls.
+    Boilerplate is detected once, over the same sample of the chapter's pages as `build_chunks`
+        (see `boilerplate_sample`), and removed from every window.
+    Committed requests are checkpointed in the namespace's manifest: rerun after an interruption,
+        the chapter is split again but only chunks not stored yet are embedded and upserted.
+
+    Args:
+        index, embeddings, chapter, book_hash, book_name: See `embed_chunks`
+        book: `LazyBook` (pages extracted on the fly and not kept) or extracted pages
+        strip: See `build_chunks`
+        window: Pages per window
+        page_titles: See `build_chunks`
+        namespace: See `embed_chunks`
+        progress: Optional callback(message: str)
+    Returns:
+        dict: 'pages', 'chunks', 'embedded' and 'resumed' (already stored) counts
+    """
+    namespace = namespace or chapter['id']
+    stats = {'pages': 0, 'chunks': 0, 'embedded': 0, 'resumed': 0}
+    indices = range(*slice(chapter['start']-1, chapter['end']).indices(len(book)))
+
+    repeated = None
+    if strip:
+        sample = [indices[i] for i in boilerplate_sample(len(indices))]
+        if isinstance(book, LazyBook):
+            book.load_pages(sample)
+        repeated = boilerplate_lines([book[i] for i in sample])
+
+    def windows():
+        if isinstance(book, LazyBook):
+            pages = book.iter_windows(indices, window=window, keep=False)
+        else:
+            pages = ([book[i] for i in indices[j:j + window]] for j in range(0, len(indices), window))
+        for pages_window in pages:
+            stats['pages'] += len(pages_window)
+            if page_titles is not None:
+                pages_window = _with_titles(pages_window, page_titles)
+            yield strip_boilerplate(pages_window, repeated=repeated)[0] if strip else pages_window
+
+    manifest = ChunkManifest(namespace, info={**_manifest_info(chapter, book_hash, book_name), 'complete': False})
+    partial = ChunkManifest.load(namespace)
+    stored = partial.chunks if partial is not None and not partial.info.get('complete', True) else {}
+    pending = {} # vector id -> content hash, until committed
+
+    def items():
+        splitter = ChapterSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        extra_metadata = chapter_metadata(chapter) if page_titles is None else {}
+        seen = set()
+        chunks = splitter.split_stream(prefetch(windows()), extra_metadata=extra_metadata, with_offsets=True)
+        for offset, chunk in chunks:
+            stats['chunks'] += 1
+            h = chunk_hash(chunk.page_content)
+            if h in seen: # same text twice in a chapter is embedded once
+                continue
+            seen.add(h)
+            vector_id = chunk_id(book_hash, chunk.metadata['page'], offset)
+            if stored.get(h) == vector_id:
+                manifest.chunks[h] = vector_id
+                stats['resumed'] += 1
+                continue
+            pending[vector_id] = h
+            yield vector_id, chunk
+
+    def checkpoint(committed):
+        manifest.chunks.update((pending.pop(vector_id), vector_id) for vector_id, _ in committed)
+        manifest.save()
+
+    start = time.time()
+    stats['embedded'] = embed_and_upsert(index, embeddings, items(), namespace, request_items=256,
+                                         compact=namespace_is_compact(namespace), on_commit=checkpoint, progress=progress)
+    # Extraction overlaps with embedding: the time per embedded chunk covers both
+    get_throughput_log().record('embed', stats['embedded'], time.time() - start)
+    manifest.info['complete'] = True
+    manifest.save()
+    return stats
+
+
+def restore_namespace(index, embeddings, book, book_hash: str, book_name: str, prange: list[dict],
+                      namespace: str, progress=None) -> dict:
+    """
+    Embed an evicted namespace again (see `NamespaceLifecycle`), with the page range and chunking
+        it was registered with, so it holds the same chunks under the same ids as before.
+    Args:
+        index, embeddings: See `embed_chunks`, `embeddings` must be the namespace's model
+        book: The namespace's book, `LazyBook` or extracted pages
+        book_hash, book_name: Of `book`
+        prange: Chapter page ranges of the book (`page_ranges`)
+        namespace: The evicted namespace
+        progress: Optional callback(message: str)
+    Returns:
+        dict: See `stream_chapter`
+    """
+    registry = get_namespace_registry()
+    entry = registry.get(namespace)
+    if entry is None or entry['book_hash'] != book_hash or entry['model'] != embedding_model_key(embeddings):
+        raise ValueError(f"Namespace {namespace} was not embedded from this book with this embedding model")
+
+    page_titles = None
+    if json.loads(entry['key'])['kind'] == 'book':
+        chapter = book_chapter(book_hash, book_name, len(book))
+        page_titles = page_chapter_titles(prange, len(book), default=book_name)
+    else:
+        chapter = next((ch for ch in prange if (ch['start'], ch['end']) == (entry['start'], entry['end'])), None)
+        if chapter is None:
+            raise ValueError(f"No chapter of the book spans pages {entry['start']}-{entry['end']}")
+
+    registry.set_status(namespace, PENDING)
+    stats = stream_chapter(index, embeddings, book, chapter, book_hash, book_name,
+                           strip=entry['chunking']['strip'], page_titles=page_titles,
+                           namespace=namespace, progress=progress)
+    registry.set_status(namespace, READY, stats['chunks'])
+    return stats
+
+
+def ingest_book(path: str, index, embeddings, nest: int=1, backend: str=DEFAULT_BACKEND,
+                strip: bool=True, namespace_mode: str='chapter', replace_previous: bool=True,
+                progress=None) -> dict:
+    """Ingest every chapter of a book at one nesting level of its outline
+        (or, in book mode, the whole book once into its book namespace)
+    Chapters whose namespace the `NamespaceRegistry` marks as ready are skipped, so an
+        interrupted run resumes where it stopped. A chapter embedded from an earlier version of
+        the same file (see `find_revision`) is diffed against, only changed chunks are embedded,
+        and then retired (see `retire_namespace`) unless `replace_previous` is False.
+
+    Args:
+        path: Path to the PDF file
+        index, embeddings: See `embed_chunks`
+        nest: Outline nesting level of the chapters to ingest (1 = top level, chapter mode only)
+        backend: Text extraction backend
+        strip: See `build_chunks`
+        namespace_mode: 'chapter' or 'book', see `utils.retrieval`
+        replace_previous: Delete the earlier version a chapter was diffed against
+        progress: Optional callback(message: str)
+    Returns:
+        dict: Per-book stats ('book_hash', 'status', chapter/page/chunk counts, timings)
+    """
+    report = progress or (lambda message: None)
+    start_total = time.time()
+    stats = {'book_hash': None, 'status': 'done', 'chapters': 0, 'skipped': 0,
+             'pages': 0, 'chunks': 0, 'embedded': 0, 'reused': 0, 'resumed': 0, 'retired': 0,
+             'extract_seconds': 0.0, 'embed_seconds': 0.0, 'stream_seconds': 0.0}
+
+    book_hash, book = open_pdf(path, backend=backend)
+    stats['book_hash'] = book_hash
+    chapters = book_chapters(book_hash, reader=book.reader)
+    if not chapters:
+        stats['status'] = 'no_toc'
+        return stats
+
+    page_titles = None
+    if namespace_mode == 'book':
+        selected = [book_chapter(book_hash, os.path.basename(path), len(book))]
+        page_titles = page_chapter_titles(chapters['prange'], len(book), default=os.path.basename(path))
+    else:
+        selected = [ch for ch in chapters['prange'] if ch['nest'] == nest]
+
+    registry = get_namespace_registry()
+    for chapter in selected:
+        namespace = resolve_namespace(chapter, book_hash, embeddings, strip=strip,
+                                      whole_book=namespace_mode == 'book')['namespace']
+        if registry.is_ready(namespace):
+            stats['skipped'] += 1
+            continue
+
+        previous = find_revision(chapter, book_hash, os.path.basename(path))
+        if previous is None:
+            # Nothing to diff against: extraction, splitting and embedding overlap
+            start = time.time()
+            chapter_stats = stream_chapter(index, embeddings, book, chapter, book_hash,
+                                           os.path.basename(path), strip=strip, page_titles=page_titles,
+                                           namespace=namespace)
+            stats['stream_seconds'] += time.time() - start
+            n_pages, n_chunks, n_embedded, n_reused = (chapter_stats['pages'], chapter_stats['chunks'],
+                                                       chapter_stats['embedded'], 0)
+            n_resumed = chapter_stats['resumed']
+        else:
+            start = time.time()
+            pages = chapter_pages(book, chapter)
+            chunks, _ = build_chunks(pages, chapter, strip=strip, page_titles=page_titles)
+            stats['extract_seconds'] += time.time() - start
+
+            start = time.time()
+            plan = embed_chunks(index, embeddings, chunks, chapter, book_hash, os.path.basename(path),
+                                previous=previous, namespace=namespace)
+            stats['embed_seconds'] += time.time() - start
+            n_pages, n_chunks, n_embedded, n_reused = len(pages), len(chunks), len(plan.added), len(plan.unchanged)
+            n_resumed = plan.resumed
+
+        registry.set_status(namespace, READY, n_chunks)
+        if replace_previous and previous is not None and previous.namespace != namespace:
+            retire_namespace(index, previous.namespace)
+            stats['retired'] += 1
+            report(f"{namespace} '{chapter['title']}': deleted previous version {previous.namespace}")
+
+        stats['chapters'] += 1
+        stats['pages'] += n_pages
+        stats['chunks'] += n_chunks
+        stats['embedded'] += n_embedded
+        stats['reused'] += n_reused
+        stats['resumed'] += n_resumed
+        report(f"{namespace} '{chapter['title']}': {n_chunks} chunks, "
+               f"{n_embedded} embedded, {n_reused} reused, {n_resumed} already stored by an interrupted run")
+
+    stats['total_seconds'] = time.time() - start_total
+    return stats
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+from .chunk_store import get_chunk_store
+from .config import get_setting
+from .delta import ChunkManifest
+from .registry import EVICTED, NamespaceRegistry, get_namespace_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def vector_budget() -> int:
+    """VECTOR_BUDGET setting: maximum number of vectors kept in the index (0 or unset: no limit)"""
+    return int(get_setting("VECTOR_BUDGET", 0) or 0)
+
+
+class NamespaceLifecycle():
+    """
+    Keeps the ready namespaces of an index within a total vector budget by deleting the least
+        recently used ones (see `NamespaceRegistry.touch`). Evicted namespaces stay registered as
+        `EVICTED`: the chapter is embedded again the next time it is used (see
+        `utils.ingest.restore_namespace`), mostly from the embedding cache.
+
+    Args:
+        index: Vector index (see `config_index`)
+        budget: Maximum number of vectors (default: VECTOR_BUDGET setting)
+        min_idle: Seconds since a namespace's last use before it can be evicted (default:
+            EVICTION_MIN_IDLE setting, 600), so chapters in an ongoing session are kept even
+            when that leaves the index over budget
+        registry: Namespace registry (default: the shared one)
+    """
+    def __init__(self, index, budget: int=None, min_idle: float=None, registry: NamespaceRegistry=None):
+        self.index = index
+        self.budget = vector_budget() if budget is None else budget
+        self.min_idle = float(get_setting("EVICTION_MIN_IDLE", 600)) if min_idle is None else min_idle
+        self.registry = registry or get_namespace_registry()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def evict(self, namespace: str):
+        """Delete a namespace's vectors, chunk texts and manifest, keeping its registry entry"""
+        self.index.delete(delete_all=True, namespace=namespace)
+        get_chunk_store().delete_namespace(namespace)
+        ChunkManifest(namespace).delete()
+        self.registry.set_status(namespace, EVICTED)
+
+    def enforce(self, keep: list[str]=()) -> list[str]:
+        """Evict least recently used namespaces until the ready ones fit in the budget. Only the
+            namespaces in this index count, with their actual number of vectors.
+        Args:
+            keep: Namespaces not to evict (e.g. the one about to be searched)
+        Returns:
+            list[str]: The evicted namespaces
+        """
+        if not self.budget:
+            return []
+        stats = self.index.describe_index_stats()['namespaces']
+        counts = {name: stats[name]['vector_count'] for name in stats}
+        entries = self.registry.least_recently_used(namespaces=counts)
+        total = sum(counts[entry['namespace']] for entry in entries)
+        now = time.time()
+        evicted = []
+        for entry in entries:
+            if total <= self.budget:
+                break
+            if entry['namespace'] in keep or now - max(entry['last_access'], entry['updated']) < self.min_idle:
+                continue
+            self.evict(entry['namespace'])
+            total -= counts[entry['namespace']]
+            evicted.append(entry['namespace'])
+        return evicted
+
+    def start(self, interval: float=None):
+        """Enforce the budget every `interval` seconds (default: EVICTION_INTERVAL setting, 300) in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        interval = float(get_setting("EVICTION_INTERVAL", 300)) if interval is None else interval
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    evicted = self.enforce()
+                    if evicted:
+                        logger.info("Evicted %d least recently used namespaces: %s", len(evicted), evicted)
+                except Exception: # e.g. the vector store is unreachable: try again next time
+                    logger.warning("Namespace eviction failed", exc_info=True)
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='namespace-eviction', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_lifecycles = {}
+_lifecycles_lock = threading.Lock()
+
+def start_lifecycle(index, index_name: str) -> NamespaceLifecycle:
+    """
+    The process's `NamespaceLifecycle` of an index, with its eviction thread running when a
+        VECTOR_BUDGET is set (one per index name, however many times the index is opened).
+        Returns None when there is no budget.
+    """
+    if not vector_budget():
+        return None
+    with _lifecycles_lock:
+        lifecycle = _lifecycles.get(index_name)
+        if lifecycle is None:
+            lifecycle = _lifecycles[index_name] = NamespaceLifecycle(index)
+            lifecycle.start()
+    return lifecycle
+
+
+def needs_restore(namespace: str) -> bool:
+    """Whether a namespace was evicted and must be embedded again before being searched"""
+    entry = get_namespace_registry().get(namespace) if namespace else None
+    return entry is not None and entry['status'] == EVICTED
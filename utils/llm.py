@@ -3,8 +3,42 @@ from langchain.schema import AIMessage, SystemMessage, HumanMessage
 
 import streamlit as st
 
+from .config import get_setting
+from .embedding_cache import CachedEmbeddings
+from .local_embeddings import HashingEmbeddings
+
+def _with_cache(embedding_model):
+    """Put the persistent embedding cache in front of the model, unless EMBEDDING_CACHE is off"""
+    if str(get_setting("EMBEDDING_CACHE", "true")).lower() in ("0", "false", "no", "off"):
+        return embedding_model
+    return CachedEmbeddings(embedding_model)
+
+def embedding_dimensions() -> int:
+    """
+    EMBEDDING_DIMENSIONS setting: length text-embedding-3 vectors are shortened to (e.g. 512 or 256,
+        smaller indexes at a small cost in retrieval quality), None for the model's full 1536
+    """
+    dimensions = get_setting("EMBEDDING_DIMENSIONS")
+    return int(dimensions) if dimensions else None
+
+EMBEDDING_BACKENDS = ('openai', 'local')
+
+def embedding_backend() -> str:
+    """EMBEDDING_BACKEND setting: 'openai' (default) or 'local' (`HashingEmbeddings`, no network)"""
+    backend = get_setting("EMBEDDING_BACKEND", "openai")
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+    return backend
+
+def local_embedding_model() -> HashingEmbeddings:
+    """
+    Offline embedding model, with as many dimensions as OpenAI vectors would have so the same
+        index fits. Not cached: hashing a text is faster than looking it up.
+    """
+    return HashingEmbeddings(dimensions=embedding_dimensions() or 1536)
+
 def config_llm():
-    OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+    OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
     ss = st.session_state
 
     model_opt = st.sidebar.selectbox(
@@ -24,16 +58,19 @@ def config_llm():
     return llm
 
 def config_embedding_model():
-    OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+    if embedding_backend() == 'local':
+        return local_embedding_model()
+    OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
     embedding_model = OpenAIEmbeddings(
         model="text-embedding-3-small",
+        dimensions=embedding_dimensions(),
         api_key=OPENAI_API_KEY
     )
 
-    return embedding_model
+    return _with_cache(embedding_model)
 
 def config_llm_simple():
-    OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+    OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
     llm = ChatOpenAI(
         model="gpt-4o-mini",
         api_key=OPENAI_API_KEY
@@ -41,9 +78,12 @@ def config_llm_simple():
     return llm
 
 def config_embedding_model_simple():
-    OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+    if embedding_backend() == 'local':
+        return local_embedding_model()
+    OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
     embedding_model = OpenAIEmbeddings(
         model="text-embedding-3-small",
+        dimensions=embedding_dimensions(),
         api_key=OPENAI_API_KEY
     )
-    return embedding_model
\ No newline at end of file
+    return _with_cache(embedding_model)
\ No newline at end of file
@@ -0,0 +1,70 @@
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embedding model: no download, no network, deterministic across processes.
+    A text's features are its lowercased words, word bigrams and character n-grams of each word,
+        weighted by sublinear term frequency (1 + log tf). Each feature is hashed (crc32) and
+        projected onto `n_probes` of the `dimensions` output coordinates with random signs, a
+        sparse random projection of the hashed feature space that is computed with one
+        `np.bincount` per text, then L2-normalized so cosine similarity works as with OpenAI
+        vectors. Lexical rather than semantic: a baseline and a zero-latency development mode.
+
+    Args:
+        dimensions: Length of the vectors (must match the vector index, 1536 by default like text-embedding-3-small)
+        char_ngrams: (min, max) length of the character n-grams, 0 for words only
+        n_probes: Output coordinates each feature is added to
+        seed: Seed of the projection (vectors from different seeds are not comparable)
+    """
+    model = 'local-hashing'
+
+    def __init__(self, dimensions: int=1536, char_ngrams: tuple[int, int]=(3, 5), n_probes: int=4, seed: int=0):
+        self.dimensions = dimensions
+        self.char_ngrams = char_ngrams
+        self.n_probes = n_probes
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Per probe: odd multiplier and offset of a multiply-shift hash, from the feature hash to a coordinate
+        self._multipliers = rng.integers(1, 2**31, size=n_probes, dtype=np.uint64) * 2 + 1
+        self._offsets = rng.integers(0, 2**63, size=n_probes, dtype=np.uint64)
+
+    def _features(self, text: str) -> list[str]:
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        low, high = self.char_ngrams or (0, 0)
+        if high:
+            for word in words:
+                padded = f"<{word}>"
+                for n in range(low, min(high, len(padded)) + 1):
+                    features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, text: str) -> np.ndarray:
+        features = self._features(text)
+        if not features:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint64, count=len(features))
+        hashes, counts = np.unique(hashes, return_counts=True)
+        weights = 1 + np.log(counts)
+
+        mixed = hashes[:, None] * self._multipliers[None, :] + self._offsets[None, :] # wraps around mod 2**64
+        coords = (mixed >> np.uint64(32)) % np.uint64(self.dimensions)
+        signs = np.where((mixed >> np.uint64(31)) & np.uint64(1), 1.0, -1.0)
+        vector = np.bincount(coords.ravel().astype(np.intp), weights=(signs * weights[:, None]).ravel(),
+                             minlength=self.dimensions)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text).tolist()
@@ -0,0 +1,550 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+try:
+    import fcntl
+except ImportError: # Windows: no lock between processes
+    fcntl = None
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+# How the search pass reads vectors: float32 as stored, or compact codes re-scored with the floats
+QUANTIZATIONS = ('none', 'int8', 'binary')
+# Rows scored per block, bounds the float32 copy of int8 codes
+_BLOCK = 8192
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Scalar quantization of unit-normalized rows: int8 codes, and a float32 scale per row"""
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    scales = np.maximum(np.abs(unit).max(axis=1), 1e-12) / 127
+    return np.round(unit / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits of each row, packed 8 per byte"""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def _compare(value, op: str, operand) -> bool:
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if value is None:
+        return False
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    if op == '$lte':
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata: dict, filter: dict) -> bool:
+    """
+    Whether `metadata` satisfies a Pinecone-style metadata filter: `{'field': value}`,
+        `{'field': {'$gte': 3, '$lte': 9}}`, `$eq/$ne/$gt/$gte/$lt/$lte/$in/$nin`, `$and/$or`
+    """
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class _Namespace():
+    """
+    One namespace on disk, as files that are appended to:
+        - vectors.f32: raw float32 rows, memory-mapped for search
+        - codes.i8 + scales.f32, codes.bin: int8 and binary codes of the same rows (see `quantize_int8`,
+            `quantize_binary`), 4x and 32x smaller than the floats. They are kept in addition to
+            the floats: a row takes 5.125 * dimension + 4 bytes, about 28% more than float32 alone
+        - rows.jsonl: one record per written row (id, row, metadata), a tombstone (row null) per
+            deleted id, the last record of an id wins. The first line holds the dimension.
+    Once more than half the rows are dead (overwritten or deleted), the files are rewritten with
+        only the live rows (`compact`).
+    Other processes' writes are picked up by reading the new tail of rows.jsonl, or all of it
+        when it was replaced by a compaction (`refresh`); `LocalIndex` holds a file lock around
+        reads and writes.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+
+    def _reset(self):
+        self.dimension = None
+        self.ids = {}       # id -> row
+        self.row_ids = []   # row -> id (None once overwritten or deleted)
+        self.metadata = []  # row -> metadata
+        self._offset = 0
+        self._inode = None  # of rows.jsonl: a compaction replaces the file
+        self._vectors = None
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._codes = {}
+        self._rows_cache = {} # filter -> live rows matching it, until the next write
+
+    @property
+    def _rows_path(self) -> str:
+        return os.path.join(self.path, 'rows.jsonl')
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, 'vectors.f32')
+
+    def refresh(self):
+        try:
+            stat = os.stat(self._rows_path)
+        except OSError:
+            return
+        if stat.st_ino != self._inode:
+            if self._inode is not None:
+                self._reset()
+            self._inode = stat.st_ino
+        size = stat.st_size
+        if size == self._offset:
+            return
+        with open(self._rows_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        data = data[:data.rfind(b'\n') + 1] # a line still being written is read next time
+        self._offset += len(data)
+
+        for line in data.splitlines():
+            record = json.loads(line)
+            if 'dimension' in record:
+                self.dimension = record['dimension']
+                continue
+            old = self.ids.pop(record['id'], None)
+            if old is not None:
+                self.row_ids[old] = None
+            row = record['row']
+            if row is None:
+                continue
+            if row >= len(self.row_ids):
+                self.row_ids.extend([None] * (row + 1 - len(self.row_ids)))
+                self.metadata.extend([None] * (row + 1 - len(self.metadata)))
+            self.ids[record['id']] = row
+            self.row_ids[row] = record['id']
+            self.metadata[row] = record['metadata']
+        self._vectors = None
+        self._codes.clear()
+        self._rows_cache.clear()
+
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped (rows, dimension) matrix, and norms of the rows (computed once per row)"""
+        if self._vectors is None and self.row_ids:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r',
+                                      shape=(len(self.row_ids), self.dimension))
+            if len(self._norms) < len(self.row_ids):
+                new = np.linalg.norm(self._vectors[len(self._norms):], axis=1).astype(np.float32)
+                self._norms = np.concatenate([self._norms, new])
+        return self._vectors
+
+    def append(self, records: list[tuple[str, list[float], dict]]):
+        values = np.asarray([values for _, values, _ in records], dtype=np.float32)
+        os.makedirs(self.path, exist_ok=True)
+        lines = []
+        if self.dimension is None:
+            self.dimension = values.shape[1]
+            lines.append(json.dumps({'dimension': self.dimension}))
+        elif values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match the namespace's ({self.dimension})")
+
+        # Vectors and codes first: a row listed in rows.jsonl always has them on disk
+        with open(self._vectors_path, 'ab') as f:
+            start = f.tell() // (4 * self.dimension)
+            f.write(values.tobytes())
+        self._append_codes(values)
+        lines += [json.dumps({'id': vector_id, 'row': start + i, 'metadata': metadata})
+                  for i, (vector_id, _, metadata) in enumerate(records)]
+        with open(self._rows_path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        self.refresh()
+        self._compact_if_sparse()
+
+    def _append_codes(self, values: np.ndarray, suffix: str=''):
+        codes, scales = quantize_int8(values)
+        for name, data in (('codes.i8', codes), ('scales.f32', scales), ('codes.bin', quantize_binary(values))):
+            with open(os.path.join(self.path, name + suffix), 'ab') as f:
+                f.write(data.tobytes())
+
+    def _compact_if_sparse(self):
+        if len(self.row_ids) - len(self.ids) > len(self.row_ids) / 2:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the namespace with only its live rows (call with the write lock held)"""
+        if self.dimension is None:
+            return
+        live = [row for row, vector_id in enumerate(self.row_ids) if vector_id is not None]
+        values = np.asarray(self.vectors()[live]) if live else np.zeros((0, self.dimension), dtype=np.float32)
+        lines = [json.dumps({'dimension': self.dimension})]
+        lines += [json.dumps({'id': self.row_ids[row], 'row': i, 'metadata': self.metadata[row]})
+                  for i, row in enumerate(live)]
+
+        # Written next to the current files, then swapped in, rows.jsonl last: readers see either version
+        tmp = '.compact'
+        names = ('vectors.f32', 'codes.i8', 'scales.f32', 'codes.bin', 'rows.jsonl')
+        for name in names:
+            if os.path.exists(os.path.join(self.path, name + tmp)):
+                os.remove(os.path.join(self.path, name + tmp))
+        with open(self._vectors_path + tmp, 'wb') as f:
+            f.write(values.astype(np.float32).tobytes())
+        self._append_codes(values, suffix=tmp)
+        with open(self._rows_path + tmp, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        for name in names:
+            os.replace(os.path.join(self.path, name + tmp), os.path.join(self.path, name))
+        self._reset()
+        self.refresh()
+
+    def codes(self, quantization: str):
+        """Memory-mapped codes of every row: (int8 codes, scales) or packed bits"""
+        if quantization not in self._codes:
+            n_rows = len(self.row_ids)
+            # Namespaces written before codes existed get them computed once from the floats
+            n_coded = os.path.getsize(os.path.join(self.path, 'scales.f32')) // 4 \
+                if os.path.exists(os.path.join(self.path, 'scales.f32')) else 0
+            if n_coded < n_rows:
+                self._append_codes(np.asarray(self.vectors()[n_coded:n_rows]))
+            if quantization == 'int8':
+                self._codes[quantization] = (
+                    np.memmap(os.path.join(self.path, 'codes.i8'), dtype=np.int8, mode='r', shape=(n_rows, self.dimension)),
+                    np.memmap(os.path.join(self.path, 'scales.f32'), dtype=np.float32, mode='r', shape=(n_rows,)),
+                )
+            else:
+                self._codes[quantization] = np.memmap(os.path.join(self.path, 'codes.bin'), dtype=np.uint8, mode='r',
+                                                      shape=(n_rows, (self.dimension + 7) // 8))
+        return self._codes[quantization]
+
+    def remove(self, ids: list[str]):
+        lines = [json.dumps({'id': vector_id, 'row': None}) for vector_id in ids if vector_id in self.ids]
+        if lines:
+            with open(self._rows_path, 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            self.refresh()
+            self._compact_if_sparse()
+
+    def live_rows(self, filter: dict=None) -> np.ndarray:
+        """Rows of the current vectors matching `filter`, cached: a chat asks with the same filter every time"""
+        key = json.dumps(filter, sort_keys=True)
+        if key not in self._rows_cache:
+            self._rows_cache[key] = np.fromiter(
+                (row for row, vector_id in enumerate(self.row_ids)
+                 if vector_id is not None and (filter is None or matches_filter(self.metadata[row], filter))),
+                dtype=np.int64
+            )
+        return self._rows_cache[key]
+
+
+class LocalIndex():
+    """
+    In-process vector index with the subset of the Pinecone `Index` API the app uses
+        (`upsert`, `fetch`, `delete`, `query`, `describe_index_stats`), so the ingestion pipeline
+        works unchanged. Each namespace is a memory-mapped float32 matrix under `path` (see
+        `_Namespace`); search is an exact cosine scan, fast for chapters of a few thousand chunks.
+    Use `open_local_index` to share one instance (and its loaded namespaces) per path. Several
+        processes can use the same index: reads and writes hold a lock on <path>/.lock
+        (`fcntl.flock`, shared for reads; on Windows only threads are synchronized).
+
+    Args:
+        path: Directory of the index
+        quantization: Scan int8 or binary codes instead of the floats (see `QUANTIZATIONS`). This
+            reduces what a query reads, not the index size: codes are stored for every row
+            whatever the setting, next to the floats
+        rescore: With quantization, re-score `rescore * top_k` candidates with the float vectors
+            (reading only their rows); 0 ranks by the codes alone and never reads the floats
+    """
+    def __init__(self, path: str, quantization: str='none', rescore: int=4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        self.path = path
+        self.quantization = quantization
+        self.rescore = rescore
+        self._lock = threading.RLock()
+        self._depth = 0 # nested `_locked` calls, which reuse the file lock
+        self._namespaces = {}
+        os.makedirs(path, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, exclusive: bool=False):
+        """Hold the thread lock, and the file lock shared with other processes (exclusive to write)"""
+        with self._lock:
+            if fcntl is None or self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with open(os.path.join(self.path, '.lock'), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _dir(self, namespace: str) -> str:
+        return os.path.join(self.path, namespace or '__default__')
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = _Namespace(self._dir(namespace))
+            ns = self._namespaces[namespace]
+            ns.refresh()
+            return ns
+
+    def upsert(self, vectors: list, namespace: str='') -> dict:
+        """
+        Args:
+            vectors: dicts with 'id', 'values' and 'metadata', or (id, values, metadata) tuples
+        """
+        records = [(v['id'], v['values'], v.get('metadata') or {}) if isinstance(v, dict) else tuple(v)
+                   for v in vectors]
+        if records:
+            with self._locked(exclusive=True):
+                self._namespace(namespace).append(records)
+        return {'upserted_count': len(records)}
+
+    def fetch(self, ids: list[str], namespace: str=''):
+        with self._locked():
+            ns = self._namespace(namespace)
+            vectors = ns.vectors()
+            found = {
+                vector_id: SimpleNamespace(id=vector_id, values=vectors[ns.ids[vector_id]].tolist(),
+                                           metadata=ns.metadata[ns.ids[vector_id]])
+                for vector_id in ids if vector_id in ns.ids
+            }
+        return SimpleNamespace(vectors=found, namespace=namespace)
+
+    def delete(self, ids: list[str]=None, delete_all: bool=False, namespace: str='', filter: dict=None):
+        with self._locked(exclusive=True):
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                shutil.rmtree(self._dir(namespace), ignore_errors=True)
+                return
+            ns = self._namespace(namespace)
+            if filter is not None:
+                ids = [ns.row_ids[row] for row in ns.live_rows(filter)]
+            ns.remove(list(ids or []))
+
+    def query(self, vector: list[float], top_k: int=10, namespace: str='', filter: dict=None,
+              include_values: bool=False, include_metadata: bool=True) -> dict:
+        """
+        Cosine top-k, as a Pinecone-style response ({'matches': [{'id', 'score', ...}]}).
+        Exact without quantization; otherwise candidates come from the codes and, when `rescore`
+            is set, are ranked by their exact cosine.
+        """
+        with self._locked():
+            ns = self._namespace(namespace)
+            rows = ns.live_rows(filter)
+            if len(rows) == 0:
+                return {'matches': [], 'namespace': namespace}
+            vectors = ns.vectors()
+            norms = ns._norms
+            codes = ns.codes(self.quantization) if self.quantization != 'none' else None
+            metadata = ns.metadata
+            row_ids = ns.row_ids
+
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = max(float(np.linalg.norm(query)), 1e-12)
+        k = min(top_k, len(rows))
+        if codes is None:
+            # One contiguous pass over the whole matrix beats gathering the filtered rows first
+            candidates = rows
+            scores = (vectors @ query)[rows] / np.maximum(norms[rows] * query_norm, 1e-12)
+        else:
+            approx = _approximate_scores(codes, query / query_norm, self.quantization, ns.dimension)[rows]
+            n = min(len(rows), k * self.rescore) if self.rescore else k
+            candidates = rows[np.argpartition(-approx, n - 1)[:n]]
+            if self.rescore:
+                candidates.sort() # memory-mapped rows read in file order
+                scores = (vectors[candidates] @ query) / np.maximum(norms[candidates] * query_norm, 1e-12)
+            else:
+                scores = _approximate_scores(codes, query / query_norm, self.quantization, ns.dimension, candidates)
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for i in top:
+            row = candidates[i]
+            match = {'id': row_ids[row], 'score': float(scores[i])}
+            if include_metadata:
+                match['metadata'] = metadata[row]
+            if include_values:
+                match['values'] = vectors[row].tolist()
+            matches.append(match)
+        return {'matches': matches, 'namespace': namespace}
+
+    def describe_index_stats(self) -> dict:
+        namespaces = {}
+        dimension = None
+        with self._locked():
+            for name in sorted(os.listdir(self.path)):
+                if os.path.isdir(os.path.join(self.path, name)):
+                    ns = self._namespace('' if name == '__default__' else name)
+                    namespaces[name] = {'vector_count': len(ns.ids)}
+                    dimension = dimension or ns.dimension
+        return {'dimension': dimension, 'namespaces': namespaces,
+                'total_vector_count': sum(ns['vector_count'] for ns in namespaces.values())}
+
+
+def _approximate_scores(codes, unit_query: np.ndarray, quantization: str, dimension: int,
+                        rows: np.ndarray=None) -> np.ndarray:
+    """Cosine estimates of `rows` (default: every row) from their codes, scanned in blocks"""
+    n = len(rows) if rows is not None else len(codes[0] if quantization == 'int8' else codes)
+    scores = np.empty(n, dtype=np.float32)
+    if quantization == 'binary':
+        query_bits = quantize_binary(unit_query[None, :])[0]
+    for start in range(0, n, _BLOCK):
+        block = slice(start, start + _BLOCK) if rows is None else rows[start:start + _BLOCK]
+        if quantization == 'int8':
+            scores[start:start + _BLOCK] = (codes[0][block].astype(np.float32) @ unit_query) * codes[1][block]
+        else:
+            # Hamming distance between sign bits estimates the angle
+            hamming = _POPCOUNT[np.bitwise_xor(codes[block], query_bits)].sum(axis=1)
+            scores[start:start + _BLOCK] = np.cos(np.pi * hamming / dimension)
+    return scores
+
+
+_local_indexes = {}
+_local_indexes_lock = threading.Lock()
+
+def open_local_index(path: str, quantization: str='none', rescore: int=4) -> LocalIndex:
+    """The process-wide `LocalIndex` stored at `path` (see `LocalIndex` for the search settings)"""
+    path = os.path.abspath(path)
+    with _local_indexes_lock:
+        if path not in _local_indexes:
+            _local_indexes[path] = LocalIndex(path, quantization=quantization, rescore=rescore)
+        return _local_indexes[path]
+
+
+def _mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """Maximal marginal relevance: indices of `k` candidates, trading relevance for diversity"""
+    unit = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    relevance = unit @ (query / max(np.linalg.norm(query), 1e-12))
+    similarity = unit @ unit.T
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(candidates)):
+        redundancy = similarity[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+
+class LocalVectorStore(VectorStore):
+    """
+    LangChain vector store over a `LocalIndex`, a drop-in for `PineconeVectorStore`
+        (same constructor arguments, same 'text' metadata key, Pinecone-style `filter`).
+
+    Args:
+        index: The `LocalIndex`
+        embedding: Embedding model
+        namespace: Namespace to read and write
+        text_key: Metadata key holding the chunk text
+    """
+    def __init__(self, index: LocalIndex, embedding: Embeddings, namespace: str=None, text_key: str='text'):
+        self._index = index
+        self._embedding = embedding
+        self._namespace = namespace or ''
+        self._text_key = text_key
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(self, texts, metadatas: list[dict]=None, ids: list[str]=None,
+                  batch_size: int=100, **kwargs) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        for i in range(0, len(texts), batch_size):
+            self._index.upsert(
+                vectors=[{'id': vector_id, 'values': values, 'metadata': {**metadata, self._text_key: text}}
+                         for vector_id, values, metadata, text in zip(ids[i:i + batch_size], vectors[i:i + batch_size],
+                                                                      metadatas[i:i + batch_size], texts[i:i + batch_size])],
+                namespace=self._namespace
+            )
+        return ids
+
+    def _document(self, metadata: dict) -> Document:
+        metadata = dict(metadata)
+        text = metadata.pop(self._text_key, "")
+        return Document(page_content=text, metadata=metadata)
+
+    def similarity_search_by_vector_with_score(self, embedding: list[float], k: int=4,
+                                               filter: dict=None, **kwargs) -> list[tuple[Document, float]]:
+        response = self._index.query(embedding, top_k=k, namespace=self._namespace, filter=filter)
+        return [(self._document(match['metadata']), match['score']) for match in response['matches']]
+
+    def similarity_search_with_score(self, query: str, k: int=4, filter: dict=None, **kwargs) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int=4, filter: dict=None, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int=4, filter: dict=None, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding: list[float], k: int=4, fetch_k: int=20,
+                                                lambda_mult: float=0.5, filter: dict=None, **kwargs) -> list[Document]:
+        response = self._index.query(embedding, top_k=fetch_k, namespace=self._namespace, filter=filter,
+                                     include_values=True)
+        matches = response['matches']
+        if not matches:
+            return []
+        candidates = np.asarray([match['values'] for match in matches], dtype=np.float32)
+        selected = _mmr(np.asarray(embedding, dtype=np.float32), candidates, k, lambda_mult)
+        return [self._document(matches[i]['metadata']) for i in selected]
+
+    def max_marginal_relevance_search(self, query: str, k: int=4, fetch_k: int=20,
+                                      lambda_mult: float=0.5, filter: dict=None, **kwargs) -> list[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+        )
+
+    def delete(self, ids: list[str]=None, delete_all: bool=None, **kwargs):
+        self._index.delete(ids=ids, delete_all=bool(delete_all), namespace=self._namespace)
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts, embedding: Embeddings, metadatas: list[dict]=None, ids: list[str]=None,
+                   index: LocalIndex=None, namespace: str=None, **kwargs) -> "LocalVectorStore":
+        store = cls(index, embedding, namespace=namespace)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
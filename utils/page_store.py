@@ -0,0 +1,192 @@
+import sys
+import threading
+
+import numpy as np
+import streamlit as st
+
+from .pdf_backends import DEFAULT_BACKEND
+
+
+class PageView():
+    """
+    Read-only stand-in for a page `Document` (`page_content` and `metadata`),
+        materialized from the store's buffer only when accessed.
+    """
+    __slots__ = ('_store', 'index')
+
+    def __init__(self, store: "PageStore", index: int):
+        self._store = store
+        self.index = index
+
+    @property
+    def page_content(self) -> str:
+        return self._store.text(self.index)
+
+    @property
+    def metadata(self) -> dict:
+        return self._store.metadata(self.index) # fresh dict, callers may modify it
+
+    def __repr__(self):
+        return f"PageView(page={self.index}, chars={self._store.length(self.index)})"
+
+
+class PageSlice():
+    """A range of pages of a `PageStore`, without copying any text"""
+    __slots__ = ('_store', '_indices')
+
+    def __init__(self, store: "PageStore", indices: range):
+        self._store = store
+        self._indices = indices
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return PageSlice(self._store, self._indices[key])
+        return self._store[self._indices[key]]
+
+    def __iter__(self):
+        for i in self._indices:
+            yield self._store[i]
+
+
+class PageStore():
+    """
+    Compact, array-backed container of a book's extracted pages.
+
+    Page text lives in a few string segments, one per `add` call (all pages extracted together);
+        each page is a (segment, start, end) triple of offsets into them, and page labels are
+        interned once per distinct label. Pages are handed out as
+        `PageView`s and slices as `PageSlice`s, so `book[start-1:end]` costs no copies.
+    Pages can be added incrementally (lazily extracted books); the store is safe to share
+        across threads/sessions, see `shared_page_store`.
+
+    Args:
+        n_pages: Total page count of the book (can be set later with `resize`)
+        source: Value of the 'source' metadata of every page
+    """
+    def __init__(self, n_pages: int=0, source: str=""):
+        self.source = source
+        self.lock = threading.RLock()
+        self._segments = []
+        self._segment = np.full(n_pages, -1, dtype=np.int32)
+        self._start = np.full(n_pages, -1, dtype=np.int64) # -1: page not extracted yet
+        self._end = np.full(n_pages, -1, dtype=np.int64)
+        self._label_ids = np.full(n_pages, -1, dtype=np.int32)
+        self._labels = [] # distinct page labels
+        self._label_index = {} # page label -> position in `_labels`
+
+    def resize(self, n_pages: int):
+        """Set the total page count, keeping the pages already stored"""
+        with self.lock:
+            grow = n_pages - len(self)
+            if grow > 0:
+                self._segment = np.concatenate([self._segment, np.full(grow, -1, dtype=np.int32)])
+                self._start = np.concatenate([self._start, np.full(grow, -1, dtype=np.int64)])
+                self._end = np.concatenate([self._end, np.full(grow, -1, dtype=np.int64)])
+                self._label_ids = np.concatenate([self._label_ids, np.full(grow, -1, dtype=np.int32)])
+
+    def add(self, pages: dict) -> int:
+        """Store pages as a new segment, in one join (earlier segments are not copied again)
+        Args:
+            pages: Page index -> page (anything with `page_content` and `metadata`, e.g. a Document)
+        Returns:
+            int: Number of pages added (pages already in the store are skipped)
+        """
+        with self.lock:
+            pieces = []
+            pos = 0
+            segment = len(self._segments)
+            n_added = 0
+            for idx, page in pages.items():
+                if idx in self:
+                    continue
+                text = page.page_content
+                label = str(page.metadata.get('page_label', idx + 1))
+                if label not in self._label_index:
+                    self._label_index[label] = len(self._labels)
+                    self._labels.append(sys.intern(label))
+
+                pieces.append(text)
+                self._segment[idx] = segment
+                self._start[idx] = pos
+                pos += len(text)
+                self._end[idx] = pos
+                self._label_ids[idx] = self._label_index[label]
+                n_added += 1
+
+            if n_added:
+                self._segments.append("".join(pieces))
+        return n_added
+
+    def __contains__(self, idx: int) -> bool:
+        return 0 <= idx < len(self) and self._start[idx] >= 0
+
+    def __len__(self):
+        return len(self._start)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return PageSlice(self, range(*key.indices(len(self))))
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("page index out of range")
+        if key not in self:
+            raise KeyError(f"page {key} has not been extracted yet")
+        return PageView(self, key)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def text(self, idx: int) -> str:
+        return self._segments[self._segment[idx]][self._start[idx]:self._end[idx]]
+
+    def length(self, idx: int) -> int:
+        return int(self._end[idx] - self._start[idx])
+
+    def metadata(self, idx: int) -> dict:
+        """Same metadata as `PyPDFLoader` (source, page, page_label)"""
+        return {'source': self.source, 'page': idx, 'page_label': self._labels[self._label_ids[idx]]}
+
+    def loaded(self) -> list[int]:
+        """Indices of the pages extracted so far"""
+        return np.flatnonzero(self._start >= 0).tolist()
+
+    def n_loaded(self) -> int:
+        return int(np.count_nonzero(self._start >= 0))
+
+    def page_lengths(self) -> np.ndarray:
+        """Characters of every page, -1 for pages not extracted yet"""
+        return np.where(self._start >= 0, self._end - self._start, -1)
+
+    def pages(self) -> dict[int, PageView]:
+        """Extracted pages by index, e.g. for `BookCache.save_pages`"""
+        return {i: PageView(self, i) for i in self.loaded()}
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the store"""
+        return (sum(sys.getsizeof(segment) for segment in self._segments) + self._segment.nbytes
+                + self._start.nbytes + self._end.nbytes
+                + self._label_ids.nbytes + sum(sys.getsizeof(label) for label in self._labels))
+
+
+@st.cache_resource(show_spinner=False)
+def shared_page_store(book_hash: str, backend: str=DEFAULT_BACKEND) -> PageStore:
+    """
+    One `PageStore` per book (and extraction backend) for the whole server: every session that
+        uploads the same PDF reads and fills the same store instead of holding its own copy.
+    Starts empty; the first user sizes and fills it (under `store.lock`).
+    """
+    return PageStore()
@@ -0,0 +1,136 @@
+import io
+
+from pypdf import PdfReader
+
+
+def open_reader(source) -> PdfReader:
+    """
+    Open a PdfReader on a file path, raw PDF bytes (bytes / memoryview) or a binary stream
+        (e.g. Streamlit's UploadedFile), without going through a temp file.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return PdfReader(source)
+
+
+def _as_bytes(source) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+class TextExtractor():
+    """
+    A PDF text-extraction backend: open the document once, then extract page by page.
+    The pypdf reader of the same book is passed in when one is already open (it is needed
+        anyway for the outline and page labels), so pypdf-based backends do not parse twice.
+    """
+    name = None
+
+    def open(self, source, reader: PdfReader=None):
+        return reader if reader is not None else open_reader(source)
+
+    def extract_text(self, doc, index: int) -> str:
+        raise NotImplementedError
+
+    def extract(self, doc, indices) -> list[str]:
+        return [self.extract_text(doc, i) for i in indices]
+
+
+class PypdfExtractor(TextExtractor):
+    """pypdf (pure Python). 'plain' matches what `PyPDFLoader` returns, 'layout' keeps columns/indentation"""
+    def __init__(self, mode: str='plain'):
+        self.mode = mode
+        self.name = 'pypdf' if mode == 'plain' else f'pypdf-{mode}'
+
+    def extract_text(self, doc: PdfReader, index: int) -> str:
+        return doc.pages[index].extract_text(extraction_mode=self.mode)
+
+
+class PymupdfExtractor(TextExtractor):
+    """PyMuPDF (MuPDF, C), optional dependency `pymupdf`"""
+    name = 'pymupdf'
+
+    def open(self, source, reader: PdfReader=None):
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf # PyMuPDF < 1.24.3
+        if isinstance(source, str):
+            return pymupdf.open(source)
+        return pymupdf.open(stream=_as_bytes(source), filetype='pdf')
+
+    def extract_text(self, doc, index: int) -> str:
+        return doc[index].get_text()
+
+
+class PdfiumExtractor(TextExtractor):
+    """PDFium (C++), optional dependency `pypdfium2`"""
+    name = 'pdfium'
+
+    def open(self, source, reader: PdfReader=None):
+        import pypdfium2
+        return pypdfium2.PdfDocument(source if isinstance(source, str) else _as_bytes(source))
+
+    def extract_text(self, doc, index: int) -> str:
+        textpage = doc[index].get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+
+
+class PdfminerExtractor(TextExtractor):
+    """pdfminer.six (pure Python, layout analysis), optional dependency `pdfminer.six`"""
+    name = 'pdfminer'
+
+    def open(self, source, reader: PdfReader=None):
+        return _as_bytes(source)
+
+    def extract(self, doc: bytes, indices) -> list[str]:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        indices = list(indices)
+        texts = {}
+        # pdfminer yields the requested pages in document order, in one pass over the file
+        for i, layout in zip(sorted(indices), extract_pages(io.BytesIO(doc), page_numbers=set(indices))):
+            texts[i] = "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+        return [texts[i] for i in indices]
+
+    def extract_text(self, doc: bytes, index: int) -> str:
+        return self.extract(doc, [index])[0]
+
+
+# name -> (factory, module that must be importable)
+_BACKENDS = {
+    'pypdf': (lambda: PypdfExtractor('plain'), None),
+    'pypdf-layout': (lambda: PypdfExtractor('layout'), None),
+    'pymupdf': (PymupdfExtractor, 'fitz'),
+    'pdfium': (PdfiumExtractor, 'pypdfium2'),
+    'pdfminer': (PdfminerExtractor, 'pdfminer'),
+}
+
+DEFAULT_BACKEND = 'pypdf'
+
+
+def available_extractors() -> list[str]:
+    """Names of the backends whose libraries are installed"""
+    import importlib.util
+    return [
+        name for name, (_, module) in _BACKENDS.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    ]
+
+
+def get_extractor(name: str=None) -> TextExtractor:
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{name}', choose one of {list(_BACKENDS)}")
+    if name not in available_extractors():
+        raise ValueError(f"PDF backend '{name}' is not installed")
+    factory, _ = _BACKENDS[name]
+    return factory()
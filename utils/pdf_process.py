@@ -1,39 +1,369 @@
 from pypdf import PdfReader
 import os
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
 
-import tempfile
 import streamlit as st
 
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+
+from .book_cache import get_book_cache, hash_bytes
+from .page_store import PageStore, shared_page_store
+from .config import get_setting
+from .pdf_backends import DEFAULT_BACKEND, TextExtractor, get_extractor, open_reader
+
+# Below this many pages, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 64
+
+def _extract_pages(extractor: TextExtractor, doc, source, indices, labels: list[str]) -> list[Document]:
+    """Extract pages with an already-open document, with the same metadata as `PyPDFLoader`"""
+    indices = list(indices)
+    return [
+        Document(
+            page_content=text,
+            metadata={'source': source, 'page': i, 'page_label': labels[i]}
+        )
+        for i, text in zip(indices, extractor.extract(doc, indices))
+    ]
+
+# Per worker process: the extractor and document opened by `_init_worker`, and the page labels
+_worker_extractor = None
+_worker_doc = None
+_worker_labels = None
+
+def _init_worker(source, backend: str=DEFAULT_BACKEND):
+    """
+    Runs once in each worker process: open a private reader.
+    `source` is a file path, or ('shm', name, size) for PDF bytes in a SharedMemory block.
+    """
+    global _worker_extractor, _worker_doc, _worker_labels
+    if isinstance(source, tuple):
+        _, name, size = source
+        shm = SharedMemory(name=name)
+        try:
+            data = bytes(shm.buf[:size])
+        finally:
+            shm.close() # the parent owns (and unlinks) the block
+        source = data
+    reader = open_reader(source)
+    _worker_labels = reader.page_labels
+    _worker_extractor = get_extractor(backend)
+    _worker_doc = _worker_extractor.open(source, reader)
+
+def _extract_worker(indices: list[int]) -> list[tuple[str, str]]:
+    """Runs in a worker process: extract (text, page_label) for each page"""
+    texts = _worker_extractor.extract(_worker_doc, indices)
+    return [(text, _worker_labels[i]) for i, text in zip(indices, texts)]
+
+def _mp_context():
+    """
+    Forking a multi-threaded Streamlit server is not safe, and spawning re-imports
+        streamlit/langchain in every worker. A forkserver that has this module preloaded
+        pays the import once, then forks cheap, single-threaded workers.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn") # Windows
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload([__name__])
+    return ctx
 
-@st.cache_data
-def process_book(uploaded_pdf) -> tuple[str, list]:
-    """Process the uploaded PDF file and extract text
+class ExtractionPool():
+    """
+    Worker processes that each open the PDF once (`_init_worker`: a private reader, and the page
+        labels of the whole book) and then extract any number of page batches, so a book read a
+        window at a time pays for the pool, the shared-memory copy and the parsing only once.
+    Use as a context manager, or call `close`.
+
+    Args:
+        source: Path to the PDF file, or the PDF bytes (shared with workers through shared memory)
+        max_workers: Number of worker processes (default: PDF_EXTRACT_WORKERS setting, or all cores)
+        name: Value of the 'source' metadata (default: `source` when it is a path)
+        backend: Text extraction backend, see `utils.pdf_backends`
+    """
+    def __init__(self, source, max_workers: int=None, name: str=None, backend: str=DEFAULT_BACKEND):
+        if max_workers is None:
+            max_workers = int(get_setting("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+        self.max_workers = max(1, max_workers)
+        self.name = name if name is not None else (source if isinstance(source, (str, os.PathLike)) else "")
+
+        self._shm = None
+        worker_source = source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # One copy into shared memory instead of pickling the whole PDF to every worker
+            data = memoryview(source).cast('B')
+            self._shm = SharedMemory(create=True, size=max(1, data.nbytes))
+            self._shm.buf[:data.nbytes] = data
+            worker_source = ('shm', self._shm.name, data.nbytes)
+        try:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(worker_source, backend)
+            )
+        except BaseException:
+            self._release_shm()
+            raise
+
+    def extract(self, indices) -> list[Document]:
+        """
+        Returns:
+            list[Document]: One Document per page, in the order of `indices`,
+                with the same metadata as `PyPDFLoader` (source, page, page_label)
+        """
+        indices = list(indices)
+        # A few spans per worker, so one slow span (e.g. image-heavy pages) does not stall the pool
+        n_spans = min(self.max_workers, len(indices)) * 4
+        span = max(1, -(-len(indices) // max(1, n_spans)))
+        spans = [indices[i:i + span] for i in range(0, len(indices), span)]
+
+        pages = []
+        for span_indices, span_results in zip(spans, self._pool.map(_extract_worker, spans)):
+            for i, (text, label) in zip(span_indices, span_results):
+                pages.append(Document(
+                    page_content=text,
+                    metadata={'source': self.name, 'page': i, 'page_label': label}
+                ))
+        return pages
+
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        self._pool.shutdown()
+        self._release_shm()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def extract_pages_parallel(source, indices, max_workers: int=None, name: str=None,
+                           backend: str=DEFAULT_BACKEND) -> list[Document]:
+    """Extract page text across a pool of processes, each opening its own PdfReader
+    Args:
+        source: Path to the PDF file, or the PDF bytes (shared with workers through shared memory)
+        indices: 0-based page indices to extract
+        max_workers: Number of worker processes (default: PDF_EXTRACT_WORKERS setting, or all cores)
+        name: Value of the 'source' metadata (default: `source` when it is a path)
+        backend: Text extraction backend, see `utils.pdf_backends`
+    Returns:
+        list[Document]: One Document per page, in the order of `indices`,
+            with the same metadata as `PyPDFLoader` (source, page, page_label)
+    """
+    indices = list(indices)
+    if max_workers is None:
+        max_workers = int(get_setting("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+    with ExtractionPool(source, max_workers=min(max_workers, max(1, len(indices))), name=name, backend=backend) as pool:
+        return pool.extract(indices)
+
+def _use_parallel(n_pages: int) -> bool:
+    return n_pages >= PARALLEL_MIN_PAGES and int(get_setting("PDF_EXTRACT_WORKERS", os.cpu_count() or 1)) > 1
+
+def process_book(book_hash: str, uploaded_pdf, backend: str=DEFAULT_BACKEND) -> tuple[str, PageStore]:
+    """Process the uploaded PDF file and extract text, parsing straight from the uploaded bytes
     Args:
+        book_hash: Content hash of the PDF (see `fingerprint_upload`), the cache key
         uploaded_pdf: Uploaded PDF file
+        backend: Text extraction backend, see `utils.pdf_backends`
     Returns:
-        tuple[str, list]: Tuple containing temporary file path and extracted pages
+        tuple[str, PageStore]: Tuple containing the uploaded file name and extracted pages,
+            in the page store shared by every session that uploads the same book
     """
-    pages = []
-    temp_pdf_path = ""
-    # Create new temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-        temp_pdf.write(uploaded_pdf.getvalue())
-        temp_pdf_path = temp_pdf.name
+    name = uploaded_pdf.name
+    store = shared_page_store(book_hash, backend)
+    cache = get_book_cache()
+
+    with store.lock:
+        # Same book already parsed (by any session, before any restart)
+        if len(store) == 0:
+            n_pages, cached = cache.load_pages(book_hash, source=name, backend=backend)
+            store.source = name
+            store.resize(n_pages)
+            store.add(cached)
+        if len(store) and store.n_loaded() == len(store):
+            return (name, store)
 
         # Load and process PDF
-        loader = PyPDFLoader(temp_pdf_path)
-        pages.extend(loader.load())
+        data = uploaded_pdf.getbuffer() # memoryview, no copy
+        reader = open_reader(data)
+        n_pages = len(reader.pages)
+        store.resize(n_pages)
+        missing = [i for i in range(n_pages) if i not in store]
+        if _use_parallel(len(missing)):
+            pages = extract_pages_parallel(data, missing, name=name, backend=backend)
+        else:
+            extractor = get_extractor(backend)
+            doc = extractor.open(data, reader)
+            pages = _extract_pages(extractor, doc, name, missing, reader.page_labels)
+        store.add(dict(zip(missing, pages)))
+        cache.save_pages(book_hash, {i: store[i] for i in missing}, n_pages, backend=backend)
+
+    # The outline comes from the same reader, so `extract_chapter` never parses the file again
+    if cache.load_chapters(book_hash) is None:
+        chapters = _chapter_info(ChapterExtractor(reader=reader))
+        if chapters:
+            cache.save_chapters(book_hash, chapters)
+
+    return (name, store)
+
+def open_book(uploaded_pdf, book_hash: str=None, backend: str=DEFAULT_BACKEND) -> tuple[str, "LazyBook"]:
+    """Open the uploaded PDF without extracting any page text yet,
+        so the table of contents can be shown right away.
+    Args:
+        uploaded_pdf: Uploaded PDF file
+        book_hash: Content hash of the PDF, computed here if not given
+        backend: Text extraction backend, see `utils.pdf_backends`
+    Returns:
+        tuple[str, LazyBook]: Tuple containing the uploaded file name and a lazy page container
+    """
+    data = uploaded_pdf.getvalue()
+    book = LazyBook(data, book_hash=book_hash or hash_bytes(data), name=uploaded_pdf.name, backend=backend)
+    return (uploaded_pdf.name, book)
 
-    return (temp_pdf_path, pages)
+class LazyBook():
+    """
+    Drop-in replacement for the pages returned by `process_book`.
+    Page text is only extracted the first time a page (or a slice of pages) is accessed,
+        and kept afterwards so the same pages are never extracted twice.
+    When `book_hash` is given, pages are kept in the `PageStore` shared by all sessions
+        of the same book, and also read from / written to the on-disk `BookCache`.
+
+    `source` is the PDF bytes (parsed in memory) or a file path.
+    `shared=False` keeps pages in a private store instead (batch jobs that go through many books).
+    """
+    def __init__(self, source, book_hash: str=None, name: str=None, backend: str=DEFAULT_BACKEND,
+                 shared: bool=True):
+        self.source = source
+        self.name = name if name is not None else (source if isinstance(source, str) else "")
+        self.book_hash = book_hash
+        self.backend = backend
+        self._extractor = get_extractor(backend)
+        self._reader = None
+        self._doc = None # the backend's own document handle (the pypdf reader for pypdf backends)
+        self._labels = None
+        self._pool = None # `ExtractionPool` of the running `iter_windows`
+
+        self._pages = shared_page_store(book_hash, backend) if book_hash and shared else PageStore(source=self.name)
+        with self._pages.lock:
+            if len(self._pages) == 0:
+                n_pages, cached = 0, {}
+                if book_hash:
+                    n_pages, cached = get_book_cache().load_pages(book_hash, source=self.name, backend=backend)
+                self._pages.source = self.name
+                self._pages.resize(n_pages or len(self.reader.pages))
+                self._pages.add(cached)
+        self.n_pages = len(self._pages)
+
+    @property
+    def reader(self) -> PdfReader:
+        if self._reader is None:
+            self._reader = open_reader(self.source)
+        return self._reader
+
+    def __len__(self):
+        return self.n_pages
 
-@st.cache_data
-def extract_chapter(filepath) -> dict:
-    extractor = ChapterExtractor(filepath)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self.load_pages(range(*key.indices(self.n_pages)))
+            return self._pages[key]
+
+        if key < 0:
+            key += self.n_pages
+        if not 0 <= key < self.n_pages:
+            raise IndexError("page index out of range")
+        self.load_pages([key])
+        return self._pages[key]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getstate__(self):
+        # PdfReader is not picklable, re-open it on demand
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        state['_doc'] = None
+        state['_pool'] = None
+        return state
+
+    def n_loaded(self) -> int:
+        return self._pages.n_loaded()
+
+    def page_lengths(self):
+        """Characters of every page, -1 for pages not extracted yet (see `PageStore.page_lengths`)"""
+        return self._pages.page_lengths()
+
+    def load_pages(self, indices) -> int:
+        """Extract text for the given page indices, skipping pages already extracted
+        Args:
+            indices: Iterable of 0-based page indices
+        Returns:
+            int: Number of pages newly extracted
+        """
+        with self._pages.lock: # also keeps other sessions from extracting the same pages
+            missing = [i for i in indices if i not in self._pages]
+            if missing:
+                self._pages.add(dict(zip(missing, self._extract(missing))))
+            if missing and self.book_hash:
+                get_book_cache().save_pages(self.book_hash, {i: self._pages[i] for i in missing}, self.n_pages,
+                                            backend=self.backend)
+        return len(missing)
+
+    def iter_windows(self, indices, window: int=32, keep: bool=True):
+        """Yield the given pages in consecutive windows, extracting each window when it is reached
+        Args:
+            indices: Iterable of 0-based page indices, in order
+            window: Pages per window
+            keep: Keep newly extracted pages (as `load_pages` does); with False they are only
+                yielded, so memory stays bounded by the window on huge books
+        Yields:
+            list: The pages of one window
+        """
+        indices = list(indices)
+        # Enough pages in total: one `ExtractionPool` serves every window (started when first needed)
+        parallel = self._pool is None and _use_parallel(len(indices))
+        try:
+            for i in range(0, len(indices), window):
+                span = indices[i:i + window]
+                if parallel and self._pool is None and any(j not in self._pages for j in span):
+                    self._pool = ExtractionPool(self.source, name=self.name, backend=self.backend)
+                if keep:
+                    self.load_pages(span)
+                    yield [self._pages[j] for j in span]
+                    continue
+                with self._pages.lock:
+                    missing = [j for j in span if j not in self._pages]
+                    fresh = dict(zip(missing, self._extract(missing))) if missing else {}
+                yield [fresh[j] if j in fresh else self._pages[j] for j in span]
+        finally:
+            if parallel and self._pool is not None:
+                with self._pages.lock: # not while another thread extracts with it
+                    self._pool.close()
+                    self._pool = None
+
+    def _extract(self, indices: list[int]) -> list[Document]:
+        """Extract pages, in parallel when there are enough of them or a window pool is running
+            (call with the store lock held)"""
+        if self._pool is not None:
+            return self._pool.extract(indices)
+        if _use_parallel(len(indices)):
+            return extract_pages_parallel(self.source, indices, name=self.name, backend=self.backend)
+
+        if self._labels is None:
+            self._labels = self.reader.page_labels # computed over the whole book, keep it
+        if self._doc is None:
+            self._doc = self._extractor.open(self.source, self.reader)
+        return _extract_pages(self._extractor, self._doc, self.name, indices, self._labels)
+
+def _chapter_info(extractor: "ChapterExtractor") -> dict:
     toc = extractor.get_chapters()
-
     if not toc:
-        st.warning("Could not successfully parse and extract book chapters!")
         return {}
 
     # Get page ranges
@@ -46,10 +376,50 @@ def extract_chapter(filepath) -> dict:
         'max_nest': max_nest
     }
 
+def book_chapters(book_hash: str, source=None, reader: PdfReader=None) -> dict:
+    """Table of contents and chapter page ranges of a book, through the on-disk BookCache
+    Args:
+        book_hash: Content hash of the PDF, the cache key
+        source: The PDF as a file path, bytes or binary stream, parsed in memory
+        reader: Already-open reader of the same file, to avoid parsing it twice
+    Returns:
+        dict: 'toc', 'prange' and 'max_nest', or {} when the PDF has no outline
+    """
+    cache = get_book_cache()
+    if book_hash:
+        cached = cache.load_chapters(book_hash)
+        if cached:
+            return cached
+
+    if reader is None:
+        reader = open_reader(source)
+    chapters = _chapter_info(ChapterExtractor(reader=reader))
+
+    if chapters and book_hash:
+        cache.save_chapters(book_hash, chapters)
+
+    return chapters
+
+@st.cache_data
+def extract_chapter(book_hash: str, _source=None, _reader: PdfReader=None) -> dict:
+    """
+    Args:
+        book_hash: Content hash of the PDF, the cache key (here and in the on-disk BookCache)
+        _source: The PDF as a file path, bytes or binary stream (e.g. the UploadedFile), parsed in memory
+        _reader: Already-open reader of the same file (e.g. `LazyBook.reader`), to avoid parsing it twice
+    """
+    chapters = book_chapters(book_hash, source=_source, reader=_reader)
+
+    if not chapters:
+        st.warning("Could not successfully parse and extract book chapters!")
+        return {}
+
+    return chapters
+
 class ChapterExtractor():
-    def __init__(self, filepath):
+    def __init__(self, filepath=None, reader: PdfReader=None):
         try:
-            self.reader = PdfReader(filepath)
+            self.reader = reader if reader is not None else open_reader(filepath)
         except Exception as e:
             raise ValueError(f"Failed to read PDF file: {str(e)}")
 
@@ -57,6 +427,7 @@ class ChapterExtractor():
             raise ValueError("PDF file is empty")
 
         self.max_nest = 0
+        self._page_index = None
         self.chapters = self.extract_toc()
         self.n_pages = self.reader.get_num_pages()
 
@@ -103,7 +474,7 @@ class ChapterExtractor():
             # Single chapter node
             title = node.title
             try:
-                page = self.reader.get_destination_page_number(node)  # 1-based indexing
+                page = self._resolve_page(node)
             except:
                 page = 1  # Fallback to first page if page number extraction fails
 
@@ -116,6 +487,24 @@ class ChapterExtractor():
             return [chapter_data]  # Return as list for consistent typing
 
 
+    def _resolve_page(self, node) -> int:
+        """
+        Resolve an outline destination to its 0-based page number through an index of
+            page object ids, built once for the whole outline.
+        """
+        if self._page_index is None:
+            self._page_index = {
+                page.indirect_reference.idnum: i
+                for i, page in enumerate(self.reader.pages)
+                if page.indirect_reference is not None
+            }
+
+        idnum = getattr(node.page, 'idnum', None)
+        if idnum in self._page_index:
+            return self._page_index[idnum]
+        # Destinations given as page numbers, or refs that are not in the page tree
+        return self.reader.get_destination_page_number(node)
+
     def _nested_chapter_dict(self, node: list):
         """
         Transforms a flat list of nested chapter (with 'nest' level)
@@ -134,12 +523,13 @@ class ChapterExtractor():
         Given a file_path to a Book PDF, extract the book's table of content (if possible by bare minimum).
         """
         chapters = []
+        outline = self.reader.outline # pypdf re-parses the outline on every access
 
-        if not self.reader.outline:
+        if not outline:
             chapters = [] # Cannot find Table of Contents
 
         else:
-            chapters.extend(self._recursive_nested_chapter_flat(self.reader.outline, nest_level=0))
+            chapters.extend(self._recursive_nested_chapter_flat(outline, nest_level=0))
 
         return chapters
 
@@ -159,26 +549,35 @@ class ChapterExtractor():
         if not self.chapters:
             return []
 
-        pagerange = []
-        chapters = self.chapters
-        total_pages = self.get_n_pages()
+        return page_ranges(self.chapters, self.get_n_pages())
 
-        for i, current_chapter in enumerate(chapters):
-            range_info = {
-                'title': current_chapter['title'],
-                'nest': current_chapter['nest'],
-                'start': current_chapter['page']
-            }
 
-            # Find the end page by looking at the next chapter at same or lower nesting level
-            end_page = total_pages  # Default to last page
-            for next_chapter in chapters[i + 1:]:
-                if next_chapter['nest'] <= current_chapter['nest']:
-                    end_page = next_chapter['page']
-                    break
+def page_ranges(chapters: list[dict], total_pages: int) -> list[dict]:
+    """
+    Single pass over the flattened outline: a chapter ends where the next chapter at the
+        same or lower nesting level starts (or at the last page).
+    A stack holds the chapters that are still open, with strictly increasing nesting levels,
+        so each chapter is pushed and popped once: O(n) instead of scanning ahead from every entry.
+    """
+    pagerange = []
+    open_chapters = [] # indices into pagerange
+
+    for current_chapter in chapters:
+        # Every open chapter at the same or deeper level ends here
+        while open_chapters and pagerange[open_chapters[-1]]['nest'] >= current_chapter['nest']:
+            pagerange[open_chapters.pop()]['end'] = current_chapter['page']
+
+        pagerange.append({
+            'title': current_chapter['title'],
+            'nest': current_chapter['nest'],
+            'start': current_chapter['page']
+        })
+        open_chapters.append(len(pagerange) - 1)
+
+    for i in open_chapters:
+        pagerange[i]['end'] = total_pages  # Default to last page
 
-            range_info['end'] = end_page
-            range_info['id'] = f"ch_{current_chapter['nest']}_{current_chapter['page']}_{end_page}"
-            pagerange.append(range_info)
+    for range_info in pagerange:
+        range_info['id'] = f"ch_{range_info['nest']}_{range_info['start']}_{range_info['end']}"
 
-        return pagerange
\ No newline at end of file
+    return pagerange
\ No newline at end of file
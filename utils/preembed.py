@@ -0,0 +1,224 @@
+import logging
+import threading
+
+from .embedding_cache import embedding_model_key
+from .ingest import book_chapter, page_chapter_titles, resolve_namespace, stream_chapter
+from .pdf_backends import DEFAULT_BACKEND
+from .pdf_process import LazyBook, book_chapters
+from .registry import READY, get_namespace_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+# Status of a chapter in a `BookPreEmbedder`
+QUEUED = 'queued'
+EMBEDDING = 'embedding'
+EMBEDDED = 'ready'
+FAILED = 'failed'
+
+
+class BookPreEmbedder():
+    """
+    Background job embedding a whole book right after upload, so that the chapter a student
+        picks is usually indexed already. Chapters go outermost first (then in page order),
+        except that the chapter highlighted in the selector (see `prioritize`) always goes next.
+    Each chapter is embedded into the namespace `resolve_namespace` gives it, exactly as the
+        upload page would, and chapters the registry marks as ready are skipped; in book mode
+        the job embeds the book namespace, which covers every chapter.
+    The job is the only writer of the namespaces it plans: a session that needs a chapter calls
+        `wait`, which moves the chapter to the front of the queue, instead of embedding it
+        concurrently.
+
+    Args:
+        index, embeddings: See `utils.ingest.embed_chunks`
+        book: `LazyBook` of the upload, its own instance (its PDF reader is used from the job's thread)
+        book_hash, book_name: Of the upload
+        strip: See `utils.ingest.build_chunks`
+        namespace_mode: 'chapter' or 'book', see `utils.retrieval`
+    """
+    def __init__(self, index, embeddings, book, book_hash: str, book_name: str,
+                 strip: bool=True, namespace_mode: str='chapter'):
+        self.index = index
+        self.embeddings = embeddings
+        self.book = book
+        self.book_hash = book_hash
+        self.book_name = book_name
+        self.strip = strip
+        self.namespace_mode = namespace_mode
+
+        self._cond = threading.Condition()
+        self._units = []    # chapters (or the `book_chapter`) to embed, in order
+        self._unit_of = {}  # chapter id -> id of the unit that embeds it
+        self._status = {}   # unit id -> status
+        self._errors = {}   # unit id -> error message
+        self._namespaces = {} # unit id -> namespace
+        self._priority = None
+        self._cancelled = False
+        self._planned = False
+        self._finished = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'preembed-{self.book_hash[:8]}', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop after the chapter being embedded"""
+        with self._cond:
+            self._cancelled = True
+
+    def prioritize(self, chapter_id: str):
+        """Embed this chapter next (e.g. the one highlighted in the selector)"""
+        with self._cond:
+            self._priority = self._unit_of.get(chapter_id, chapter_id)
+
+    def status(self, chapter_id: str) -> str:
+        """`QUEUED`, `EMBEDDING`, `EMBEDDED` or `FAILED`, None before the chapters are known"""
+        with self._cond:
+            return self._status.get(self._unit_of.get(chapter_id))
+
+    def error(self, chapter_id: str) -> str:
+        with self._cond:
+            return self._errors.get(self._unit_of.get(chapter_id))
+
+    def namespace(self, chapter_id: str) -> str:
+        """Namespace the chapter was embedded into, None until it is ready"""
+        with self._cond:
+            unit_id = self._unit_of.get(chapter_id)
+            return self._namespaces.get(unit_id) if self._status.get(unit_id) == EMBEDDED else None
+
+    def progress(self) -> dict:
+        """Number of units (chapters, or 1 for the book) per status, and in total"""
+        with self._cond:
+            counts = {status: 0 for status in (QUEUED, EMBEDDING, EMBEDDED, FAILED)}
+            for status in self._status.values():
+                counts[status] += 1
+            return {**counts, 'total': len(self._units)}
+
+    def done(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
+    def failed(self) -> bool:
+        """Whether the job finished with failed chapters (`start_preembedding` starts it again)"""
+        return self.done() and self.progress()[FAILED] > 0
+
+    def wait(self, chapter_id: str, timeout: float=None) -> str:
+        """Embed the chapter next (see `prioritize`) and wait until it is embedded or failed,
+            or the job stops (cancelled, or the chapter is not part of the book's plan)
+        Returns:
+            str: Its status (None when the job does not embed it)
+        """
+        self.prioritize(chapter_id)
+
+        def settled():
+            status = self._status.get(self._unit_of.get(chapter_id))
+            return self._finished or (self._planned and status not in (QUEUED, EMBEDDING))
+
+        with self._cond:
+            self._cond.wait_for(settled, timeout)
+            return self._status.get(self._unit_of.get(chapter_id))
+
+    def _plan(self):
+        chapters = book_chapters(self.book_hash, reader=self.book.reader)
+        prange = chapters['prange'] if chapters else []
+        page_titles = None
+        if self.namespace_mode == 'book':
+            unit = book_chapter(self.book_hash, self.book_name, len(self.book))
+            units, unit_of = [unit], {ch['id']: unit['id'] for ch in prange}
+            unit_of[unit['id']] = unit['id']
+            page_titles = page_chapter_titles(prange, len(self.book), default=self.book_name)
+        else:
+            units = sorted(prange, key=lambda ch: (ch['nest'], ch['start']))
+            unit_of = {ch['id']: ch['id'] for ch in prange}
+        with self._cond:
+            self._units = units
+            self._unit_of = unit_of
+            self._status = {unit['id']: QUEUED for unit in units}
+            if self._priority in unit_of:
+                self._priority = unit_of[self._priority]
+            self._planned = True
+            self._cond.notify_all()
+        return page_titles
+
+    def _next_unit(self) -> dict:
+        with self._cond:
+            if self._cancelled:
+                return None
+            queued = [unit for unit in self._units if self._status[unit['id']] == QUEUED]
+            if not queued:
+                return None
+            unit = next((u for u in queued if u['id'] == self._priority), queued[0])
+            self._status[unit['id']] = EMBEDDING
+            self._cond.notify_all()
+            return unit
+
+    def _run(self):
+        try:
+            self._embed_all()
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def _embed_all(self):
+        try:
+            page_titles = self._plan()
+        except Exception:
+            logger.exception("Background embedding of %s failed", self.book_name)
+            return
+
+        registry = get_namespace_registry()
+        while (unit := self._next_unit()) is not None:
+            namespace, status, error = None, EMBEDDED, None
+            try:
+                entry = resolve_namespace(unit, self.book_hash, self.embeddings, strip=self.strip,
+                                          whole_book=self.namespace_mode == 'book')
+                namespace = entry['namespace']
+                if entry['status'] != READY:
+                    stats = stream_chapter(self.index, self.embeddings, self.book, unit, self.book_hash,
+                                           self.book_name, strip=self.strip, page_titles=page_titles,
+                                           namespace=namespace)
+                    registry.set_status(namespace, READY, stats['chunks'])
+            except Exception as e:
+                logger.warning("Background embedding of %s (%s) failed", unit['title'], self.book_name, exc_info=True)
+                status, error = FAILED, str(e)
+            with self._cond:
+                self._status[unit['id']] = status
+                self._namespaces[unit['id']] = namespace
+                if error is not None:
+                    self._errors[unit['id']] = error
+                self._cond.notify_all()
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _job_key(book_hash: str, embeddings, strip: bool, namespace_mode: str) -> tuple:
+    return (book_hash, embedding_model_key(embeddings), strip, namespace_mode)
+
+def start_preembedding(index, embeddings, source, book_hash: str, book_name: str, backend: str=DEFAULT_BACKEND,
+                       strip: bool=True, namespace_mode: str='chapter') -> BookPreEmbedder:
+    """
+    The process's `BookPreEmbedder` of a book (shared by every session that uploads it), started
+        if it is not running yet. A finished job with failed chapters is started again.
+    Args:
+        source: The PDF bytes (only opened when a job starts)
+        backend: Text extraction backend
+        (others: see `BookPreEmbedder`)
+    """
+    key = _job_key(book_hash, embeddings, strip, namespace_mode)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or job.failed():
+            book = LazyBook(source, book_hash=book_hash, name=book_name, backend=backend)
+            job = _jobs[key] = BookPreEmbedder(index, embeddings, book, book_hash, book_name,
+                                               strip=strip, namespace_mode=namespace_mode)
+            job.start()
+    return job
+
+
+def get_preembedding(book_hash: str, embeddings, strip: bool=True, namespace_mode: str='chapter') -> BookPreEmbedder:
+    """The book's `BookPreEmbedder` for these settings, None when none was started"""
+    with _jobs_lock:
+        return _jobs.get(_job_key(book_hash, embeddings, strip, namespace_mode))
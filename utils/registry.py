@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import get_cache_dir
+
+
+# Ingest status of a namespace
+PENDING = 'pending'  # registered, not (completely) embedded yet
+READY = 'ready'      # every chunk is in the vector store
+EVICTED = 'evicted'  # vectors deleted to stay within the vector budget, re-ingested on next use
+
+
+def namespace_key(book_hash: str, start: int, end: int, chunking: dict, model: str, prefix: str='ch') -> str:
+    """Everything that determines the vectors of a namespace, as a canonical string"""
+    return json.dumps({'kind': prefix, 'book': book_hash, 'start': start, 'end': end,
+                       'chunking': chunking, 'model': model},
+                      sort_keys=True, separators=(',', ':'))
+
+
+def content_namespace(key: str, prefix: str='ch') -> str:
+    """
+    Namespace name derived from a `namespace_key`: the same book content, pages, chunking and
+        model always map to the same namespace, and different books never share one.
+    """
+    return f"{prefix}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]}"
+
+
+class NamespaceRegistry():
+    """
+    Local record of the vector store namespaces: (book content hash, page range, chunking config,
+        embedding model) -> namespace, with its ingest status. Shared by every session and process
+        on the machine (SQLite, like the `EmbeddingStore`), so checking whether a chapter is
+        already embedded needs no call to the vector store.
+    """
+    def __init__(self, path: str=None):
+        self.path = path or os.path.join(get_cache_dir(), 'namespaces.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS namespaces ("
+            " namespace TEXT PRIMARY KEY, key TEXT NOT NULL UNIQUE,"
+            " book_hash TEXT NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL,"
+            " chunking TEXT NOT NULL, model TEXT NOT NULL,"
+            " status TEXT NOT NULL, n_chunks INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL, updated REAL NOT NULL, last_access REAL NOT NULL DEFAULT 0)"
+        )
+        # Registries created before access times were recorded
+        columns = [row['name'] for row in self._conn.execute("PRAGMA table_info(namespaces)")]
+        if 'last_access' not in columns:
+            self._conn.execute("ALTER TABLE namespaces ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    @staticmethod
+    def _entry(row) -> dict:
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['chunking'] = json.loads(entry['chunking'])
+        return entry
+
+    def resolve(self, book_hash: str, start: int, end: int, chunking: dict, model: str, prefix: str='ch') -> dict:
+        """Namespace entry for a page range of a book, registered as pending the first time
+        Args:
+            book_hash: Content hash of the book
+            start, end: 1-based, inclusive page range (as in `page_ranges`)
+            chunking: Chunking configuration (see `utils.ingest.chunking_config`)
+            model: Embedding model key (see `utils.embedding_cache.embedding_model_key`)
+            prefix: Namespace name prefix ('ch' for a chapter, 'book' for a whole book)
+        Returns:
+            dict: The entry ('namespace', 'status', 'n_chunks', ...)
+        """
+        key = namespace_key(book_hash, start, end, chunking, model, prefix)
+        namespace = content_namespace(key, prefix)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO namespaces"
+                " (namespace, key, book_hash, start, end, chunking, model, status, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, book_hash, start, end, json.dumps(chunking, sort_keys=True), model, PENDING, now, now)
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT * FROM namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        return self._entry(row)
+
+    def lookup(self, book_hash: str, start: int, end: int, chunking: dict, model: str, prefix: str='ch') -> dict:
+        """Like `resolve`, without registering anything: None when the page range was never embedded"""
+        return self.get(content_namespace(namespace_key(book_hash, start, end, chunking, model, prefix), prefix))
+
+    def get(self, namespace: str) -> dict:
+        """Entry of a namespace, None when it is not registered"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        return self._entry(row)
+
+    def is_ready(self, namespace: str) -> bool:
+        entry = self.get(namespace)
+        return entry is not None and entry['status'] == READY
+
+    def set_status(self, namespace: str, status: str, n_chunks: int=None):
+        with self._lock:
+            if n_chunks is None:
+                self._conn.execute("UPDATE namespaces SET status = ?, updated = ? WHERE namespace = ?",
+                                   (status, time.time(), namespace))
+            else:
+                self._conn.execute("UPDATE namespaces SET status = ?, n_chunks = ?, updated = ? WHERE namespace = ?",
+                                   (status, n_chunks, time.time(), namespace))
+            self._conn.commit()
+
+    def touch(self, namespace: str):
+        """Record that a namespace is being searched (or written), for LRU eviction"""
+        with self._lock:
+            self._conn.execute("UPDATE namespaces SET last_access = ? WHERE namespace = ?", (time.time(), namespace))
+            self._conn.commit()
+
+    def least_recently_used(self, namespaces=None) -> list[dict]:
+        """Ready entries, least recently used (searched, or else embedded) first
+        Args:
+            namespaces: Only these namespaces, e.g. those of one vector index (the registry is
+                shared by every index on the machine)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM namespaces WHERE status = ? ORDER BY MAX(last_access, updated) ASC", (READY,)
+            ).fetchall()
+        if namespaces is not None:
+            namespaces = set(namespaces)
+            rows = [row for row in rows if row['namespace'] in namespaces]
+        return [self._entry(row) for row in rows]
+
+    def remove(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM namespaces WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def list_all(self, book_hash: str=None) -> list[dict]:
+        """Every entry (of one book), most recently updated first"""
+        with self._lock:
+            if book_hash is None:
+                rows = self._conn.execute("SELECT * FROM namespaces ORDER BY updated DESC").fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM namespaces WHERE book_hash = ? ORDER BY updated DESC",
+                                          (book_hash,)).fetchall()
+        return [self._entry(row) for row in rows]
+
+
+_namespace_registry = None
+_namespace_registry_lock = threading.Lock()
+
+def get_namespace_registry() -> NamespaceRegistry:
+    global _namespace_registry
+    with _namespace_registry_lock:
+        if _namespace_registry is None:
+            _namespace_registry = NamespaceRegistry()
+    return _namespace_registry
@@ -0,0 +1,42 @@
+from .config import get_setting
+
+
+# 'chapter': one namespace per chapter, embedded on selection
+# 'book': one namespace per book, embedded once; chapters are page-range filters over it
+# Either way the namespace is the registry's `content_namespace` hash of what was embedded
+#   (see `NamespaceRegistry.resolve`), not the chapter id
+NAMESPACE_MODES = ('chapter', 'book')
+
+def default_namespace_mode() -> str:
+    mode = get_setting("NAMESPACE_MODE", "chapter")
+    return mode if mode in NAMESPACE_MODES else "chapter"
+
+
+def book_namespace(book_hash: str) -> str:
+    """Id of the whole-book entry ingested in book mode (its namespace comes from the `NamespaceRegistry`)"""
+    return f"book_{book_hash[:16]}"
+
+
+def chapter_filter(chapter: dict) -> dict:
+    """
+    Pinecone metadata filter selecting a chapter's chunks in its book's namespace.
+    'page' is the 0-based page index of the page a chunk starts on; the range matches the pages
+        `embed_chapter` takes for the chapter (`book[start-1:end]`).
+    """
+    return {'page': {'$gte': chapter['start'] - 1, '$lte': chapter['end'] - 1}}
+
+
+def retrieval_target(chapter: dict, namespaces: dict, mode: str=None) -> tuple[str, dict]:
+    """Where to search for a chapter's chunks
+    Args:
+        chapter: Chapter entry from `page_ranges` (the selected chapter)
+        namespaces: Chapter id -> namespace the chapter (in book mode, its whole book) was embedded
+            into, as resolved by the upload page through the `NamespaceRegistry`
+        mode: 'chapter' or 'book' (default: NAMESPACE_MODE setting)
+    Returns:
+        tuple[str, dict]: Namespace (None when the chapter was not embedded), and metadata filter
+            (None when the namespace is the chapter's own)
+    """
+    mode = mode or default_namespace_mode()
+    namespace = (namespaces or {}).get(chapter['id'])
+    return namespace, chapter_filter(chapter) if mode == 'book' else None
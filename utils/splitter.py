@@ -0,0 +1,230 @@
+import numpy as np
+from langchain_core.documents import Document
+
+
+PAGE_SEPARATOR = "\n\n"
+
+
+class ChapterChunks():
+    """
+    Chunks of one chapter, stored as (start, end) offsets into the chapter text plus the index
+        of the page each chunk starts on. `Document`s are only built when a chunk is accessed
+        (indexing, slicing, iterating), so the chunk list costs a few arrays until it is used.
+
+    Args:
+        text: The chapter text the offsets point into
+        starts, ends: Chunk offsets
+        pages: Index (into `metadatas`) of the page each chunk starts on
+        metadatas: Metadata of each page of the chapter
+        extra_metadata: Added to every chunk's metadata (e.g. chapter title and id)
+        page_starts: Offset of each page in `text`
+    """
+    def __init__(self, text: str, starts: np.ndarray, ends: np.ndarray, pages: np.ndarray,
+                 metadatas: list[dict], extra_metadata: dict=None, page_starts: np.ndarray=None):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.pages = pages
+        self.metadatas = metadatas
+        self.extra_metadata = dict(extra_metadata or {})
+        self.page_starts = page_starts
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._document(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("chunk index out of range")
+        return self._document(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._document(i)
+
+    def chunk_text(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def texts(self):
+        """Chunk strings, one at a time"""
+        for i in range(len(self)):
+            yield self.chunk_text(i)
+
+    def page_offsets(self) -> np.ndarray:
+        """Offset of each chunk in the text of the page it starts on"""
+        return self.starts - self.page_starts[self.pages]
+
+    def total_chars(self) -> int:
+        return int((self.ends - self.starts).sum())
+
+    def _document(self, i: int) -> Document:
+        metadata = {**self.metadatas[self.pages[i]], **self.extra_metadata}
+        return Document(page_content=self.chunk_text(i), metadata=metadata)
+
+
+class ChapterSplitter():
+    """
+    Splits a whole chapter in one pass, with the same rules as the
+        `RecursiveCharacterTextSplitter` setup it replaces: chunks of at most `chunk_size`
+        characters, cut at the last paragraph break, else line break, else space, with about
+        `chunk_overlap` characters repeated between consecutive chunks.
+    Unlike splitting page by page, chunks may run across a page boundary; each chunk is
+        attributed to the page it starts on.
+
+    Args:
+        chunk_size: Maximum number of characters per chunk
+        chunk_overlap: Number of characters shared by consecutive chunks
+        separators: Preferred cut points, in order of preference
+    """
+    def __init__(self, chunk_size: int=1000, chunk_overlap: int=200,
+                 separators: tuple[str, ...]=("\n\n", "\n", " ")):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+
+    def split_offsets(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Start and end offsets of the chunks of `text`,
+                with surrounding whitespace excluded
+        """
+        starts, ends = [], []
+        n = len(text)
+        pos = _skip_space(text, 0, n)
+
+        while pos < n:
+            end = min(pos + self.chunk_size, n)
+            if end < n:
+                # Cut at the last preferred separator in the window (not in its first half,
+                # which would make tiny chunks)
+                for sep in self.separators:
+                    cut = text.rfind(sep, pos + self.chunk_size // 2, end)
+                    if cut != -1:
+                        end = cut
+                        break
+
+            chunk_end = _trim_space(text, pos, end)
+            if chunk_end > pos:
+                starts.append(pos)
+                ends.append(chunk_end)
+            if end >= n:
+                break
+
+            # Next chunk starts about `chunk_overlap` characters back, at a word boundary
+            nxt = max(end - self.chunk_overlap, pos + 1)
+            space = text.find(" ", nxt, end)
+            nxt = space + 1 if space != -1 else end
+            pos = _skip_space(text, nxt, n)
+
+        return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+    def split_pages(self, pages, extra_metadata: dict=None) -> ChapterChunks:
+        """
+        Args:
+            pages: Pages of the chapter, in order (anything with `page_content` and `metadata`)
+            extra_metadata: Added to every chunk's metadata
+
+        Returns:
+            ChapterChunks: The chapter's chunks, each with the metadata of the page it starts on
+        """
+        texts, metadatas = [], []
+        for page in pages:
+            texts.append(page.page_content)
+            metadatas.append(page.metadata)
+
+        # Offset of the first character of every page in the joined text
+        lengths = np.fromiter((len(t) + len(PAGE_SEPARATOR) for t in texts), dtype=np.int64, count=len(texts))
+        page_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(texts) else lengths
+
+        text = PAGE_SEPARATOR.join(texts)
+        starts, ends = self.split_offsets(text)
+        chunk_pages = np.searchsorted(page_starts, starts, side='right') - 1
+
+        return ChapterChunks(text, starts, ends, chunk_pages, metadatas, extra_metadata, page_starts=page_starts)
+
+
+    def split_stream(self, windows, extra_metadata: dict=None, with_offsets: bool=False):
+        """
+        Split a chapter that arrives as consecutive windows of pages, yielding chunks as soon as
+            they are final: a chunk is emitted once the text after its start is longer than
+            `chunk_size` (so its cut point can no longer move), and the rest of the window is
+            carried over to the next one. Chunks are the same as with `split_pages`.
+
+        Args:
+            windows: Iterable of lists of pages (anything with `page_content` and `metadata`)
+            extra_metadata: Added to every chunk's metadata
+            with_offsets: Also yield each chunk's offset in its page (see `ChapterChunks.page_offsets`)
+
+        Yields:
+            Document: Chunks, in order, with the metadata of the page they start on
+                ((offset, Document) pairs with `with_offsets`)
+        """
+        extra_metadata = dict(extra_metadata or {})
+        carry_text, carry_starts, carry_metas = "", [], []
+        carry_base = 0 # offset of the carried text in its first page
+
+        for window, final in _with_last(windows):
+            pieces = [carry_text] if carry_metas else []
+            page_starts, metadatas = list(carry_starts), list(carry_metas)
+            bases = [carry_base] + [0] * (len(carry_metas) - 1) if carry_metas else []
+            pos = len(carry_text) + len(PAGE_SEPARATOR) if carry_metas else 0
+            for page in window:
+                page_starts.append(pos)
+                metadatas.append(page.metadata)
+                bases.append(0)
+                pieces.append(page.page_content)
+                pos += len(page.page_content) + len(PAGE_SEPARATOR)
+            if not metadatas:
+                continue
+            text = PAGE_SEPARATOR.join(pieces)
+
+            starts, ends = self.split_offsets(text)
+            n_final = len(starts) if final else int(np.searchsorted(starts + self.chunk_size, len(text), side='left'))
+            chunk_pages = np.searchsorted(page_starts, starts[:n_final], side='right') - 1
+            for i in range(n_final):
+                chunk = Document(page_content=text[starts[i]:ends[i]],
+                                 metadata={**metadatas[chunk_pages[i]], **extra_metadata})
+                if with_offsets:
+                    page = chunk_pages[i]
+                    yield int(starts[i] - page_starts[page] + bases[page]), chunk
+                else:
+                    yield chunk
+
+            # Carry over everything from the first chunk that is not final yet
+            cut = int(starts[n_final]) if n_final < len(starts) else len(text)
+            first = int(np.searchsorted(page_starts, cut, side='right')) - 1
+            # (nothing to carry when the window ends in whitespace, e.g. blank scanned pages)
+            carry = cut < len(text)
+            carry_text = text[cut:] if carry else ""
+            carry_starts = [0] + [start - cut for start in page_starts[first + 1:]] if carry else []
+            carry_metas = metadatas[first:] if carry else []
+            carry_base = cut - page_starts[first] + bases[first] if carry else 0
+
+
+def _with_last(iterable):
+    """Yield (item, is_last) pairs; an empty iterable yields a single ([], True) to flush"""
+    iterator = iter(iterable)
+    previous = next(iterator, None)
+    if previous is None:
+        yield [], True
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
+
+
+def _skip_space(text: str, pos: int, n: int) -> int:
+    while pos < n and text[pos].isspace():
+        pos += 1
+    return pos
+
+def _trim_space(text: str, start: int, end: int) -> int:
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
@@ -1,19 +1,79 @@
-import streamlit as st
+import os
 
 from pinecone import Pinecone, ServerlessSpec, Index
 from langchain_pinecone import PineconeVectorStore
 
+from .chunk_store import COMPACT_KEY, HydratingVectorStore, namespace_is_compact
+from .config import get_setting, get_cache_dir
+from .lifecycle import start_lifecycle
+from .llm import embedding_dimensions
+from .local_store import LocalIndex, LocalVectorStore, open_local_index
+from .registry import get_namespace_registry
+
+
+VECTOR_BACKENDS = ('pinecone', 'local')
 
 def config_pinecone(index_name: str='test') -> tuple[Pinecone, Index]:
-    PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
+    PINECONE_API_KEY = get_setting("PINECONE_API_KEY")
     pc = Pinecone(
         api_key=PINECONE_API_KEY
     )
-    if index_name not in [index.name for index in pc.list_indexes()]:
+    # An index has a fixed dimension: shortened embeddings (EMBEDDING_DIMENSIONS) need their own index
+    dimension = embedding_dimensions() or 1536
+    existing = {index.name: index.dimension for index in pc.list_indexes()}
+    if index_name not in existing:
         pc.create_index(index_name,
-                        dimension=1536,
+                        dimension=dimension,
                         spec=ServerlessSpec(cloud='aws', region='us-east-1')
                         )
+    elif existing[index_name] != dimension:
+        raise ValueError(f"Pinecone index '{index_name}' has dimension {existing[index_name]}, "
+                         f"but embeddings have {dimension}: use another index name")
 
     index = pc.Index(index_name)
     return pc, index
+
+
+def config_index(index_name: str='test'):
+    """
+    The vector index selected by the VECTOR_BACKEND setting:
+        - 'pinecone' (default): see `config_pinecone`
+        - 'local': an in-process `LocalIndex` under <cache dir>/vectors/<index_name>, no service needed,
+            searched with VECTOR_QUANTIZATION ('none', 'int8' or 'binary') codes and re-scored
+            with the float vectors (VECTOR_RESCORE candidates per result, 0 to skip). Floats and
+            codes are both stored, about 1.28x the disk space of the floats alone
+    With a VECTOR_BUDGET, least recently used namespaces are evicted in the background (see `NamespaceLifecycle`).
+    Returns:
+        tuple: (Pinecone client or None, index)
+    """
+    backend = get_setting("VECTOR_BACKEND", "pinecone")
+    if backend == 'local':
+        pc, index = None, open_local_index(
+            os.path.join(get_cache_dir(), 'vectors', index_name),
+            quantization=get_setting("VECTOR_QUANTIZATION", "none"),
+            rescore=int(get_setting("VECTOR_RESCORE", 4))
+        )
+    elif backend == 'pinecone':
+        pc, index = config_pinecone(index_name)
+    else:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}', expected one of {VECTOR_BACKENDS}")
+    start_lifecycle(index, f"{backend}:{index_name}")
+    return pc, index
+
+
+def get_vectorstore(index, embedding, namespace: str=None):
+    """
+    LangChain vector store over an index from `config_index`. Namespaces embedded with compact
+        metadata are searched through a `HydratingVectorStore`, which loads the chunks' text and
+        metadata from the local `ChunkStore`.
+    """
+    if namespace:
+        get_namespace_registry().touch(namespace)
+    text_key = COMPACT_KEY if namespace_is_compact(namespace) else 'text'
+    if isinstance(index, LocalIndex):
+        store = LocalVectorStore(index=index, embedding=embedding, namespace=namespace, text_key=text_key)
+    else:
+        store = PineconeVectorStore(index=index, embedding=embedding, namespace=namespace, text_key=text_key)
+    if text_key == COMPACT_KEY:
+        return HydratingVectorStore(store, namespace)
+    return store
@@ -0,0 +1,46 @@
+import queue
+import threading
+
+
+_DONE = object()
+
+def prefetch(iterable, maxsize: int=2):
+    """
+    Run a generator in a background thread, at most `maxsize` items ahead of the consumer.
+    Lets CPU-bound producers (page extraction, cleaning) run while the consumer waits on the
+        network, with a bounded queue for backpressure. Errors are re-raised in the consumer;
+        if the consumer stops early, the producer stops at its next item.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,96 @@
+import re
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+
+
+def _line_key(line: str) -> str:
+    """Normalized form of a line, so 'Page 12' and 'Page 13' count as the same running footer"""
+    return _SPACES.sub(' ', _DIGITS.sub('#', line)).strip().lower()
+
+
+def _edge_lines(lines: list[str], edge_lines: int) -> list[int]:
+    """Indices of the first and last `edge_lines` non-blank lines of a page (where headers/footers live)"""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    if len(filled) <= 2 * edge_lines:
+        return filled
+    return filled[:edge_lines] + filled[-edge_lines:]
+
+
+def boilerplate_lines(pages: list[Document],
+                      min_fraction: float=0.4,
+                      min_pages: int=3,
+                      edge_lines: int=3) -> set[str]:
+    """
+    Normalized keys (see `_line_key`) of the running headers, page numbers and copyright footers
+        of a run of pages: lines that, after replacing digits and collapsing whitespace, sit in the
+        top or bottom `edge_lines` lines of at least `min_fraction` of the pages. Document
+        frequencies of all candidate lines are counted in a single `np.unique` pass.
+
+    Args:
+        pages: Page Documents of one chapter (or a sample of them)
+        min_fraction: Share of pages a line must repeat on to be boilerplate
+            (0.4 still catches headers that alternate between even and odd pages)
+        min_pages: Below this many pages nothing is considered repeated
+        edge_lines: Number of non-blank lines at the top and bottom of a page to inspect
+    """
+    if len(pages) < min_pages:
+        return set()
+    # one entry per (page, distinct key): counts are document frequencies
+    keys = []
+    for page in pages:
+        lines = page.page_content.splitlines()
+        keys.extend({_line_key(lines[i]) for i in _edge_lines(lines, edge_lines)})
+    if not keys:
+        return set()
+    uniq, counts = np.unique(np.array(keys, dtype=str), return_counts=True)
+    repeated = set(uniq[counts >= max(2, min_fraction * len(pages))].tolist())
+    repeated.discard('')
+    return repeated
+
+
+def strip_boilerplate(pages: list[Document],
+                      min_fraction: float=0.4,
+                      min_pages: int=3,
+                      edge_lines: int=3,
+                      min_chars: int=40,
+                      repeated: set[str]=None) -> tuple[list[Document], dict]:
+    """
+    Remove running headers, page numbers and copyright footers from a run of pages,
+        then drop pages left (near) empty.
+
+    Args:
+        pages: Page Documents of one chapter, in order
+        min_fraction, min_pages: See `boilerplate_lines`
+        edge_lines: Number of non-blank lines at the top and bottom of a page to inspect
+        min_chars: Pages with fewer characters than this after cleaning are dropped
+        repeated: Boilerplate detected beforehand (see `boilerplate_lines`), e.g. over the whole
+            chapter when its pages are cleaned a window at a time; default: detected over `pages`
+
+    Returns:
+        tuple[list[Document], dict]: Cleaned pages (metadata preserved) and stats
+            ('lines_removed', 'pages_dropped', 'chars_before', 'chars_after')
+    """
+    if repeated is None:
+        repeated = boilerplate_lines(pages, min_fraction=min_fraction, min_pages=min_pages, edge_lines=edge_lines)
+
+    cleaned = []
+    stats = {'lines_removed': 0, 'pages_dropped': 0, 'chars_before': 0, 'chars_after': 0}
+    for page in pages:
+        lines = page.page_content.splitlines()
+        drop = {i for i in _edge_lines(lines, edge_lines) if _line_key(lines[i]) in repeated}
+        text = '\n'.join(line for i, line in enumerate(lines) if i not in drop).strip()
+
+        stats['lines_removed'] += len(drop)
+        stats['chars_before'] += len(page.page_content)
+        if len(text) < min_chars:
+            stats['pages_dropped'] += 1
+            continue
+        stats['chars_after'] += len(text)
+        cleaned.append(Document(page_content=text, metadata=dict(page.metadata)))
+
+    return cleaned, stats
@@ -0,0 +1,129 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .chunk_store import get_chunk_store, vector_metadata
+from .config import get_setting
+
+
+# OpenAI caps an embedding request at 2048 inputs and 300k tokens; stay under both
+MAX_REQUEST_ITEMS = 1000
+MAX_REQUEST_TOKENS = 200_000
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1 # rough estimation from char to token, as in quiz generation
+
+def pack_requests(items, max_tokens: int=MAX_REQUEST_TOKENS, max_items: int=MAX_REQUEST_ITEMS):
+    """Group consecutive (id, document) pairs into as few embedding requests as the provider's
+        limits allow. Lazy: pulls items from `items` only as requests are needed.
+    Yields:
+        list[tuple[str, Document]]: The items of one request, in order
+    """
+    request, tokens = [], 0
+    for item in items:
+        n = estimate_tokens(item[1].page_content)
+        if request and (tokens + n > max_tokens or len(request) >= max_items):
+            yield request
+            request, tokens = [], 0
+        request.append(item)
+        tokens += n
+    if request:
+        yield request
+
+
+def embed_and_upsert(index, embeddings, items, namespace: str, total: int=None,
+                     text_key: str='text', upsert_batch: int=100, request_items: int=MAX_REQUEST_ITEMS,
+                     embed_workers: int=None, upsert_workers: int=None, compact: bool=False,
+                     on_commit=None, progress=None) -> int:
+    """
+    Embed documents and upsert them to Pinecone with both stages running concurrently:
+        up to `embed_workers` embedding requests (packed up to the token limit) are in flight
+        while earlier results are being upserted by `upsert_workers` threads.
+    In-flight work is bounded on both sides, and progress is reported in document order.
+    `items` may be a generator: it is consumed only as fast as embedding slots free up,
+        which is the backpressure of the streaming pipeline (see `utils.ingest.stream_chapter`).
+
+    Args:
+        index: Pinecone index
+        embeddings: Embedding model (`embed_documents` must be thread-safe, as OpenAIEmbeddings is)
+        items: (vector id, Document) pairs to embed (list or iterable)
+        namespace: Namespace to upsert to
+        total: Number of items, for progress messages (default: `len(items)` when available)
+        text_key: Metadata key holding the text (as `PineconeVectorStore` expects)
+        upsert_batch: Vectors per upsert request (Pinecone recommends 100)
+        request_items: Maximum documents per embedding request (smaller gets a stream going sooner)
+        embed_workers: Concurrent embedding requests (default: EMBED_CONCURRENCY setting, 4)
+        upsert_workers: Concurrent upsert requests (default: UPSERT_CONCURRENCY setting, 4)
+        compact: Upsert compact metadata (see `vector_metadata`), texts go to the `ChunkStore`
+        on_commit: Optional callback(items), called in order with the items of each embedding
+            request once all of their upserts succeeded (to checkpoint progress)
+        progress: Optional callback(message: str)
+
+    Returns:
+        int: Number of vectors upserted
+    """
+    embed_workers = embed_workers or int(get_setting("EMBED_CONCURRENCY", 4))
+    upsert_workers = upsert_workers or int(get_setting("UPSERT_CONCURRENCY", 4))
+    report = progress or (lambda message: None)
+
+    if total is None and hasattr(items, '__len__'):
+        total = len(items)
+    requests = pack_requests(items, max_items=request_items)
+    n_done = 0
+
+    def commit(future, request):
+        future.result()
+        if request is not None and on_commit is not None:
+            on_commit(request)
+
+    with ThreadPoolExecutor(embed_workers) as embed_pool, ThreadPoolExecutor(upsert_workers) as upsert_pool:
+        embedding, upserting = deque(), deque()
+
+        def submit_embedding():
+            request = next(requests, None)
+            if request is not None:
+                texts = [doc.page_content for _, doc in request]
+                embedding.append((request, embed_pool.submit(embeddings.embed_documents, texts)))
+
+        for _ in range(embed_workers):
+            submit_embedding()
+
+        # Results are consumed in submission order, so progress is ordered and each finished
+        # request immediately makes room for the next one
+        try:
+            while embedding:
+                request, future = embedding.popleft()
+                vectors = future.result()
+                submit_embedding()
+                if compact: # stored before the vectors, so a search never finds a chunk without its text
+                    get_chunk_store().put_many(namespace, request)
+
+                for i in range(0, len(request), upsert_batch):
+                    batch = [
+                        {'id': vector_id, 'values': values, 'metadata': vector_metadata(vector_id, doc, text_key, compact)}
+                        for (vector_id, doc), values in zip(request[i:i + upsert_batch], vectors[i:i + upsert_batch])
+                    ]
+                    # The request's last batch carries the request: it is committed once that batch
+                    # (and, popped in order, every batch before it) is done
+                    last = i + upsert_batch >= len(request)
+                    upserting.append((upsert_pool.submit(index.upsert, vectors=batch, namespace=namespace),
+                                      request if last else None))
+                # Backpressure (bounded pending upserts), and commit whatever already finished
+                while upserting and (len(upserting) > 2 * upsert_workers or upserting[0][0].done()):
+                    commit(*upserting.popleft())
+
+                n_done += len(request)
+                report(f"Embedded {n_done} of {total} chunks" if total is not None else f"Embedded {n_done} chunks")
+        except BaseException:
+            # Keep what can be kept: finish and commit the upserts already submitted
+            for pending in embedding:
+                pending[1].cancel()
+            while upserting:
+                try:
+                    commit(*upserting.popleft())
+                except Exception:
+                    break
+            raise
+
+        while upserting:
+            commit(*upserting.popleft())
+    return n_done